@@ -0,0 +1,170 @@
+# app/analytics.py
+"""
+The dashboard's frame computations (aggregation, rolling means, heatmaps,
+correlations, trend lines, histograms and the forecast), kept free of Streamlit so the
+benchmarks can time them. Trends and histogram bins are computed here on
+every point, so the charts only draw their results. Rolling means and
+z-scores come from the pipeline's NumPy engine (prototype/anomalies),
+over all selected pollutants at once.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+from prototype.anomalies.rolling import robust_zscores, rolling_stats, zscores
+from prototype.forecast import model
+
+# aggregation → pandas resample rule
+RULES = {"hourly":"h","daily":"D","monthly":"MS"}
+
+
+def aggregate(df: pd.DataFrame, selected: list, agg: str = "raw", window: int = 1) -> pd.DataFrame:
+    """
+    The plotted series: the selected pollutants resampled to hourly, daily
+    or monthly means (gaps interpolated) unless agg is "raw", then smoothed
+    with a `window`-hour rolling mean. Frames already at that grain (read
+    from the pipeline's rollups) only have their missing periods filled.
+    """
+    plot_df = df[["Datetime"] + selected].copy()
+    if agg != "raw":
+        rule = RULES[agg]
+        plot_df = plot_df.set_index("Datetime")[selected].resample(rule).mean().interpolate().reset_index()
+    if window > 1:
+        stats = rolling_stats(plot_df["Datetime"], plot_df[selected].to_numpy(dtype=float), [window], ("mean",))
+        plot_df[selected] = stats[window]["mean"]
+    return plot_df
+
+
+def with_zscores(plot_df: pd.DataFrame, selected: list, window: int = None, robust: bool = False) -> pd.DataFrame:
+    """
+    plot_df in long form (Datetime, Pollutant, Value) with each value's
+    z-score within its pollutant: against the whole series, or against the
+    trailing `window` hours when window is given, robust using the rolling
+    median and MAD instead of the mean and std.
+    """
+    values = plot_df[selected].to_numpy(dtype=float)
+    if window is None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0, ddof=1)
+    else:
+        kinds = ("median", "mad") if robust else ("mean", "std")
+        stats = rolling_stats(plot_df["Datetime"], values, [window], kinds)[window]
+        z = robust_zscores(values, stats) if robust else zscores(values, stats)
+    n = len(plot_df)
+    return pd.DataFrame({
+        "Datetime": np.tile(plot_df["Datetime"].to_numpy(), len(selected)),
+        "Pollutant": np.repeat(np.asarray(selected, dtype=object), n),
+        "Value": values.T.ravel(),
+        "zscore": z.T.ravel(),
+    })
+
+
+def hour_weekday_heatmap(df: pd.DataFrame, pollutant: str) -> pd.DataFrame:
+    """Mean of pollutant per (weekday, hour)."""
+    dh = df[["Datetime", pollutant]].dropna().copy()
+    dh["hour"]    = dh["Datetime"].dt.hour
+    dh["weekday"] = pd.Categorical(dh["Datetime"].dt.day_name(), categories=list(calendar.day_name), ordered=True)
+    return dh.groupby(["weekday","hour"], observed=True)[pollutant].mean().reset_index()
+
+
+def day_month_heatmap(df: pd.DataFrame, pollutant: str) -> pd.DataFrame:
+    """Mean of pollutant per (month, day of month)."""
+    df_m = df[["Datetime", pollutant]].dropna().copy()
+    df_m["day"]   = df_m["Datetime"].dt.day
+    df_m["month"] = pd.Categorical(df_m["Datetime"].dt.month_name(), categories=list(calendar.month_name)[1:], ordered=True)
+    return df_m.groupby(["month","day"], observed=True)[pollutant].mean().reset_index()
+
+
+def correlation_long(plot_df: pd.DataFrame, selected: list) -> pd.DataFrame:
+    """Pairwise correlations of the selected pollutants as (pollutant, variable, correlation) rows."""
+    corr_mat = plot_df[selected].corr()
+    return (
+        corr_mat
+        .reset_index()
+        .melt(id_vars="index", var_name="variable", value_name="correlation")
+        .rename(columns={"index":"pollutant"})
+    )
+
+
+def linear_fit(df: pd.DataFrame, x: str, y: str) -> pd.DataFrame:
+    """The least-squares line of y on x (numeric or datetime) as its two end points; empty under 2 points."""
+    df = df[[x, y]].dropna()
+    if len(df) < 2:
+        return df.iloc[:0]
+    lo, hi = df[x].min(), df[x].max()
+    if pd.api.types.is_datetime64_any_dtype(df[x]):
+        t = (df[x] - lo).dt.total_seconds().to_numpy()
+        ends = np.array([0.0, (hi - lo).total_seconds()])
+    else:
+        t = df[x].to_numpy(dtype=float)
+        ends = np.array([lo, hi], dtype=float)
+    slope, intercept = np.polyfit(t, df[y].to_numpy(dtype=float), 1)
+    return pd.DataFrame({x: [lo, hi], y: slope * ends + intercept})
+
+
+def trend_lines(long_df: pd.DataFrame) -> pd.DataFrame:
+    """Each pollutant's linear trend of Value over Datetime, as (Datetime, Pollutant, Value) end points."""
+    fits = [
+        linear_fit(g, "Datetime", "Value").assign(Pollutant=pollutant)
+        for pollutant, g in long_df.groupby("Pollutant", sort=False)
+    ]
+    return pd.concat(fits, ignore_index=True) if fits else long_df.iloc[:0]
+
+
+def histogram_long(plot_df: pd.DataFrame, selected: list, maxbins: int = 50) -> pd.DataFrame:
+    """Per pollutant, counts of its values in maxbins equal bins, as (Pollutant, bin_start, bin_end, count) rows."""
+    frames = []
+    for p in selected:
+        values = plot_df[p].dropna().to_numpy()
+        if not len(values):
+            continue
+        counts, edges = np.histogram(values, bins=maxbins)
+        frames.append(pd.DataFrame({
+            "Pollutant": p, "bin_start": edges[:-1], "bin_end": edges[1:], "count": counts,
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["Pollutant", "bin_start", "bin_end", "count"]
+    )
+
+
+def latest_by_station(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per station with each column's last non-null value, for frames not read from the pipeline."""
+    return df.sort_values("Datetime").groupby("station").last().reset_index()
+
+
+def summary(df: pd.DataFrame, selected: list) -> pd.DataFrame:
+    """Mean, median, min, max and std of each selected pollutant, one row per pollutant."""
+    return df[selected].agg(["mean","median","min","max","std"]).T
+
+
+# pandas frequency → (daily, weekly harmonics, season of the seasonal-naive baseline), in periods of freq
+SEASONS = {"h": (model.DAILY, model.WEEKLY, 168), "D": (0, model.WEEKLY, 7), "MS": (0, 0, 12)}
+
+
+def harmonic_forecast(plot_df: pd.DataFrame, pollutant: str, horizon: int, freq: str):
+    """
+    The pipeline's forecasting model (prototype/forecast/model.py) fitted to
+    pollutant, with the harmonics freq can resolve, and extended horizon
+    periods of freq past the last value. Returns (history, forecast with
+    lower/upper 95% bounds, {"n_obs", "rmse", "baseline_rmse"}), or None
+    when there are too few values to fit.
+    """
+    fc_df = plot_df[["Datetime", pollutant]].dropna().reset_index(drop=True)
+    if len(fc_df) < 2:
+        return None
+    daily, weekly, season = SEASONS[freq]
+    origin = fc_df["Datetime"].iloc[-1]
+    coef, n, rmse = model.fit(model.design(fc_df["Datetime"], origin, daily, weekly), fc_df[pollutant].to_numpy())
+    if not np.isfinite(coef).all():
+        return None
+    future = pd.date_range(origin, periods=horizon+1, freq=freq)[1:]
+    values = model.predict(model.design(future, origin, daily, weekly), coef)[:, 0]
+    band = model.BAND * rmse[0]
+    fcast_df = pd.DataFrame({"Datetime": future, pollutant: values, "lower": values - band, "upper": values + band})
+    grid = fc_df.set_index("Datetime")[pollutant].resample(freq).mean()
+    info = {
+        "n_obs": int(n[0]), "rmse": float(rmse[0]),
+        "baseline_rmse": float(model.seasonal_naive_rmse(grid.to_numpy(), season)[0]),
+    }
+    return fc_df, fcast_df, info
@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 import pydeck as pdk
-import csv, re, warnings, calendar
+import re, sys, warnings, calendar
 from pathlib import Path
 from datetime import datetime
 
@@ -12,122 +12,165 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 # ── Paths & Regex ────────────────────────────────────────────────────
 ROOT        = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from app import analytics, decimate, loader, memo, store
 DEFAULT_CSV = ROOT / "data" / "raw" / "AirQualityDataHourly.csv"
+DEFAULT_DB  = ROOT / store.DEFAULT_DB
 NUM_RE      = re.compile(r"[-+]?\d+(?:[.,]\d+)?")
+LIVE_POLL_SECONDS = 5
 
 # ── Data loader ──────────────────────────────────────────────────────
 @st.cache_data(show_spinner="📊 Loading data…")
 def load_and_clean(path: str) -> pd.DataFrame:
-    # Detect delimiter
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        sample = f.readline()
-    delim = csv.Sniffer().sniff(sample, delimiters=",;").delimiter
-
-    # Read raw to find header row
-    raw = pd.read_csv(path, sep=delim, header=None, dtype=str, na_filter=False)
-    hdr = raw[raw.iloc[:,0].str.strip().str.match(r"Date", case=False)].index
-    if hdr.empty:
-        st.error("Could not find 'Date' header row in the CSV.")
+    try:
+        df = loader.load_and_clean(path)
+    except ValueError as exc:
+        st.error(str(exc))
         st.stop()
-    skip = hdr[0]
-
-    # Read with proper header
-    df = pd.read_csv(path, sep=delim, skiprows=skip, low_memory=False)
-    df.columns = df.columns.str.strip()
-    df = df.loc[:, ~df.columns.str.contains(r"Status|^Unnamed", case=False)]
-
-    # Combine Date + Time into Datetime
-    if {"Date","Time"}.issubset(df.columns):
-        df.insert(0, "Datetime", pd.to_datetime(
-            df.pop("Date").str.strip() + " " + df.pop("Time").str.strip(),
-            dayfirst=True, errors="coerce"
-        ))
-        df = df.dropna(subset=["Datetime"]).reset_index(drop=True)
-
-    # Rename pollutant columns
-    rename = {}
-    for c in df.columns:
-        lc = c.lower()
-        if "nitrogen dioxide" in lc:
-            rename[c] = "Nitrogen dioxide"
-        elif "pm10" in lc:
-            rename[c] = "PM10"
-        elif "pm2.5" in lc or "pm25" in lc:
-            rename[c] = "PM2.5"
-    df = df.rename(columns=rename)
-
-    # Convert pollutant values to numeric
-    for p in ["Nitrogen dioxide","PM10","PM2.5"]:
-        if p in df.columns:
-            df[p] = (
-                df[p].astype(str)
-                     .str.replace(",", ".", regex=False)
-                     .pipe(pd.to_numeric, errors="coerce")
-            )
-    # Drop rows where all selected pollutant columns are NaN
-    pres = [p for p in ["Nitrogen dioxide","PM10","PM2.5"] if p in df.columns]
-    if pres:
-        df = df.dropna(subset=pres, how="all").reset_index(drop=True)
-
-    # Sort chronologically
-    df = df.sort_values("Datetime").reset_index(drop=True)
+    if df.attrs.get("skipped_rows"):
+        st.warning(f"Skipped {df.attrs['skipped_rows']} malformed row(s) in the CSV.")
     return df
 
+@st.cache_data(ttl=60, show_spinner=False)
+def db_sources(path: str, version: str):
+    # version is only part of the cache key: new tables show up as soon as the pipeline adds them
+    return store.connected(store.sources)(path), store.connected(store.tables_present)(path)
+
+# ── Memoized analytics ───────────────────────────────────────────────
+# keyed on the data's version and the parameters, not on the frames (see app/memo.py);
+# database reads take the db path and open a connection only on a cache miss
+query         = memo.cached(store.connected(store.query), maxsize=16, ttl=600)
+query_rollup  = memo.cached(store.connected(store.query_rollup), maxsize=16, ttl=600)
+climatology   = memo.cached(store.connected(store.climatology), maxsize=32, ttl=600)
+date_bounds   = memo.cached(store.connected(store.date_bounds), maxsize=16, ttl=600)
+aggregate     = memo.cached(analytics.aggregate, maxsize=16, ttl=900)
+with_zscores  = memo.cached(analytics.with_zscores, maxsize=16, ttl=900)
+trend_lines   = memo.cached(analytics.trend_lines, maxsize=16, ttl=900)
+hour_weekday  = memo.cached(analytics.hour_weekday_heatmap, maxsize=32, ttl=900)
+day_month     = memo.cached(analytics.day_month_heatmap, maxsize=32, ttl=900)
+summary       = memo.cached(analytics.summary, maxsize=16, ttl=900)
+latest_csv    = memo.cached(analytics.latest_by_station, maxsize=4, ttl=900)
+latest_db     = memo.cached(store.connected(store.latest_readings), maxsize=8, ttl=600)
+correlation   = memo.cached(analytics.correlation_long, maxsize=16, ttl=900)
+histogram     = memo.cached(analytics.histogram_long, maxsize=16, ttl=900)
+linear_fit    = memo.cached(analytics.linear_fit, maxsize=16, ttl=900)
+forecast      = memo.cached(analytics.harmonic_forecast, maxsize=16, ttl=900)
+stored_fc     = memo.cached(store.connected(store.forecasts), maxsize=16, ttl=600)
+
 # ── Data source selection ─────────────────────────────────────────────
 
-# Allow users to upload a CSV; otherwise fall back to default file
+# Allow users to upload a CSV; otherwise query the pipeline database,
+# falling back to the default CSV when it has not been built
 upload = st.sidebar.file_uploader("Upload UK-Air CSV", type="csv")
+db = None  # the pipeline database's path when reading from it
 if upload is not None:
     # use uploaded file
     df = load_and_clean(upload)
+    source_version = memo.version("upload", getattr(upload, "file_id", None) or (upload.name, upload.size))
     st.sidebar.success("Using uploaded CSV")
+elif DEFAULT_DB.exists():
+    source_version = memo.version("db", str(DEFAULT_DB), store.db_version(DEFAULT_DB))
+    found, present = db_sources(str(DEFAULT_DB), source_version)
+    if not found:
+        st.sidebar.error("The pipeline database has no clean tables yet. Run run_pipeline.py.")
+        st.stop()
+    db = str(DEFAULT_DB)
+    file_time = datetime.fromtimestamp(DEFAULT_DB.stat().st_mtime)
+    st.sidebar.markdown(f"**Last updated:** {file_time:%Y-%m-%d %H:%M:%S}")
+
+    # Live updates: poll the dataset version (no database access) and rerun when the watcher bumped it
+    if st.sidebar.toggle("Live updates", value=True):
+        @st.fragment(run_every=LIVE_POLL_SECONDS)
+        def poll_dataset_version(seen=source_version):
+            if memo.version("db", str(DEFAULT_DB), store.db_version(DEFAULT_DB)) != seen:
+                st.rerun()
+        poll_dataset_version()
 else:
     default = DEFAULT_CSV
     if default.exists():
         df = load_and_clean(str(default))
+        source_version = memo.version("csv", str(default), default.stat().st_mtime_ns)
         file_time = datetime.fromtimestamp(default.stat().st_mtime)
         st.sidebar.markdown(f"**Last updated:** {file_time:%Y-%m-%d %H:%M:%S}")
         if st.sidebar.button("Refresh Data"):
-            st.experimental_rerun()
+            st.rerun()
     else:
         st.sidebar.error("No default data file found. Please upload a CSV.")
         st.stop()
 
+# ── Sidebar Controls ─────────────────────────────────────────────────
+if db is not None:
+    # selections are pushed down into SQL: only these rows and columns are read
+    all_stations = list(found)
+    stations = st.sidebar.multiselect("Select stations", all_stations, default=all_stations)
+    if not stations:
+        st.warning("Please select at least one station.")
+        st.stop()
+    pollutants = store.pollutants(found, stations)
+    first, last = date_bounds(source_version, db, found, stations)
+else:
+    pollutants = [c for c in ["Nitrogen dioxide","PM10","PM2.5"] if c in df.columns]
+    first, last = (df["Datetime"].min(), df["Datetime"].max()) if "Datetime" in df.columns else (None, None)
+
+selected   = st.sidebar.multiselect("Select pollutants", pollutants, default=pollutants)
+if not selected:
+    st.warning("Please select at least one pollutant.")
+    st.stop()
+
+if first is not None and pd.notna(first):
+    picked = st.sidebar.date_input("Date range", (first.date(), last.date()),
+                                   min_value=first.date(), max_value=last.date())
+    start, end = picked if len(picked) == 2 else (picked[0], last.date())
+    start, end = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+else:
+    start = end = None
+
+agg    = st.sidebar.radio("Aggregate to", ["raw","hourly","daily","monthly"], horizontal=True)
+rolled = db is not None and agg != "raw" and present["rollups"]
+
+if rolled:
+    # aggregates come from the pipeline's rollup tables, coarsened to fit the range
+    grain = store.rollup_grain(agg, start, end)
+    if grain != agg:
+        st.sidebar.caption(f"Showing {grain} means: the range holds too many {agg} periods.")
+        agg = grain
+    df = query_rollup(source_version, db, stations, selected, agg, start, end)
+elif db is not None:
+    df = query(source_version, db, found, stations, selected, start, end)
+elif start is not None:
+    df = df[(df["Datetime"] >= start) & (df["Datetime"] < end)]
+
+data_version = memo.version(source_version, stations if db is not None else None, selected, start, end,
+                            agg if rolled else "raw")
+
 # Ensure DataFrame loaded correctly
 if df.empty:
     st.error("Loaded data is empty.")
-    st.stop()(str(DEFAULT_CSV))
+    st.stop()
 
-# ── Sidebar Controls ─────────────────────────────────────────────────
 st.sidebar.download_button(
     "Download raw filtered data",
     df.to_csv(index=False).encode(),
     file_name="aq_raw_filtered.csv"
 )
 
-pollutants = [c for c in ["Nitrogen dioxide","PM10","PM2.5"] if c in df.columns]
-selected   = st.sidebar.multiselect("Select pollutants", pollutants, default=pollutants)
-if not selected:
-    st.warning("Please select at least one pollutant.")
-    st.stop()
-
 window     = st.sidebar.slider("Rolling window (hrs)", 1, 168, 24)
 thresholds = {p: st.sidebar.number_input(f"Threshold {p}", float(df[p].median() or 0)) for p in selected}
-agg        = st.sidebar.radio("Aggregate to", ["raw","hourly","daily"], horizontal=True)
 theme      = st.sidebar.radio("Theme", ["Light","Dark"], index=0)
 palette    = st.sidebar.selectbox("Palette", ["Default","Viridis","Category10"], index=0)
+budget     = st.sidebar.number_input("Points per series", min_value=100, max_value=50_000,
+                                     value=decimate.DEFAULT_BUDGET, step=500,
+                                     help="Charts draw at most this many points per series; anomalies are always drawn")
+method     = st.sidebar.radio("Downsampling", ["lttb","minmax"], horizontal=True,
+                              format_func={"lttb":"LTTB","minmax":"Min/max"}.get)
 
 scheme = None
 if palette == "Viridis": scheme = "viridis"
 elif palette == "Category10": scheme = "category10"
 
 # ── Process data ────────────────────────────────────────────────────
-plot_df = df[["Datetime"] + selected].copy()
-if agg != "raw":
-    rule = {"hourly":"h","daily":"d"}[agg]
-    plot_df = plot_df.set_index("Datetime")[selected].resample(rule).mean().interpolate().reset_index()
-if window > 1:
-    plot_df = plot_df.set_index("Datetime")[selected].rolling(f"{window}h").mean().reset_index()
+plot_version = memo.version(data_version, selected, agg, window)
+plot_df      = aggregate(data_version, df, selected, agg, window)
 
 st.sidebar.download_button(
     "Download aggregated data",
@@ -138,9 +181,14 @@ st.sidebar.download_button(
 # ── KPI Cards ────────────────────────────────────────────────────────
 st.title("🌍 Air Quality Dashboard")
 st.markdown(f"Total records: {len(df):,}")
+# the pipeline keeps each station's latest values in latest_readings; read those instead of scanning the rows
+latest = latest_db(source_version, db, stations) if db is not None and present["latest"] else None
+if latest is not None and not latest.empty:
+    st.caption(f"Latest readings as of {latest['Datetime'].max():%Y-%m-%d %H:%M}, averaged over the selected stations")
 cols = st.columns(len(selected))
 for col, p in zip(cols, selected):
-    val = plot_df[p].iloc[-1]
+    val = (latest[p].mean() if latest is not None and p in latest.columns
+           else plot_df[p].iloc[-1])
     pct = (plot_df[p] > thresholds[p]).mean() * 100
     col.metric(f"Latest {p}", f"{val:.2f}")
     col.metric(f"% >{thresholds[p]}", f"{pct:.1f}%")
@@ -148,20 +196,32 @@ for col, p in zip(cols, selected):
         st.error(f"{p} {val:.2f} exceeds threshold {thresholds[p]}")
 
 # ── Anomalies & Trends ──────────────────────────────────────────────
-long_df = plot_df.melt(id_vars=["Datetime"], value_vars=selected,
-                       var_name="Pollutant", value_name="Value")
-z_th    = st.sidebar.slider("Anomaly z-score threshold", 1.0, 5.0, 2.0)
-long_df["zscore"] = long_df.groupby("Pollutant")["Value"].transform(lambda x: (x - x.mean())/x.std())
-
-base   = alt.Chart(long_df).encode(
+# trailing windows need several periods of the shown grain to score against; coarse grains score the whole series
+period_hours = {"raw": 1, "hourly": 1, "daily": 24, "monthly": 720}[agg]
+z_windows = [w for w in (24, 72, 168, 336, 720) if w >= 7 * period_hours] + ["all"]
+z_window = st.sidebar.select_slider("Anomaly window (hrs)", options=z_windows,
+                                    value=168 if period_hours == 1 else "all")
+z_robust = st.sidebar.radio("Anomaly score", ["z-score", "robust (MAD)"], horizontal=True) == "robust (MAD)"
+z_th     = st.sidebar.slider("Anomaly z-score threshold", 1.0, 5.0, 2.0)
+long_df  = with_zscores(plot_version, plot_df, selected, None if z_window == "all" else z_window, z_robust)
+
+# every anomaly is drawn; the rest of each series is cut to the point budget
+anomaly  = long_df["zscore"].abs() > z_th
+chart_df = decimate.decimate(long_df, "Datetime", "Value", budget, by="Pollutant", keep=anomaly, method=method)
+color    = alt.Color("Pollutant:N", scale=alt.Scale(scheme=scheme)) if scheme else alt.Color("Pollutant:N")
+
+base   = alt.Chart(chart_df).encode(
     x="Datetime:T",
     y="Value:Q",
-    color=alt.Color("Pollutant:N", scale=alt.Scale(scheme=scheme)) if scheme else alt.Color("Pollutant:N"),
+    color=color,
     tooltip=["Datetime:T","Pollutant:N","Value:Q","zscore:Q"]
 )
 lines  = base.mark_line()
 points = base.mark_point(color="red", size=60).transform_filter(f"abs(datum.zscore) > {z_th}")
-trends = base.transform_regression("Datetime","Value", groupby=["Pollutant"]).mark_line(strokeDash=[5,5])
+# trends are fitted on every point, not just the drawn ones
+trends = alt.Chart(trend_lines(plot_version, long_df)).mark_line(strokeDash=[5,5]).encode(
+    x="Datetime:T", y="Value:Q", color=color
+)
 chart  = alt.layer(lines, trends, points).interactive().properties(height=350)
 if theme == "Dark":
     chart = chart.configure_view(stroke="white").configure_axis(labelColor="white", titleColor="white")
@@ -172,11 +232,8 @@ st.dataframe(plot_df, use_container_width=True)
 
 # ── Heatmaps ───────────────────────────────────────────────────────
 p0   = selected[0]
-dh   = df[["Datetime", p0]].dropna().copy()
-dh["hour"]    = dh["Datetime"].dt.hour
-dh["weekday"] = pd.Categorical(dh["Datetime"].dt.day_name(), categories=list(calendar.day_name), ordered=True)
-
-h1 = dh.groupby(["weekday","hour"], observed=True)[p0].mean().reset_index()
+h1 = (climatology(source_version, db, stations, p0, "weekday_hour", start, end) if rolled
+      else hour_weekday(data_version, df, p0))
 heatmap1 = alt.Chart(h1).mark_rect().encode(
     x="hour:O",
     y=alt.Y("weekday:N", sort=list(calendar.day_name)),
@@ -187,10 +244,8 @@ st.subheader(f"Heatmap: {p0} by Hour & Weekday")
 st.altair_chart(heatmap1, use_container_width=True)
 
 # Monthly heatmap
-df_m = dh.copy()
-df_m["day"]   = df_m["Datetime"].dt.day
-df_m["month"] = pd.Categorical(df_m["Datetime"].dt.month_name(), categories=list(calendar.month_name)[1:], ordered=True)
-h2 = df_m.groupby(["month","day"], observed=True)[p0].mean().reset_index()
+h2 = (climatology(source_version, db, stations, p0, "month_day", start, end) if rolled
+      else day_month(data_version, df, p0))
 heatmap2 = alt.Chart(h2).mark_rect().encode(
     x="day:O",
     y=alt.Y("month:N", sort=list(calendar.month_name)[1:]),
@@ -202,13 +257,15 @@ st.altair_chart(heatmap2, use_container_width=True)
 
 # ── Statistical Summary ─────────────────────────────────────────────
 st.subheader("Statistical Summary")
-st.table(df[selected].agg(["mean","median","min","max","std"]).T)
+st.table(summary(data_version, df, selected))
 
 # ── Interactive Station Map ─────────────────────────────────────────
-if all(col in df.columns for col in ["station","latitude","longitude"]):
+last = latest if latest is not None else (
+    latest_csv(data_version, df) if "station" in df.columns else pd.DataFrame()
+)
+if all(col in last.columns for col in ["station","latitude","longitude"]):
     st.subheader("Station Map – Hover for latest values")
-    last = df.sort_values("Datetime").groupby("station").last().reset_index()
-    map_df = last[["station","latitude","longitude"] + selected]
+    map_df = last[["station","latitude","longitude"] + [p for p in selected if p in last.columns]]
     mid_lat = map_df["latitude"].mean()
     mid_lon = map_df["longitude"].mean()
     layer = pdk.Layer(
@@ -236,23 +293,20 @@ st.caption("Features: refresh · downloads · rolling · thresholds · anomalies
 # ── Concentration Distributions ────────────────────────────────────────
 st.subheader("Concentration Distributions")
 
-# use the *aggregated* (or you could swap in df for the raw) DataFrame
-dist_df = plot_df.melt(
-    id_vars=[],
-    value_vars=selected,
-    var_name="Pollutant",
-    value_name="Concentration"
-).dropna()
+# use the *aggregated* (or you could swap in df for the raw) DataFrame,
+# binned here so only the bars reach the browser
+dist_df = histogram(plot_version, plot_df, selected, maxbins=50)
 
 # build a faceted histogram, one panel per pollutant, with independent y-scales
 hist = (
     alt.Chart(dist_df)
     .mark_bar()
     .encode(
-        x=alt.X("Concentration:Q", bin=alt.Bin(maxbins=50), title="Concentration"),
-        y=alt.Y("count()", title="Frequency"),
+        x=alt.X("bin_start:Q", title="Concentration"),
+        x2="bin_end:Q",
+        y=alt.Y("count:Q", title="Frequency"),
         color=alt.Color("Pollutant:N", scale=alt.Scale(scheme=scheme)) if scheme else alt.Color("Pollutant:N"),
-        tooltip=["Pollutant:N", "count()"]
+        tooltip=["Pollutant:N", "bin_start:Q", "bin_end:Q", "count:Q"]
     )
     .properties(width=200, height=200)
     .facet(column=alt.Column("Pollutant:N", title=None, header=alt.Header(labelFontSize=12)))
@@ -274,15 +328,7 @@ st.altair_chart(hist, use_container_width=True)
 # ── Correlation Overview ────────────────────────────────────────────────
 st.subheader("Correlation Heatmap")
 # Compute pairwise correlations
-corr_mat = plot_df[selected].corr()
-
-# Melt into long form
-corr_src = (
-    corr_mat
-    .reset_index()
-    .melt(id_vars="index", var_name="variable", value_name="correlation")
-    .rename(columns={"index":"pollutant"})
-)
+corr_src = correlation(plot_version, plot_df, selected)
 
 # Altair heatmap
 heat = (
@@ -323,7 +369,7 @@ pair = st.sidebar.multiselect(
 if len(pair) == 2:
     x, y = pair
     scatter = (
-        alt.Chart(plot_df)
+        alt.Chart(decimate.thin_scatter(plot_df[["Datetime", x, y]], x, y, budget))
            .mark_circle(size=50, opacity=0.4)
            .encode(
                x=alt.X(f"{x}:Q", title=x),
@@ -331,10 +377,9 @@ if len(pair) == 2:
                tooltip=["Datetime:T", f"{x}:Q", f"{y}:Q"]
            )
     )
-    # Add a regression line
+    # Add a regression line, fitted on every point
     trend = (
-        alt.Chart(plot_df)
-           .transform_regression(x, y, method="linear")
+        alt.Chart(linear_fit(plot_version, plot_df, x, y))
            .mark_line(color="firebrick", strokeWidth=2)
            .encode(x=x, y=y)
     )
@@ -347,10 +392,8 @@ else:
 
 ########### Predictive model ###########################################
 
-import numpy as np
-
-# ── Simple Trend Forecast ──────────────────────────────────────────────
-st.subheader("Forecast: Simple Linear Trend")
+# ── Forecast ───────────────────────────────────────────────────────────
+st.subheader("Forecast: Trend + Daily/Weekly Cycles")
 
 # 1) Sidebar controls
 poll_fc = st.sidebar.selectbox(
@@ -360,50 +403,66 @@ horizon = st.sidebar.number_input(
     "Forecast horizon (periods)", min_value=1, max_value=168, value=24
 )
 
-# 2) Prepare data
-fc_df = plot_df[["Datetime", poll_fc]].dropna().reset_index(drop=True)
-if len(fc_df) < 2:
+# 2) Read the pipeline's stored forecast, or fit the same model to an uploaded/default CSV
+# infer frequency: raw/hourly → 'h', daily → 'D', monthly → 'MS'
+freq = {"raw":"h","hourly":"h","daily":"D","monthly":"MS"}[agg]
+if db is not None and present["forecasts"]:
+    stored, models = stored_fc(source_version, db, stations, poll_fc)
+    fitted = None
+    if not stored.empty:
+        fcast_df = stored if freq == "h" else stored.set_index("Datetime").resample(freq).mean().reset_index()
+        fcast_df = fcast_df.head(int(horizon))
+        if len(fcast_df) < horizon:
+            st.caption(f"The pipeline stores {len(stored)} hours of forecast; showing {len(fcast_df)} periods.")
+        info = {
+            "n_obs": int(models["n_obs"].sum()), "rmse": models["rmse"].mean(),
+            "baseline_rmse": models["baseline_rmse"].mean(),
+            "fitted_at": models["fitted_at"].max(),
+        }
+        fitted = plot_df[["Datetime", poll_fc]].dropna(), fcast_df, info
+else:
+    fitted = forecast(plot_version, plot_df, poll_fc, int(horizon), freq)
+if fitted is None:
     st.warning("Not enough data to build a forecast.")
 else:
-    # map dates to numeric (ordinal)
-    x = fc_df["Datetime"].map(lambda dt: dt.toordinal()).to_numpy()
-    y = fc_df[poll_fc].to_numpy()
-
-    # 3) Fit linear trend
-    coef = np.polyfit(x, y, 1)
-    model = np.poly1d(coef)
-
-    # 4) Build future dates
-    # infer frequency: raw/hourly → 'h', daily → 'd'
-    freq = {"raw":"h","hourly":"h","daily":"d"}[agg]
-    last = fc_df["Datetime"].iloc[-1]
-    future = pd.date_range(last, periods=horizon+1, freq=freq)[1:]
-
-    # 5) Predict
-    x_future = np.array([d.toordinal() for d in future])
-    y_future = model(x_future)
-    fcast_df = pd.DataFrame({"Datetime": future, poll_fc: y_future})
-
-    # 6) Plot history + forecast
+    fc_df, fcast_df, info = fitted
+
+    # 3) Plot history + forecast with its 95% band
     hist = (
-        alt.Chart(fc_df)
+        alt.Chart(decimate.decimate(fc_df, "Datetime", poll_fc, budget, method=method))
            .mark_line()
            .encode(x="Datetime:T", y=f"{poll_fc}:Q")
     )
+    band = (
+        alt.Chart(fcast_df)
+        .mark_area(color="orange", opacity=0.2)
+        .encode(x="Datetime:T", y="lower:Q", y2="upper:Q")
+    )
     pred = (
         alt.Chart(fcast_df)
            .mark_line(color="orange", strokeDash=[4,4])
            .encode(x="Datetime:T", y=f"{poll_fc}:Q")
     )
-    chart = (hist + pred).properties(
+    chart = (hist + band + pred).properties(
         width=700, height=300
     ).interactive()
     if theme == "Dark":
         chart = chart.configure_axis(labelColor="white", titleColor="white")
     st.altair_chart(chart, use_container_width=True)
 
-    # 7) Show model equation & metrics
-    st.markdown(f"**Trend line:** y = {coef[0]:.4e}·x + {coef[1]:.2f}")
+    # 4) Show model fit against the seasonal-naive baseline
+    fitted_at = f", fitted {info['fitted_at']:%Y-%m-%d %H:%M}" if "fitted_at" in info else ""
+    st.markdown(
+        f"**Model:** RMSE {info['rmse']:.2f} vs {info['baseline_rmse']:.2f} for repeating the last season "
+        f"({info['n_obs']} values{fitted_at})"
+    )
+
+# ── Cache statistics ────────────────────────────────────────────────
+# last on the page, so this rerun's cached calls are all counted
+with st.sidebar.expander("Cache statistics"):
+    st.dataframe(pd.DataFrame(memo.stats()).T[["hits","misses","evictions","size","maxsize"]],
+                 use_container_width=True)
+
 
 
 
@@ -0,0 +1,151 @@
+# app/decimate.py
+"""
+Point reduction for the dashboard's charts, kept free of Streamlit so the
+tests can import it. Every point handed to Altair is serialised into the
+page's Vega spec, so each series is cut to a point budget first:
+
+- lttb: Largest-Triangle-Three-Buckets, one point per bucket chosen to
+  keep the line's visual shape (peaks, troughs, slopes);
+- minmax: each bucket's lowest and highest point, so no extreme is lost.
+
+For static images (the reports), envelope() reduces a series to the
+pixel columns it is drawn at: each column's minimum and maximum, so the
+cost of drawing is set by the image width, not the data size.
+
+Points flagged by `keep` (anomalies) always survive, whatever the budget,
+and so do the first missing values of each gap, so lines still break
+where data is missing.
+"""
+import numpy as np
+import pandas as pd
+
+# points per series a chart draws by default
+DEFAULT_BUDGET = 2000
+
+
+def _numeric(values) -> np.ndarray:
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("int64").to_numpy(dtype=float)
+    return values.to_numpy(dtype=float)
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """Positions of the n_out points LTTB keeps of the series (x, y), first and last included."""
+    x, y = _numeric(x), _numeric(y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # twice the area of the triangle (previous pick, candidate, next bucket's mean)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def min_max(x, y, n_out: int) -> np.ndarray:
+    """Positions of each bucket's minimum and maximum of y, n_out // 2 buckets, in order."""
+    y = _numeric(y)
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(buckets, size)
+    used = ~np.isnan(rows).all(axis=1)
+    offsets = np.arange(buckets)[used] * size
+    picks = np.concatenate([
+        offsets + np.nanargmin(rows[used], axis=1),
+        offsets + np.nanargmax(rows[used], axis=1),
+    ])
+    return np.unique(picks)
+
+
+METHODS = {"lttb": lttb, "minmax": min_max}
+
+
+def _series_positions(x, y, budget: int, keep, method: str) -> np.ndarray:
+    missing = pd.isna(y)
+    gap_starts = missing & ~np.concatenate([[False], missing[:-1]])
+    valid = np.flatnonzero(~missing)
+    picked = valid[METHODS[method](x[valid], y[valid], budget)]
+    return np.union1d(picked, np.flatnonzero(gap_starts | keep))
+
+
+def decimate(df: pd.DataFrame, x: str, y: str, budget: int = DEFAULT_BUDGET, by: str = None,
+             keep=None, method: str = "lttb") -> pd.DataFrame:
+    """
+    The rows of df to draw: at most about `budget` per series (per value of
+    column `by`, or df as one series) chosen by `method` along x, which
+    must be sorted within each series, plus every row where keep is True.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown decimation method: {method!r}")
+    keep = np.zeros(len(df), dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    groups = [np.arange(len(df))] if by is None else list(df.groupby(by, sort=False).indices.values())
+    positions = []
+    for rows in groups:
+        if len(rows) <= budget:
+            positions.append(rows)
+            continue
+        xs, ys = df[x].to_numpy()[rows], df[y].to_numpy(dtype=float)[rows]
+        positions.append(rows[_series_positions(xs, ys, budget, keep[rows], method)])
+    return df.iloc[np.sort(np.concatenate(positions))] if positions else df
+
+
+def envelope(x, y, columns: int):
+    """
+    (x, y) to draw a series sorted by x at `columns` pixel columns: per
+    column its minimum then its maximum, at the column's centre, so every
+    peak and trough is still drawn. A column holding only missing values
+    is a NaN pair, breaking the line as the full series would. Series of
+    at most 2 · columns points are returned unchanged. Raises ValueError
+    when x is not sorted.
+    """
+    xs = _numeric(x)
+    if np.any(np.diff(xs) < 0):
+        raise ValueError("envelope() needs x sorted in ascending order")
+    y = np.asarray(y, dtype=float)
+    if len(y) <= 2 * columns:
+        return x, y
+    lo, hi = xs[0], xs[-1]
+    step = (hi - lo) / columns if hi > lo else 1.0
+    bins = np.minimum(((xs - lo) / step).astype(np.int64), columns - 1)
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]]))
+    with np.errstate(invalid="ignore"):
+        lows, highs = np.fmin.reduceat(y, starts), np.fmax.reduceat(y, starts)
+    centres = np.repeat(lo + (bins[starts] + 0.5) * step, 2)
+    if pd.api.types.is_datetime64_any_dtype(pd.Series(x)):
+        centres = centres.astype("int64").astype(pd.Series(x).dtype)
+    return centres, np.column_stack([lows, highs]).ravel()
+
+
+def thin_scatter(df: pd.DataFrame, x: str, y: str, budget: int = DEFAULT_BUDGET) -> pd.DataFrame:
+    """
+    The rows of df to draw as a scatter of y against x: one point per
+    occupied cell of a √budget × √budget grid over the data's range, so the
+    cloud's extent, density outline and outliers are all still drawn.
+    """
+    df = df.dropna(subset=[x, y])
+    if len(df) <= budget:
+        return df
+    side = max(int(np.sqrt(budget)), 1)
+    cells = []
+    for column in (x, y):
+        values = _numeric(df[column])
+        lo, hi = values.min(), values.max()
+        scale = side / (hi - lo) if hi > lo else 0.0
+        cells.append(np.minimum(((values - lo) * scale).astype(np.int64), side - 1))
+    first = ~pd.Series(cells[0] * side + cells[1]).duplicated().to_numpy()
+    return df[first]
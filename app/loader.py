@@ -0,0 +1,217 @@
+# app/loader.py
+"""
+Loading of UK-AIR hourly CSV downloads for the dashboard, kept free of
+Streamlit so the benchmarks and tests can import it.
+
+Only the first lines are scanned to find the "Date" header row under the
+download's preamble. The rest is one multi-threaded, typed pyarrow parse:
+pollutant columns straight to float64 and Date + Time parsed with a fixed
+format, so no all-string copy of the file is ever built.
+
+Malformed rows (the wrong number of fields) are skipped rather than failing
+the load; their count is logged as a warning and kept in the returned
+frame's attrs["skipped_rows"].
+"""
+import csv
+import logging
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
+
+logger = logging.getLogger(__name__)
+
+POLLUTANTS = ["Nitrogen dioxide", "PM10", "PM2.5"]
+
+# lines searched for the header row
+HEADER_SCAN_LINES = 200
+
+# value tokens UK-AIR and spreadsheet exports use for "no measurement"
+NULL_VALUES = ["", "No data", "NoData", "nodata", "NA", "N/A", "NaN", "nan", "-"]
+
+DATE_FORMATS = ["%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%d.%m.%Y"]
+TIME_FORMATS = ["%H:%M", "%H:%M:%S"]
+
+DROP_RE = re.compile(r"Status|^Unnamed|^$", re.IGNORECASE)
+
+
+def _pollutant_name(column: str):
+    lc = column.lower()
+    if "nitrogen dioxide" in lc:
+        return "Nitrogen dioxide"
+    if "pm10" in lc:
+        return "PM10"
+    if "pm2.5" in lc or "pm25" in lc:
+        return "PM2.5"
+    return None
+
+
+def _head_lines(source, n: int) -> list:
+    """The first n lines of a path or (binary or text) file object, which is rewound."""
+    if hasattr(source, "seek"):
+        lines = []
+        for _ in range(n):
+            line = source.readline()
+            if not line:
+                break
+            lines.append(line.decode("utf-8", errors="ignore") if isinstance(line, bytes) else line)
+        source.seek(0)
+        return lines
+    with open(source, "r", encoding="utf-8", errors="ignore") as f:
+        return [line for _, line in zip(range(n), f)]
+
+
+def find_header(lines: list):
+    """(row index, delimiter, column names) of the "Date" header row, or raises ValueError."""
+    delim = ","
+    for i, line in enumerate(lines):
+        try:
+            delim = csv.Sniffer().sniff(line, delimiters=",;").delimiter
+        except csv.Error:
+            continue
+        fields = next(csv.reader([line], delimiter=delim))
+        if fields and re.match(r"Date", fields[0].strip(), re.IGNORECASE):
+            return i, delim, [f.strip() for f in fields]
+    raise ValueError("Could not find 'Date' header row in the CSV.")
+
+
+def _pick_format(values, formats):
+    """The first format that parses the first non-empty sample value."""
+    sample = next((v for v in values if v), None)
+    if sample is None:
+        return formats[0]
+    for fmt in formats:
+        try:
+            pd.to_datetime(sample, format=fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+
+def _dictionary(column) -> pa.DictionaryArray:
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    return column if pa.types.is_dictionary(column.type) else column.dictionary_encode()
+
+
+def parse_datetime(date, time) -> pa.Array:
+    """
+    Datetime from the Date and Time text columns. Each distinct date and
+    time is parsed once, with the fixed format recognised from the first
+    values (dd-mm-yyyy etc.), and the per-row stamps are gathered from
+    those; rows that do not parse (UK-AIR's hour-ending "24:00") are null.
+    """
+    date, time = _dictionary(date), _dictionary(time)
+    days_text = pc.utf8_trim_whitespace(date.dictionary)
+    times_text = pc.utf8_trim_whitespace(time.dictionary)
+    date_fmt = _pick_format(days_text.to_pylist()[:100], DATE_FORMATS)
+    time_fmt = _pick_format(times_text.to_pylist()[:100], TIME_FORMATS)
+    if date_fmt is None or time_fmt is None:
+        stamps = pd.to_datetime(
+            pc.binary_join_element_wise(date.cast(pa.string()), time.cast(pa.string()), " ").to_pandas(),
+            dayfirst=True, errors="coerce",
+        )
+        return pa.array(stamps, type=pa.timestamp("us"))
+    days = pc.strptime(days_text, format=date_fmt, unit="us", error_is_null=True)
+    clock = pc.strptime(
+        pc.binary_join_element_wise("1970-01-01", times_text, " "),
+        format=f"%Y-%m-%d {time_fmt}", unit="us", error_is_null=True,
+    )
+    day_us = days.take(date.indices).cast(pa.int64())
+    time_us = clock.take(time.indices).cast(pa.int64())
+    return pc.add(day_us, time_us).cast(pa.timestamp("us"))
+
+
+def _read(source, skip: int, delim: str, names: list, keep: list, float_cols: list):
+    """
+    Typed pyarrow read of the kept columns, named by position to survive
+    duplicate headers. Returns (table, number of malformed rows skipped).
+    """
+    if hasattr(source, "seek"):
+        source.seek(0)
+        data = source.read()
+        source = pa.BufferReader(data.encode() if isinstance(data, str) else data)
+    generated = [f"c{i}" for i in range(len(names))]
+    skipped = []
+
+    def skip_malformed(row):
+        skipped.append(row.number)
+        return "skip"
+
+    table = pa_csv.read_csv(
+        source,
+        read_options=pa_csv.ReadOptions(skip_rows=skip + 1, column_names=generated, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=delim, invalid_row_handler=skip_malformed),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=[generated[i] for i in keep],
+            column_types={
+                generated[i]: pa.float64() if i in float_cols else pa.dictionary(pa.int32(), pa.string())
+                for i in keep
+            },
+            null_values=NULL_VALUES,
+            strings_can_be_null=True,
+            decimal_point="," if delim == ";" else ".",
+        ),
+    )
+    return table, len(skipped)
+
+
+def load_and_clean(path) -> pd.DataFrame:
+    """
+    Read a UK-AIR CSV (a path or an uploaded file object): skip the preamble
+    above the "Date" header row, drop status/unnamed columns, combine Date +
+    Time into Datetime, normalise the pollutant column names and values, and
+    drop rows where every pollutant is missing. Raises ValueError when no
+    header row is found. Malformed rows are skipped and counted in
+    attrs["skipped_rows"].
+    """
+    skip, delim, names = find_header(_head_lines(path, HEADER_SCAN_LINES))
+    keep = [i for i, name in enumerate(names) if not DROP_RE.search(name)]
+    pollutant_cols = [i for i in keep if _pollutant_name(names[i])]
+
+    try:
+        table, skipped = _read(path, skip, delim, names, keep, pollutant_cols)
+    except pa.ArrowInvalid:
+        # a pollutant column holds something other than numbers: read it as text and coerce below
+        table, skipped = _read(path, skip, delim, names, keep, [])
+    if skipped:
+        logger.warning("Skipped %d malformed row(s) in %s", skipped, getattr(path, "name", path))
+    columns = {names[i]: table.column(f"c{i}") for i in keep}
+
+    out = {}
+    if "Date" in columns and "Time" in columns:
+        out["Datetime"] = parse_datetime(columns.pop("Date"), columns.pop("Time"))
+    for name, values in columns.items():
+        pollutant = _pollutant_name(name)
+        if pollutant is None:
+            out[name] = values.cast(pa.string()) if pa.types.is_dictionary(values.type) else values
+        elif pa.types.is_floating(values.type):
+            out[pollutant] = values
+        else:
+            text = pc.replace_substring(values.cast(pa.string()), ",", ".")
+            out[pollutant] = pa.array(pd.to_numeric(text.to_pandas(), errors="coerce"), type=pa.float64())
+    table = pa.table(out)
+
+    # Drop rows without a Datetime or with every pollutant missing
+    keep_rows = None
+    if "Datetime" in table.column_names:
+        keep_rows = pc.is_valid(table["Datetime"])
+    pres = [p for p in POLLUTANTS if p in table.column_names]
+    if pres:
+        any_value = pc.is_valid(table[pres[0]])
+        for p in pres[1:]:
+            any_value = pc.or_(any_value, pc.is_valid(table[p]))
+        keep_rows = any_value if keep_rows is None else pc.and_(keep_rows, any_value)
+    if keep_rows is not None and not pc.all(keep_rows).as_py():
+        table = table.filter(keep_rows)
+
+    # Sort chronologically (downloads usually are already)
+    if "Datetime" in table.column_names and table.num_rows > 1:
+        stamps = table["Datetime"]
+        if not pc.all(pc.greater_equal(stamps.slice(1), stamps.slice(0, table.num_rows - 1))).as_py():
+            table = table.take(pc.sort_indices(table, sort_keys=[("Datetime", "ascending")]))
+    df = table.to_pandas(self_destruct=True, split_blocks=True)
+    df.attrs["skipped_rows"] = skipped
+    return df
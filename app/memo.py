@@ -0,0 +1,125 @@
+# app/memo.py
+"""
+Memoization of the dashboard's derived analytics, kept free of Streamlit
+so the tests can import it.
+
+cached(fn) wraps fn(data, *params) as wrapper(version, data, *params):
+results are keyed on a version string identifying the data (see
+version()) and the parameters, never on the data itself, so a hit costs
+no hashing of frames. Each wrapped function has its own bounded cache
+with LRU eviction and an optional TTL, and counts its hits and misses.
+
+app.py is executed again on every rerun, so caches live in this module's
+registry, found again by function name, rather than in the script.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+_CACHES = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+class Cache:
+    """A bounded map evicting the least recently used entry, whose entries also expire ttl seconds after storing."""
+
+    def __init__(self, maxsize: int = 64, ttl: float = None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key → (stored at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """(True, value) for a live entry, which becomes the most recently used; (False, None) otherwise."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                del self._data[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self._clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+            }
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(value))
+    return value
+
+
+def version(*parts) -> str:
+    """A short stable hash of parts (paths, mtimes, filters...) identifying one version of a dataset."""
+    return hashlib.sha1(repr(_hashable(parts)).encode()).hexdigest()[:16]
+
+
+def cached(fn, maxsize: int = 64, ttl: float = None, data_args: int = 1, name: str = None):
+    """
+    fn memoized as wrapper(version, *args, **kwargs): the first data_args
+    positional args are the data, passed to fn but left out of the key,
+    which is version plus the remaining args and kwargs (made hashable).
+    Wrapping the same function again reuses its cache.
+    """
+    name = name or f"{fn.__module__}.{fn.__qualname__}"
+    with _REGISTRY_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None or (cache.maxsize, cache.ttl) != (maxsize, ttl):
+            cache = _CACHES[name] = Cache(maxsize, ttl)
+
+    @functools.wraps(fn)
+    def wrapper(data_version, *args, **kwargs):
+        key = (data_version, _hashable(args[data_args:]), _hashable(kwargs))
+        hit, value = cache.get(key)
+        if hit:
+            return value
+        value = fn(*args, **kwargs)
+        cache.put(key, value)
+        return value
+
+    wrapper.cache = cache
+    return wrapper
+
+
+def stats() -> dict:
+    """{function name: Cache.info()} for every cached function."""
+    with _REGISTRY_LOCK:
+        caches = dict(_CACHES)
+    return {name: cache.info() for name, cache in sorted(caches.items())}
+
+
+def clear():
+    """Empty every cache (their counters are kept)."""
+    with _REGISTRY_LOCK:
+        caches = list(_CACHES.values())
+    for cache in caches:
+        cache.clear()
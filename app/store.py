@@ -0,0 +1,354 @@
+# app/store.py
+"""
+The dashboard's DuckDB data path: read-only queries against the pipeline's
+clean_* and rollup_* tables, kept free of Streamlit so the tests can import it.
+
+Each rerun's station, pollutant and date-range selections become the
+query's projection and WHERE clause, so DuckDB skips the other columns and
+the row groups outside the range, and only the rows that are drawn reach
+pandas. The dashboard runs each query through connected(), on a read-only
+connection opened for it and closed as soon as it returns, so the
+pipeline's live watcher (prototype/pipeline/watch.py) can take the write
+lock between queries; every query runs on its own cursor, since a DuckDB
+connection must not be used from two threads.
+
+Aggregated views read the pipeline's rollups (see prototype/rollup)
+instead of resampling raw rows: the table of the selected grain, or a
+coarser one when the date range would hold more than MAX_PERIODS periods.
+Forecasts are read as stored by the pipeline (see prototype/forecast),
+never fitted here, and the map and KPI cards read each station's latest
+values from the latest_readings table the clean stage keeps current.
+"""
+import calendar
+import functools
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from app.loader import POLLUTANTS
+from prototype.pipeline.watch import connect_when_free, read_version
+
+DEFAULT_DB = Path("data") / "airquality.duckdb"
+
+# pipeline column → dashboard name
+POLLUTANT_COLUMNS = {"no2": "Nitrogen dioxide", "pm10": "PM10", "pm25": "PM2.5"}
+
+# aggregation → (rollup table, period length), finest first
+ROLLUPS = {
+    "hourly": ("rollup_hourly", pd.Timedelta(hours=1)),
+    "daily": ("rollup_daily", pd.Timedelta(days=1)),
+    "monthly": ("rollup_monthly", pd.Timedelta(days=30)),
+}
+
+# periods one aggregated chart is allowed to draw
+MAX_PERIODS = 5000
+
+
+@dataclass(frozen=True)
+class Source:
+    """Where one station's rows live: its clean table and that table's columns."""
+    table: str
+    columns: tuple
+    keyed: bool  # rows of several stations, told apart by a station column
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _timestamp(value) -> str:
+    return f"TIMESTAMP '{pd.Timestamp(value):%Y-%m-%d %H:%M:%S}'"
+
+
+def connect(db_path=DEFAULT_DB, timeout: float = 10.0):
+    """A read-only connection to the pipeline database, waiting up to timeout seconds for a writer to finish."""
+    return connect_when_free(db_path, read_only=True, timeout=timeout)
+
+
+def connected(fn):
+    """fn(con, ...) as f(db_path, ...): run on its own read-only connection, closed as soon as fn returns."""
+    @functools.wraps(fn)
+    def run(db_path, *args, **kwargs):
+        con = connect(db_path)
+        try:
+            return fn(con, *args, **kwargs)
+        finally:
+            con.close()
+    return run
+
+
+def tables_present(con) -> dict:
+    """Which of the pipeline's optional outputs this database has: {"rollups", "latest", "forecasts": bool}."""
+    return {"rollups": has_rollups(con), "latest": has_latest(con), "forecasts": has_forecasts(con)}
+
+
+def db_version(db_path=DEFAULT_DB) -> tuple:
+    """
+    The dataset version the live watcher last bumped, and the size and
+    mtime of the database file and its write-ahead log, which change
+    whenever the pipeline commits.
+    """
+    parts = [read_version(db_path).get("version")]
+    for path in (Path(db_path), Path(f"{db_path}.wal")):
+        stat = path.stat() if path.exists() else None
+        parts.append((stat.st_size, stat.st_mtime_ns) if stat else None)
+    return tuple(parts)
+
+
+def sources(con) -> dict:
+    """
+    {station: Source} for every clean_* table with a datetime column
+    (clean_metrics has none). Tables with a station column contribute each
+    of their stations; a per-site table is one station named after the
+    table without its clean_ prefix.
+    """
+    cur = con.cursor()
+    tables = cur.execute(
+        """
+        SELECT table_name, list(column_name ORDER BY ordinal_position)
+        FROM information_schema.columns
+        WHERE table_name LIKE 'clean\\_%' ESCAPE '\\'
+        GROUP BY table_name ORDER BY table_name
+        """
+    ).fetchall()
+    found = {}
+    for table, columns in tables:
+        if "datetime" not in columns:
+            continue
+        if "station" in columns:
+            names = cur.execute(
+                f"SELECT DISTINCT station FROM {_quote(table)} WHERE station IS NOT NULL ORDER BY station"
+            ).fetchall()
+            for (name,) in names:
+                found[str(name)] = Source(table, tuple(columns), True)
+        else:
+            found[table[len("clean_"):]] = Source(table, tuple(columns), False)
+    return found
+
+
+def _pollutant_columns(source: Source) -> dict:
+    """{dashboard name: column} for the pollutants source has."""
+    return {POLLUTANT_COLUMNS[c]: c for c in source.columns if c in POLLUTANT_COLUMNS}
+
+
+def pollutants(found: dict, stations: list) -> list:
+    """The dashboard pollutants measured at any of the stations, in POLLUTANTS order."""
+    names = set()
+    for station in stations:
+        names.update(_pollutant_columns(found[station]))
+    return [p for p in POLLUTANTS if p in names]
+
+
+def _by_table(found: dict, stations: list) -> dict:
+    tables = {}
+    for station in stations:
+        tables.setdefault(found[station].table, (found[station], []))[1].append(station)
+    return tables
+
+
+def _where(source: Source, stations: list, start=None, end=None) -> str:
+    predicates = []
+    if source.keyed:
+        predicates.append(f"station IN ({', '.join(_literal(s) for s in stations)})")
+    if start is not None:
+        predicates.append(f"datetime >= {_timestamp(start)}")
+    if end is not None:
+        predicates.append(f"datetime < {_timestamp(end)}")
+    return f" WHERE {' AND '.join(predicates)}" if predicates else ""
+
+
+def date_bounds(con, found: dict, stations: list):
+    """(first, last) datetime over the stations' rows, or (None, None) without any."""
+    parts = [
+        f"SELECT min(datetime) AS lo, max(datetime) AS hi FROM {_quote(table)}{_where(source, names)}"
+        for table, (source, names) in _by_table(found, stations).items()
+    ]
+    if not parts:
+        return None, None
+    lo, hi = con.cursor().execute(f"SELECT min(lo), max(hi) FROM ({' UNION ALL '.join(parts)})").fetchone()
+    return (pd.Timestamp(lo) if lo is not None else None, pd.Timestamp(hi) if hi is not None else None)
+
+
+def query(con, found: dict, stations: list, selected: list, start=None, end=None,
+          by_station: bool = False) -> pd.DataFrame:
+    """
+    Datetime plus the selected pollutants for start <= datetime < end
+    (either bound may be None), read only from the stations' tables and
+    columns. Unless by_station, several stations are averaged per
+    timestamp inside DuckDB, so one row per hour comes back; otherwise a
+    station column is added and rows are ordered by Datetime, station.
+    """
+    parts = []
+    for table, (source, names) in _by_table(found, stations).items():
+        columns = _pollutant_columns(source)
+        station = "station" if source.keyed else f"{_literal(names[0])} AS station"
+        values = [
+            f"{_quote(columns[p])} AS {_quote(p)}" if p in columns else f"NULL::DOUBLE AS {_quote(p)}"
+            for p in selected
+        ]
+        parts.append(
+            f"SELECT datetime, {', '.join([station] + values)} "
+            f"FROM {_quote(table)}{_where(source, names, start, end)}"
+        )
+    if not parts:
+        return pd.DataFrame(columns=["Datetime"] + selected)
+    rows = " UNION ALL ".join(parts)
+    quoted = [_quote(p) for p in selected]
+    if by_station:
+        sql = (
+            f"SELECT datetime AS \"Datetime\", station{''.join(', ' + q for q in quoted)} "
+            f"FROM ({rows}) ORDER BY datetime, station"
+        )
+    else:
+        sql = (
+            f"SELECT datetime AS \"Datetime\"{''.join(f', avg({q}) AS {q}' for q in quoted)} "
+            f"FROM ({rows}) GROUP BY datetime ORDER BY datetime"
+        )
+    df = con.cursor().execute(sql).df()
+    df["Datetime"] = df["Datetime"].astype("datetime64[us]")
+    return df
+
+
+def _has_table(con, table: str) -> bool:
+    return bool(con.cursor().execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]
+    ).fetchone()[0])
+
+
+def has_rollups(con) -> bool:
+    """Whether the pipeline's rollup stage has run on this database."""
+    return _has_table(con, "rollup_hourly")
+
+
+def has_latest(con) -> bool:
+    """Whether the clean stage has recorded latest readings in this database."""
+    return _has_table(con, "latest_readings")
+
+
+def latest_readings(con, stations: list) -> pd.DataFrame:
+    """
+    One row per station: its latest value of every measured column
+    (pollutants under their dashboard names, others such as latitude and
+    longitude as they are) and Datetime, when the newest of them was taken.
+    """
+    df = con.cursor().execute(
+        "SELECT station, pollutant, datetime, value FROM latest_readings "
+        f"WHERE station IN ({', '.join(_literal(s) for s in stations)}) ORDER BY datetime"
+    ).df()
+    if df.empty:
+        return pd.DataFrame(columns=["station", "Datetime"])
+    # a station split over several tables keeps the newest value of each column
+    wide = df.pivot_table(index="station", columns="pollutant", values="value", aggfunc="last")
+    wide = wide.rename(columns=POLLUTANT_COLUMNS)
+    wide.columns.name = None
+    wide.insert(0, "Datetime", df.groupby("station")["datetime"].max().astype("datetime64[us]"))
+    return wide.reset_index()
+
+
+def has_forecasts(con) -> bool:
+    """Whether the pipeline's forecast stage has run on this database."""
+    return _has_table(con, "forecasts")
+
+
+def rollup_grain(agg: str, start=None, end=None, max_periods: int = MAX_PERIODS) -> str:
+    """The aggregation to read: agg, or the first coarser one fitting start..end in max_periods periods."""
+    grains = list(ROLLUPS)
+    grain = agg
+    if start is None or end is None:
+        return grain
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    while span / ROLLUPS[grain][1] > max_periods and grains.index(grain) + 1 < len(grains):
+        grain = grains[grains.index(grain) + 1]
+    return grain
+
+
+def _rollup_where(stations: list, selected: list, bounds: list) -> str:
+    columns = [c for c, name in POLLUTANT_COLUMNS.items() if name in selected]
+    predicates = [
+        f"station IN ({', '.join(_literal(s) for s in stations)})",
+        f"pollutant IN ({', '.join(_literal(c) for c in columns) or 'NULL'})",
+    ] + bounds
+    return " WHERE " + " AND ".join(predicates)
+
+
+def _weighted_means(selected: list) -> str:
+    """One count-weighted mean column per selected pollutant, over rows in long form."""
+    names = {name: c for c, name in POLLUTANT_COLUMNS.items()}
+    return ", ".join(
+        f"sum(mean * count) FILTER (WHERE pollutant = {_literal(names[p])}) / "
+        f"sum(count) FILTER (WHERE pollutant = {_literal(names[p])}) AS {_quote(p)}"
+        for p in selected
+    )
+
+
+def query_rollup(con, stations: list, selected: list, grain: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Datetime plus the selected pollutants' means per grain period starting
+    in start..end, from the rollup table of that grain, stations averaged
+    with each weighted by its number of hourly values.
+    """
+    table = ROLLUPS[grain][0]
+    bounds = []
+    if start is not None:
+        bounds.append(f"period >= {_timestamp(start)}")
+    if end is not None:
+        bounds.append(f"period < {_timestamp(end)}")
+    df = con.cursor().execute(
+        f"SELECT period AS \"Datetime\", {_weighted_means(selected)} FROM {table}"
+        f"{_rollup_where(stations, selected, bounds)} GROUP BY period ORDER BY period"
+    ).df()
+    df["Datetime"] = df["Datetime"].astype("datetime64[us]")
+    return df
+
+
+def climatology(con, stations: list, pollutant: str, kind: str, start=None, end=None) -> pd.DataFrame:
+    """
+    The mean of pollutant per (weekday, hour) for kind="weekday_hour" or per
+    (month, day) for kind="month_day", over the years start..end touch, in
+    the shape of app.analytics' hour_weekday_heatmap / day_month_heatmap.
+    """
+    table, keys = {
+        "weekday_hour": ("rollup_weekday_hour", ["weekday", "hour"]),
+        "month_day": ("rollup_month_day", ["month", "day"]),
+    }[kind]
+    bounds = []
+    if start is not None:
+        bounds.append(f"year >= {pd.Timestamp(start).year}")
+    if end is not None:
+        bounds.append(f"year <= {(pd.Timestamp(end) - pd.Timedelta(microseconds=1)).year}")
+    df = con.cursor().execute(
+        f"SELECT {', '.join(keys)}, {_weighted_means([pollutant])} FROM {table}"
+        f"{_rollup_where(stations, [pollutant], bounds)} "
+        f"GROUP BY ALL ORDER BY ALL"
+    ).df()
+    if kind == "weekday_hour":
+        names = list(calendar.day_name)
+        df["weekday"] = pd.Categorical(df["weekday"].map(lambda d: names[d - 1]), categories=names, ordered=True)
+    else:
+        names = list(calendar.month_name)[1:]
+        df["month"] = pd.Categorical(df["month"].map(lambda m: names[m - 1]), categories=names, ordered=True)
+    return df
+
+
+def forecasts(con, stations: list, pollutant: str):
+    """
+    The pipeline's stored hourly forecast of pollutant, stations averaged:
+    (Datetime, pollutant, lower, upper rows, and the models behind it, one
+    row per station with its training span, n_obs, rmse and baseline_rmse).
+    """
+    where = _rollup_where(stations, [pollutant], [])
+    df = con.cursor().execute(
+        f"SELECT datetime AS \"Datetime\", avg(forecast) AS {_quote(pollutant)}, avg(lower) AS lower, "
+        f"avg(upper) AS upper FROM forecasts{where} GROUP BY datetime ORDER BY datetime"
+    ).df()
+    df["Datetime"] = df["Datetime"].astype("datetime64[us]")
+    models = con.cursor().execute(
+        "SELECT station, trained_from, trained_to, n_obs, rmse, baseline_rmse, fitted_at "
+        f"FROM forecast_models{where} ORDER BY station"
+    ).df()
+    return df, models
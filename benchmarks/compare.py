@@ -0,0 +1,40 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark JSON files (see run.py): wall time per size and
+benchmark, and the ratio new/old.
+
+    python -m benchmarks.compare old.json new.json
+"""
+import json
+from pathlib import Path
+
+import click
+
+
+def compare(old: dict, new: dict) -> list:
+    """(size, benchmark, old seconds, new seconds, ratio) for every pair present in both."""
+    before = {(r["size"], r["benchmark"]): r["wall_seconds"] for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        key = (r["size"], r["benchmark"])
+        if key in before:
+            ratio = r["wall_seconds"] / before[key] if before[key] else None
+            rows.append((*key, before[key], r["wall_seconds"], ratio))
+    return rows
+
+
+@click.command()
+@click.argument("old", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--threshold", default=1.2, show_default=True, help="Flag ratios above this as regressions")
+def main(old: Path, new: Path, threshold: float):
+    """Print a table of old vs new wall times."""
+    a, b = json.loads(old.read_text()), json.loads(new.read_text())
+    click.echo(f"{(a.get('commit') or '?')[:10]} → {(b.get('commit') or '?')[:10]}")
+    for size, name, t_old, t_new, ratio in compare(a, b):
+        flag = "  ⚠ regression" if ratio and ratio > threshold else ""
+        click.echo(f"{size:>5} {name:<24} {t_old:10.3f}s {t_new:10.3f}s {ratio:6.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    main()
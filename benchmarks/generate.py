@@ -0,0 +1,158 @@
+# benchmarks/generate.py
+"""
+Deterministic synthetic air-quality data for the benchmarks.
+
+Every station's series is built year by year from its own seeded RNG, so
+the same (seed, station, year) always yields the same rows whichever
+file format or size it ends up in. Series have diurnal, weekly and
+seasonal cycles plus noise, outages (runs of missing hours, up to three
+days) and short runs of missing values per pollutant.
+
+Two shapes are written from the same data:
+  * pipeline CSVs, one per station (datetime + pollutant codes), the input
+    of ingest/clean;
+  * a UK-AIR download (preamble lines, Date/Time columns, a Status column
+    per pollutant, dd-mm-yyyy dates), the input of the dashboard's
+    load_and_clean. Stations are stacked in time order with a station
+    column, so a single file reaches the larger sizes.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+START = pd.Timestamp("2015-01-01")
+HOURS_PER_YEAR = 8760
+
+# name in UK-AIR downloads, typical level (µg/m³)
+POLLUTANTS = {
+    "no2": ("Nitrogen dioxide", 30.0),
+    "pm10": ("PM10 particulate matter (Hourly measured)", 20.0),
+    "pm25": ("PM2.5 particulate matter (Hourly measured)", 12.0),
+    "o3": ("Ozone", 45.0),
+    "so2": ("Sulphur dioxide", 4.0),
+}
+
+# (stations, years) per named size: about 10k, 1M and 50M rows before gaps
+SIZES = {
+    "10k": (1, 1.15),
+    "1M": (12, 9.5),
+    "50M": (600, 9.5),
+}
+
+OUTAGE_RATE = 0.002     # outages started per hour
+NULL_RATE = 0.01        # null runs started per hour and pollutant
+
+
+def station_name(i: int) -> str:
+    return f"site_{i:04d}"
+
+
+def station_block(seed: int, station: int, block: int, hours: int, pollutants) -> pd.DataFrame:
+    """Rows of one station for hours [block * HOURS_PER_YEAR, + hours), outages removed."""
+    rng = np.random.default_rng([seed, station, block])
+    first = block * HOURS_PER_YEAR
+    t = np.arange(first, first + hours)
+    stamps = START + pd.to_timedelta(t, unit="h")
+    hour, weekday = stamps.hour.to_numpy(), stamps.dayofweek.to_numpy()
+    day_of_year = stamps.dayofyear.to_numpy()
+
+    data = {"datetime": stamps}
+    site_level = 0.6 + 0.8 * np.random.default_rng([seed, station]).random()
+    for code in pollutants:
+        level = POLLUTANTS.get(code, (code, 20.0))[1] * site_level
+        cycle = (
+            1
+            + 0.35 * np.sin(2 * np.pi * (hour - 8) / 24)
+            - 0.15 * (weekday >= 5)
+            + 0.25 * np.cos(2 * np.pi * day_of_year / 365.25)
+        )
+        values = np.round(np.maximum(level * cycle * rng.gamma(8.0, 1 / 8.0, size=hours), 0), 1)
+        for start in np.flatnonzero(rng.random(hours) < NULL_RATE):
+            values[start:start + rng.integers(1, 6)] = np.nan
+        data[code] = values
+
+    keep = np.ones(hours, dtype=bool)
+    for start in np.flatnonzero(rng.random(hours) < OUTAGE_RATE):
+        keep[start:start + rng.integers(1, 73)] = False
+    return pd.DataFrame(data)[keep].reset_index(drop=True)
+
+
+def _blocks(years: float):
+    total = int(round(years * HOURS_PER_YEAR))
+    for block in range(-(-total // HOURS_PER_YEAR)):
+        yield block, min(HOURS_PER_YEAR, total - block * HOURS_PER_YEAR)
+
+
+def write_pipeline_csvs(out_dir, stations: int, years: float, pollutants, seed: int = 0) -> int:
+    """One <station>.csv per station in out_dir. Returns the number of rows written."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    for i in range(stations):
+        path = out_dir / f"{station_name(i)}.csv"
+        for block, hours in _blocks(years):
+            frame = station_block(seed, i, block, hours, pollutants)
+            frame.to_csv(path, mode="w" if block == 0 else "a", header=block == 0, index=False,
+                         date_format="%Y-%m-%d %H:%M:%S")
+            rows += len(frame)
+    return rows
+
+
+def write_ukair_csv(path, stations: int, years: float, pollutants, seed: int = 0) -> int:
+    """The same data as a single UK-AIR style download. Returns the number of data rows."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    names = [POLLUTANTS.get(code, (code.upper(), 0))[0] for code in pollutants]
+    header = ["Date", "Time"]
+    for name in names:
+        header += [name, "Status"]
+    header.append("station")
+    pad = "," * (len(header) - 1)
+    rows = 0
+    with open(path, "w", newline="") as f:
+        f.write(f"Hourly measurement data supplied by UK-air on {START:%d/%m/%Y}{pad}\n")
+        f.write(f"All Data GMT hour ending{pad}\n")
+        f.write(f"Status: V=Verified P=Provisionally Verified N=Not Verified S=Suspect{pad}\n")
+        f.write(",".join(header) + "\n")
+        for block, hours in _blocks(years):
+            frames = []
+            for i in range(stations):
+                frame = station_block(seed, i, block, hours, pollutants)
+                frame["station"] = station_name(i)
+                frames.append(frame)
+            block_df = pd.concat(frames).sort_values("datetime", kind="stable")
+            out = pd.DataFrame({
+                "Date": block_df["datetime"].dt.strftime("%d-%m-%Y"),
+                "Time": block_df["datetime"].dt.strftime("%H:%M"),
+            })
+            for code, name in zip(pollutants, names):
+                values = block_df[code]
+                out[name] = values
+                out[f"{name} status"] = np.where(values.isna(), "", "V ug/m3")
+            out["station"] = block_df["station"]
+            out.to_csv(f, header=False, index=False)
+            rows += len(out)
+    return rows
+
+
+def ensure_dataset(work_dir, stations: int, years: float, pollutants, seed: int = 0) -> dict:
+    """
+    Generate (or reuse, when the parameters match) a dataset under work_dir.
+    Returns its description: raw_dir, ukair_csv, rows and the parameters.
+    """
+    pollutants = list(pollutants)
+    params = {"stations": stations, "years": years, "pollutants": pollutants, "seed": seed}
+    key = f"s{stations}_y{years}_p{'-'.join(pollutants)}_seed{seed}"
+    root = Path(work_dir) / key
+    meta = root / "dataset.json"
+    if meta.exists():
+        described = json.loads(meta.read_text())
+        if described["params"] == params:
+            return described
+    rows = write_pipeline_csvs(root / "raw", stations, years, pollutants, seed)
+    write_ukair_csv(root / "ukair.csv", stations, years, pollutants, seed)
+    described = {"raw_dir": str(root / "raw"), "ukair_csv": str(root / "ukair.csv"), "rows": rows, "params": params}
+    meta.write_text(json.dumps(described, indent=2))
+    return described
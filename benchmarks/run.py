@@ -0,0 +1,144 @@
+# benchmarks/run.py
+"""
+Time ingest, clean, the dashboard's load_and_clean and its frame
+computations on generated data of several sizes, and write the results
+as JSON (one record per size and benchmark) for comparison between
+commits with benchmarks/compare.py.
+
+    python -m benchmarks.run --size 10k --size 1M --output bench.json
+"""
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from app import analytics
+from app.loader import load_and_clean
+from benchmarks.generate import POLLUTANTS, SIZES, ensure_dataset
+from prototype.cleaning.clean import clean
+from prototype.ingestion.ingest import ingest
+from prototype.pipeline.instrument import Meter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORK_DIR = Path(".bench_data")
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parents[1],
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _measure(name: str, rows: int, fn, repeat: int = 1):
+    """Run fn repeat times; keep the fastest run's figures. Returns (record, fn's last result)."""
+    best, result = None, None
+    for _ in range(repeat):
+        with Meter() as meter:
+            result = fn()
+        if best is None or meter.wall_seconds < best["wall_seconds"]:
+            best = meter.as_dict()
+    record = {"benchmark": name, "rows": rows, **best,
+              "rows_per_sec": rows / best["wall_seconds"] if best["wall_seconds"] else None}
+    logger.info("%-24s %12d rows %10.3fs", name, rows, best["wall_seconds"])
+    return record, result
+
+
+def run_size(dataset: dict, work_dir: Path, repeat: int = 1) -> list:
+    """Every benchmark on one generated dataset."""
+    rows = dataset["rows"]
+    db = Path(work_dir) / "bench.duckdb"
+    records = []
+
+    def fresh_ingest():
+        db.unlink(missing_ok=True)
+        return ingest(dataset["raw_dir"], db, layout="observations")
+
+    record, _ = _measure("ingest", rows, fresh_ingest)
+    records.append(record)
+    record, _ = _measure("clean", rows, lambda: clean(str(db)))
+    records.append(record)
+    db.unlink(missing_ok=True)
+
+    record, df = _measure("load_and_clean", rows, lambda: load_and_clean(dataset["ukair_csv"]))
+    records.append(record)
+    selected = [c for c in ("Nitrogen dioxide", "PM10", "PM2.5") if c in df.columns] or \
+        [c for c in df.columns if c not in ("Datetime", "station")]
+    n = len(df)
+    computations = {
+        "resample_hourly": lambda: analytics.aggregate(df, selected, "hourly"),
+        "resample_daily": lambda: analytics.aggregate(df, selected, "daily"),
+        "rolling_24h": lambda: analytics.aggregate(df, selected, "raw", 24),
+        "zscores": lambda: analytics.with_zscores(df, selected),
+        "zscores_rolling_168h": lambda: analytics.with_zscores(df, selected, 168),
+        "zscores_robust_168h": lambda: analytics.with_zscores(df, selected, 168, robust=True),
+        "heatmap_hour_weekday": lambda: analytics.hour_weekday_heatmap(df, selected[0]),
+        "heatmap_day_month": lambda: analytics.day_month_heatmap(df, selected[0]),
+        "correlation": lambda: analytics.correlation_long(df, selected),
+    }
+    for name, fn in computations.items():
+        record, _ = _measure(name, n, fn, repeat)
+        records.append(record)
+    return records
+
+
+def run(sizes, work_dir=DEFAULT_WORK_DIR, pollutants=("no2", "pm10", "pm25"), stations=None, years=None,
+        seed: int = 0, repeat: int = 1) -> dict:
+    """
+    Run the suite for each named size (see generate.SIZES); stations/years
+    override the size's own. Returns the JSON-ready report.
+    """
+    work_dir = Path(work_dir)
+    results = []
+    for size in sizes:
+        n_stations, n_years = SIZES[size]
+        dataset = ensure_dataset(work_dir, stations or n_stations, years or n_years, pollutants, seed)
+        logger.info("▶ size %s: %d rows (%s)", size, dataset["rows"], dataset["params"])
+        for record in run_size(dataset, work_dir, repeat):
+            results.append({"size": size, **dataset["params"], **record})
+    return {
+        "commit": _commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+@click.command()
+@click.option("--size", "sizes", multiple=True, type=click.Choice(list(SIZES)), default=["10k"],
+              show_default=True, help="Dataset size to run (repeatable)")
+@click.option("--stations", type=click.IntRange(min=1), default=None, help="Override the size's station count")
+@click.option("--years", type=click.FloatRange(min=0.01), default=None, help="Override the size's years of data")
+@click.option("--pollutant", "pollutants", multiple=True, type=click.Choice(list(POLLUTANTS)),
+              default=["no2", "pm10", "pm25"], show_default=True, help="Pollutant columns (repeatable)")
+@click.option("--seed", default=0, show_default=True, help="Generator seed")
+@click.option("--repeat", default=3, show_default=True, type=click.IntRange(min=1),
+              help="Runs per dashboard computation (the fastest is kept)")
+@click.option("--work-dir", default=DEFAULT_WORK_DIR, show_default=True, type=click.Path(path_type=Path),
+              help="Where generated data is kept between runs")
+@click.option("--output", default="bench_results.json", show_default=True, type=click.Path(path_type=Path),
+              help="JSON file to write")
+@click.option("--clear-data", is_flag=True, help="Delete the generated data afterwards")
+def main(sizes, stations, years, pollutants, seed, repeat, work_dir, output, clear_data):
+    """Command-line entry point for the benchmark suite."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    report = run(sizes, work_dir, pollutants, stations, years, seed, repeat)
+    output.write_text(json.dumps(report, indent=2))
+    logger.info("Wrote %d results to %s", len(report["results"]), output)
+    if clear_data:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 # extract_metoffice.py
 
-import tarfile
 from pathlib import Path
 
-archive = Path("data/raw/metoffice_hourly_weather_2024.tar.gz")
-target_dir = archive.parent
+from prototype.ingestion.ingest import ingest
 
-print(f"Opening archive {archive.name} in auto mode…")
-with tarfile.open(archive, mode="r:*") as tar:
-    tar.extractall(path=target_dir)
+# The archive is no longer unpacked into data/raw: ingest streams its CSV
+# members straight into DuckDB, decompressing on the fly.
+archive = Path("data/raw/metoffice_hourly_weather_2024.tar.gz")
+db_path = Path("data/airquality.duckdb")
 
-print("Extraction complete. Now data/raw contains:")
-for p in sorted(target_dir.iterdir()):
-    print("  ", p.name)
+print(f"Streaming archive {archive.name} into {db_path}…")
+stats = ingest(archive.parent, db_path, pattern=archive.name, incremental=True)
 
+print("Load complete. Tables written:")
+for s in stats:
+    print(f"   {s['source']} → {s['table']} ({s['rows']} rows)")
@@ -0,0 +1,232 @@
+# prototype/anomalies/detect.py
+"""
+Precompute anomaly flags for the clean_* tables into the anomalies table:
+one row per (station, pollutant, hour, window) whose robust z-score
+(MAD_SCALE × distance from the rolling median / rolling MAD, see
+rolling.py) exceeds the threshold, with the rolling statistics it was
+judged against.
+
+Like the rollups, updates are incremental: only rows from where the clean
+runs since the last detection resumed are scored again, reading the longest window's worth of
+earlier rows as history. Changing the windows or threshold rebuilds.
+"""
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import click
+import duckdb
+import numpy as np
+import pandas as pd
+
+from prototype.anomalies.rolling import robust_zscores, rolling_stats, zscores
+from prototype.cleaning.clean import resume_point, value_columns
+from prototype.export.parquet import clean_tables
+from prototype.pipeline.instrument import Meter
+
+logger = logging.getLogger(__name__)
+
+ANOMALIES_TABLE = "anomalies"
+STATE_TABLE = "anomaly_state"
+
+# rolling windows, in hours
+WINDOWS = (24, 168)
+
+# robust z-scores beyond this are anomalies
+THRESHOLD = 3.5
+
+COLUMNS = [
+    "source", "station", "pollutant", "datetime", "window_hours",
+    "value", "mean", "std", "median", "mad", "zscore", "robust_zscore",
+]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def ensure_tables(con):
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {ANOMALIES_TABLE} (
+            source VARCHAR, station VARCHAR, pollutant VARCHAR, datetime TIMESTAMP, window_hours INTEGER,
+            value DOUBLE, mean DOUBLE, std DOUBLE, median DOUBLE, mad DOUBLE,
+            zscore DOUBLE, robust_zscore DOUBLE
+        )
+        """
+    )
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+        "(source VARCHAR PRIMARY KEY, clean_run TIMESTAMP, settings VARCHAR, detected_at TIMESTAMP)"
+    )
+
+
+def flag(times, values, columns: list, windows=WINDOWS, threshold: float = THRESHOLD) -> pd.DataFrame:
+    """
+    The anomalies among values (rows × columns) at sorted times, for every
+    window: (pollutant, datetime, window_hours, value, the window's
+    statistics, zscore, robust_zscore) rows with |robust_zscore| > threshold.
+    """
+    values = np.asarray(values, dtype=float)
+    times = pd.DatetimeIndex(times)
+    frames = []
+    for hours, stats in rolling_stats(times, values, windows).items():
+        robust = robust_zscores(values, stats)
+        rows, cols = np.nonzero(np.abs(np.nan_to_num(robust)) > threshold)
+        if not len(rows):
+            continue
+        z = zscores(values, stats)
+        frames.append(pd.DataFrame({
+            "pollutant": np.asarray(columns, dtype=object)[cols],
+            "datetime": times[rows],
+            "window_hours": int(hours),
+            "value": values[rows, cols],
+            **{s: stats[s][rows, cols] for s in ("mean", "std", "median", "mad")},
+            "zscore": z[rows, cols],
+            "robust_zscore": robust[rows, cols],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS[2:])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _detect_source(con, source: str, restart, windows, threshold: float) -> tuple:
+    """Score source's rows from restart (None: all) and replace its anomalies there. Returns (rows read, flagged)."""
+    columns = value_columns(con, source)
+    names = [r[0] for r in con.execute(f"DESCRIBE {_quote(source)}").fetchall()]
+    keyed = "station" in names
+    if restart is None:
+        con.execute(f"DELETE FROM {ANOMALIES_TABLE} WHERE source = ?", [source])
+    else:
+        con.execute(f"DELETE FROM {ANOMALIES_TABLE} WHERE source = ? AND datetime >= ?",
+                    [source, restart.to_pydatetime()])
+    if not columns:
+        return 0, 0
+
+    where, params = ["datetime IS NOT NULL"], []
+    if restart is not None:
+        # the longest window's history before the first re-scored row
+        where.append("datetime > ?")
+        params.append((restart - pd.Timedelta(hours=max(windows))).to_pydatetime())
+    stations = (
+        [r[0] for r in con.execute(
+            f"SELECT DISTINCT station FROM {_quote(source)} WHERE {' AND '.join(where)} ORDER BY station", params
+        ).fetchall()]
+        if keyed else [source[len("clean_"):]]
+    )
+
+    rows_in = flagged = 0
+    select = ", ".join(["datetime"] + [f"CAST({_quote(c)} AS DOUBLE) AS {_quote(c)}" for c in columns])
+    for station in stations:
+        clause = " AND ".join(where + (["station = ?"] if keyed else []))
+        frame = con.execute(
+            f"SELECT {select} FROM {_quote(source)} WHERE {clause} ORDER BY datetime",
+            params + ([station] if keyed else []),
+        ).df()
+        rows_in += len(frame)
+        found = flag(frame["datetime"], frame[columns].to_numpy(dtype=float), columns, windows, threshold)
+        if restart is not None:
+            found = found[found["datetime"] >= restart]
+        if found.empty:
+            continue
+        found.insert(0, "station", str(station))
+        found.insert(0, "source", source)
+        con.register("_anomalies_found", found)
+        try:
+            con.execute(f"INSERT INTO {ANOMALIES_TABLE} BY NAME SELECT * FROM _anomalies_found")
+        finally:
+            con.unregister("_anomalies_found")
+        flagged += len(found)
+    return rows_in, flagged
+
+
+def detect(db_path: str, windows=WINDOWS, threshold: float = THRESHOLD, incremental: bool = True,
+           con=None) -> list:
+    """
+    Update the anomalies table from the clean_* tables in the DuckDB at
+    db_path, scoring each table from where its last clean run resumed when
+    incremental, otherwise from scratch. con is an open connection to
+    db_path to use instead of opening one; it is left open.
+
+    Returns one dict per scored table: table, rows_in (clean rows read),
+    rows_out (anomalies flagged) and the resource usage measured by Meter.
+    """
+    windows = tuple(sorted(int(w) for w in windows))
+    settings = f"windows={','.join(map(str, windows))} threshold={threshold}"
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path))
+    try:
+        ensure_tables(con)
+        sources = clean_tables(con)
+        report = []
+        for source in sources:
+            skip, restart, run = resume_point(con, source, STATE_TABLE, incremental)
+            seen = con.execute(f"SELECT settings FROM {STATE_TABLE} WHERE source = ?", [source]).fetchone()
+            if seen is not None and seen[0] != settings:
+                skip, restart = False, None
+            if skip:
+                logger.info(f"⏭️  `{source}` anomalies are up to date")
+                continue
+            with Meter() as meter:
+                con.begin()
+                try:
+                    rows_in, flagged = _detect_source(con, source, restart, windows, threshold)
+                    con.execute(f"DELETE FROM {STATE_TABLE} WHERE source = ?", [source])
+                    con.execute(
+                        f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?)",
+                        [source, run[0] if run else None, settings, datetime.utcnow()],
+                    )
+                    con.commit()
+                except Exception:
+                    con.rollback()
+                    raise
+            report.append({"table": source, "rows_in": rows_in, "rows_out": flagged, **meter.as_dict()})
+            logger.info(f"✅ Scored `{source}`: {flagged} anomalies in {rows_in} rows")
+
+        gone = [s for (s,) in con.execute(f"SELECT source FROM {STATE_TABLE}").fetchall() if s not in sources]
+        for source in gone:
+            con.execute(f"DELETE FROM {ANOMALIES_TABLE} WHERE source = ?", [source])
+            con.execute(f"DELETE FROM {STATE_TABLE} WHERE source = ?", [source])
+    finally:
+        if own:
+            con.close()
+    return report
+
+
+@click.command()
+@click.option(
+    "--db-path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="DuckDB file holding the clean tables"
+)
+@click.option(
+    "--window",
+    "windows",
+    multiple=True,
+    type=click.IntRange(min=1),
+    default=WINDOWS,
+    show_default=True,
+    help="Rolling window in hours (repeatable)"
+)
+@click.option(
+    "--threshold",
+    default=THRESHOLD,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Robust z-scores beyond this are anomalies"
+)
+@click.option(
+    "--incremental/--full",
+    default=True,
+    show_default=True,
+    help="Score only rows the last clean run touched"
+)
+def main(db_path: Path, windows: tuple, threshold: float, incremental: bool):
+    """Command-line entry point for detect."""
+    detect(str(db_path), windows=windows, threshold=threshold, incremental=incremental)
+
+
+if __name__ == "__main__":
+    main()
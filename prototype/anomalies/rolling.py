@@ -0,0 +1,130 @@
+# prototype/anomalies/rolling.py
+"""
+Rolling statistics over a wide (rows × series) NumPy array, shared by the
+dashboard and the anomalies stage of the pipeline.
+
+Windows are time-based, as pandas' rolling("24h"): row i's window holds
+the rows with a timestamp in (t_i - window, t_i], so irregular or gappy
+series are handled exactly. All series are computed together:
+
+- mean and std from cumulative sums, one pass per window size;
+- median and MAD (median absolute deviation from the window's median)
+  by sorting a padded (rows × window rows × series) view, built in
+  blocks of rows so memory stays bounded.
+
+Missing values (NaN) are skipped, as pandas does.
+"""
+import numpy as np
+import pandas as pd
+
+STATS = ("mean", "std", "median", "mad")
+
+# rows × window rows × series elements in one median block
+BLOCK_ELEMENTS = 4_000_000
+
+# scales the MAD to the standard deviation of normally distributed data
+MAD_SCALE = 0.6745
+
+
+def _nanoseconds(times) -> np.ndarray:
+    return np.asarray(pd.DatetimeIndex(times).as_unit("ns").asi8)
+
+
+def window_starts(times, hours: float) -> np.ndarray:
+    """For each row, the first row of its (t - hours, t] window; raises ValueError unless times are sorted."""
+    t = _nanoseconds(times)
+    if np.any(t[1:] < t[:-1]):
+        raise ValueError("rolling windows need times sorted in ascending order")
+    return np.searchsorted(t, t - int(pd.Timedelta(hours=hours).value), side="right")
+
+
+def _mean_std(values: np.ndarray, starts: np.ndarray, min_periods: int):
+    valid = ~np.isnan(values)
+    # centred first, so the sums of squares keep their precision over long series
+    centre = np.nanmean(values, axis=0) if valid.any() else np.zeros(values.shape[1])
+    centre = np.where(np.isnan(centre), 0.0, centre)
+    x = np.where(valid, values - centre, 0.0)
+    zero = np.zeros((1, values.shape[1]))
+    s1 = np.vstack([zero, np.cumsum(x, axis=0)])
+    s2 = np.vstack([zero, np.cumsum(x * x, axis=0)])
+    cn = np.vstack([zero, np.cumsum(valid, axis=0)])
+    end = np.arange(1, len(values) + 1)
+    n = cn[end] - cn[starts]
+    total = s1[end] - s1[starts]
+    squares = s2[end] - s2[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n >= min_periods, total / n + centre, np.nan)
+        var = np.where(n >= 2, (squares - total * total / n) / (n - 1), np.nan)
+    return mean, np.sqrt(np.clip(var, 0.0, None))
+
+
+def _sorted_median(window: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Median along axis 1 of window, sorted in place with NaN pushed last, given each slice's count of values."""
+    window.sort(axis=1)
+    lo = np.clip((counts - 1) // 2, 0, None)[:, None, :]
+    hi = np.clip(counts // 2, 0, window.shape[1] - 1)[:, None, :]
+    median = (np.take_along_axis(window, lo, axis=1) + np.take_along_axis(window, hi, axis=1))[:, 0, :] / 2
+    return np.where(counts > 0, median, np.nan)
+
+
+def _median_mad(values: np.ndarray, starts: np.ndarray, min_periods: int):
+    rows, series = values.shape
+    width = int((np.arange(rows) - starts).max()) + 1 if rows else 1
+    block = max(BLOCK_ELEMENTS // (width * series), 1)
+    median = np.full(values.shape, np.nan)
+    mad = np.full(values.shape, np.nan)
+    offsets = np.arange(width)
+    for lo in range(0, rows, block):
+        i = np.arange(lo, min(lo + block, rows))
+        idx = i[:, None] - offsets[None, :]
+        window = values[np.clip(idx, 0, None)]
+        window[idx < starts[i][:, None]] = np.nan
+        counts = (~np.isnan(window)).sum(axis=1)
+        # NaN sorts last, so each slice's values come first
+        med = _sorted_median(window, counts)
+        dev = _sorted_median(np.abs(window - med[:, None, :]), counts)
+        enough = counts >= max(min_periods, 1)
+        median[i] = np.where(enough, med, np.nan)
+        mad[i] = np.where(enough, dev, np.nan)
+    return median, mad
+
+
+def rolling_stats(times, values, windows, stats=STATS, min_periods: int = 1) -> dict:
+    """
+    {window hours: {stat: array}} for the rows of values (rows × series, or
+    one series) at sorted times, each array shaped like values. stats picks
+    from STATS; median and MAD cost far more than mean and std.
+    """
+    values = np.asarray(values, dtype=float)
+    flat = values.ndim == 1
+    if flat:
+        values = values[:, None]
+    unknown = set(stats) - set(STATS)
+    if unknown:
+        raise ValueError(f"Unknown rolling statistics: {sorted(unknown)}")
+    out = {}
+    for hours in windows:
+        starts = window_starts(times, hours)
+        result = {}
+        if {"mean", "std"} & set(stats):
+            result["mean"], result["std"] = _mean_std(values, starts, min_periods)
+        if {"median", "mad"} & set(stats):
+            result["median"], result["mad"] = _median_mad(values, starts, min_periods)
+        out[hours] = {
+            s: (result[s][:, 0] if flat else result[s]) for s in stats
+        }
+    return out
+
+
+def zscores(values, stats: dict) -> np.ndarray:
+    """(value - rolling mean) / rolling std; NaN where the std is 0 or unknown."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (np.asarray(values, dtype=float) - stats["mean"]) / stats["std"]
+    return np.where(np.isfinite(z), z, np.nan)
+
+
+def robust_zscores(values, stats: dict) -> np.ndarray:
+    """MAD_SCALE × (value - rolling median) / rolling MAD; NaN where the MAD is 0 or unknown."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = MAD_SCALE * (np.asarray(values, dtype=float) - stats["median"]) / stats["mad"]
+    return np.where(np.isfinite(z), z, np.nan)
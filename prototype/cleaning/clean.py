@@ -82,13 +82,45 @@
 
 # prototype/cleaning/clean.py
 
+import click
 import duckdb
 import pandas as pd
-import pandera as pa
-from pandera import Column, DataFrameSchema, Check
 import numpy as np
 import logging
+import tempfile
+import pyarrow
+import pyarrow.ipc as pa_ipc
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from pathlib import Path
+
+from prototype.cleaning.sql_engine import clean_table_sql
+from prototype.pipeline.instrument import Meter
+from prototype.cleaning.validate import (
+    DEFAULT_SAMPLE_ROWS, VALIDATION_MODES, empty_counts, merge_counts, validate_frame, violation_metrics,
+)
+
+# Bookkeeping tables that live next to the raw data but are never cleaned
+SYSTEM_TABLES = {
+    "clean_metrics", "ingest_manifest", "pipeline_stage_cache", "pipeline_runs", "pipeline_stage_metrics",
+    "rollup_hourly", "rollup_daily", "rollup_monthly", "rollup_weekday_hour", "rollup_month_day", "rollup_state",
+    "anomalies", "anomaly_state", "forecast_models", "forecasts", "forecast_state", "latest_readings",
+    "backfill_checkpoint", "cleaning_runs",
+}
+
+# One row per table per clean run, so derived stages can resume past runs they missed
+RUNS_TABLE = "cleaning_runs"  # not clean_*: that prefix marks clean data tables
+
+# Text columns carried through untouched; "station" also splits a table into
+# independent series (see the observations layout of the ingest step)
+KEY_COLUMNS = ("station", "source_file")
+
+ENGINES = ("pandas", "sql")
+
+# each station × pollutant's latest value, kept current by every clean run
+LATEST_TABLE = "latest_readings"
+
+_NUMERIC = ("DOUBLE", "FLOAT", "REAL", "DECIMAL", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "HUGEINT")
 
 # ── Logger setup ───────────────────────────────────────────────────────────
 logger = logging.getLogger(__name__)
@@ -97,100 +129,839 @@ logging.basicConfig(
     format="%(asctime)s — %(levelname)s — %(message)s"
 )
 
-def clean(db_path: str, max_gap_hours: int = 2):
-    """
-    Read every raw_* table from the DuckDB at db_path,
-    enforce types & ranges, drop/flag large gaps, interpolate small gaps,
-    and write out clean_<tablename> tables. Also gathers metrics
-    about each table’s cleaning process into a clean_metrics table.
-    """
-    con = duckdb.connect(db_path)
 
-    # discover all tables that need cleaning
-    raw_tables = [
+def raw_tables(con) -> list:
+    """All tables in the database that are inputs to cleaning."""
+    return [
         row[0]
         for row in con.execute("SHOW TABLES").fetchall()
-        if not row[0].startswith("clean_") and row[0] != "clean_metrics"
+        if not row[0].startswith("clean_") and row[0] not in SYSTEM_TABLES
     ]
 
-    metrics = []  # will hold one dict per table
 
-    for tbl in raw_tables:
-        logger.info(f"➡️  Cleaning table `{tbl}`")
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def value_columns(con, table: str) -> list:
+    """The numeric measurement columns of a clean table (not datetime or a key column)."""
+    return [
+        name for name, kind, *_ in con.execute(f"DESCRIBE {_quote(table)}").fetchall()
+        if name != "datetime" and name not in KEY_COLUMNS and kind.split("(")[0] in _NUMERIC
+    ]
+
 
-        # load raw
-        df = con.execute(f"SELECT * FROM {tbl}").df()
-        rows_before = len(df)
+def _schema(columns):
+    """
+    pandera schema: datetime non-null, key columns text, every other column
+    a float >= 0. Imported lazily, as only validation="full" needs it.
+    """
+    import pandera.pandas as pa
+    from pandera.pandas import Column, DataFrameSchema, Check
 
-        # coerce & drop bad datetimes
-        if "datetime" not in df.columns:
-            logger.warning(f"  • `{tbl}` has no 'datetime' column; skipping")
+    schema_cols = {"datetime": Column(pa.DateTime, nullable=False)}
+    for c in columns:
+        if c == "datetime":
             continue
-        df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-        df = df.dropna(subset=["datetime"]).reset_index(drop=True)
-        rows_after_dt = len(df)
-
-        # build and apply schema
-        schema_cols = {"datetime": Column(pa.DateTime, nullable=False)}
-        for c in df.columns:
-            if c == "datetime":
-                continue
-            schema_cols[c] = Column(pa.Float, nullable=True, checks=Check.ge(0))
-        schema = DataFrameSchema(schema_cols)
-        validated = schema.validate(df, lazy=True)
-        rows_after_schema = len(validated)
+        if c in KEY_COLUMNS:
+            schema_cols[c] = Column(pa.String, nullable=True)
+            continue
+        schema_cols[c] = Column(pa.Float, nullable=True, checks=Check.ge(0))
+    return DataFrameSchema(schema_cols)
 
-        # detect gaps
-        validated = validated.sort_values("datetime")
-        diffs = validated["datetime"].diff().dt.total_seconds().div(3600)
-        large_gaps = diffs[diffs > max_gap_hours].count()
 
-        # count nulls before interpolation
-        numeric_cols = validated.select_dtypes(include=[np.number]).columns
-        nulls_before = int(validated[numeric_cols].isna().sum().sum())
+def _validate(df: pd.DataFrame, validation: str, sample_rows: int):
+    """
+    Validate df's value columns: the vectorised fast path by default, the
+    full pandera schema (which raises on any failure) for validation="full".
+    Returns (df, per-column violation counts, rows validated).
+    """
+    values = [c for c in df.columns if c != "datetime" and c not in KEY_COLUMNS]
+    if validation == "full":
+        df = _schema(df.columns).validate(df, lazy=True)
+        return df, empty_counts(values), len(df)
+    return validate_frame(df, values, validation, sample_rows)
 
-        # interpolate small gaps
-        validated = validated.set_index("datetime")
-        validated[numeric_cols] = validated[numeric_cols].interpolate(
-            limit=int(max_gap_hours),
-            limit_direction="both",
+
+def interpolate_positions(values, positions, limit: int, before=None, after=None):
+    """
+    NumPy equivalent of Series.interpolate(limit=limit, limit_direction="both")
+    for a slice of a longer series. positions are the rows' absolute row
+    numbers in the full series; before/after are optional (position, value)
+    anchors for the nearest valid values outside the slice.
+    """
+    out = values.copy()
+    missing = np.isnan(values)
+    if not missing.any():
+        return out
+    xp = positions[~missing].astype(float)
+    fp = values[~missing]
+    if before is not None:
+        xp, fp = np.r_[before[0], xp], np.r_[before[1], fp]
+    if after is not None:
+        xp, fp = np.r_[xp, after[0]], np.r_[fp, after[1]]
+    if not len(xp):
+        return out
+    x = positions[missing].astype(float)
+    j = np.searchsorted(xp, x)
+    prev_pos = np.where(j > 0, xp[np.maximum(j - 1, 0)], -np.inf)
+    next_pos = np.where(j < len(xp), xp[np.minimum(j, len(xp) - 1)], np.inf)
+    fill = (x - prev_pos <= limit) | (next_pos - x <= limit)
+    out[missing] = np.where(fill, np.interp(x, xp, fp), np.nan)
+    return out
+
+
+def _clean_table_pandas(con, tbl: str, max_gap_hours: int, validation: str = "fast",
+                        sample_rows: int = DEFAULT_SAMPLE_ROWS):
+    """
+    Clean one raw table in memory with pandas.
+    Returns (cleaned DataFrame, metrics dict), or None if the table has no
+    datetime column.
+    """
+    # load raw
+    df = con.execute(f"SELECT * FROM {tbl}").df()
+    rows_before = len(df)
+
+    # coerce & drop bad datetimes
+    if "datetime" not in df.columns:
+        logger.warning(f"  • `{tbl}` has no 'datetime' column; skipping")
+        return None
+    df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+    df = df.dropna(subset=["datetime"]).reset_index(drop=True)
+    rows_after_dt = len(df)
+
+    # validate types & ranges
+    validated, counts, rows_validated = _validate(df, validation, sample_rows)
+    rows_after_schema = len(validated)
+
+    # detect gaps (per station when the table holds several)
+    series = [c for c in ("station",) if c in validated.columns]
+    validated = validated.sort_values(series + ["datetime"]).reset_index(drop=True)
+    stamps = validated.groupby(series, dropna=False)["datetime"] if series else validated["datetime"]
+    diffs = stamps.diff().dt.total_seconds().div(3600)
+    large_gaps = diffs[diffs > max_gap_hours].count()
+
+    # count nulls before interpolation
+    numeric_cols = validated.select_dtypes(include=[np.number]).columns
+    nulls_before = int(validated[numeric_cols].isna().sum().sum())
+
+    # interpolate small gaps
+    interp = dict(limit=int(max_gap_hours), limit_direction="both")
+    if series:
+        validated[numeric_cols] = validated.groupby(series, dropna=False)[numeric_cols].transform(
+            lambda x: x.interpolate(**interp)
         )
+    else:
+        validated = validated.set_index("datetime")
+        validated[numeric_cols] = validated[numeric_cols].interpolate(**interp)
         validated = validated.reset_index()
 
-        # count nulls after interpolation
-        nulls_after = int(validated[numeric_cols].isna().sum().sum())
-        interpolated = nulls_before - nulls_after
+    # count nulls after interpolation
+    nulls_after = int(validated[numeric_cols].isna().sum().sum())
+    interpolated = nulls_before - nulls_after
 
-        # write cleaned table
-        clean_name = f"clean_{tbl}"
+    return validated, {
+        "table": tbl,
+        "rows_before": rows_before,
+        "rows_after_dt": rows_after_dt,
+        "rows_after_schema": rows_after_schema,
+        "large_gaps_detected": int(large_gaps),
+        "nulls_before_interp": nulls_before,
+        "nulls_after_interp": nulls_after,
+        "values_interpolated": int(interpolated),
+        "cleaned_rows": len(validated),
+        **violation_metrics(counts, rows_before - rows_after_dt, validation, rows_validated),
+    }
+
+
+def _clean_table_chunked(con, tbl: str, clean_name: str, max_gap_hours: int, chunk: str,
+                         validation: str = "fast", sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                         incremental: bool = False):
+    """
+    Pandas cleaning of one table in time-ordered windows of length `chunk`
+    (a pandas offset alias such as "MS" or "7D"; None for one window), one
+    station at a time, so only a window's rows are ever in memory. Writes
+    clean_name itself and returns the metrics dict, or None if the table has
+    no datetime column.
+
+    Each window is read together with max_gap_hours of following rows. Gap
+    detection carries the previous window's last timestamp, and
+    interpolation carries each column's last valid value and row number;
+    the next valid value is taken from the overlap, or looked up past it
+    when a null run is longer. The result is identical to cleaning the whole
+    table at once.
+
+    With incremental=True each station restarts from its watermark (see
+    _watermarks and _resume_point) instead of its first row: rows from that
+    point on are deleted from clean_name and cleaned again, the rest is kept.
+    """
+    names = [r[0] for r in con.execute(f"DESCRIBE {tbl}").fetchall()]
+    if "datetime" not in names:
+        logger.warning(f"  • `{tbl}` has no 'datetime' column; skipping")
+        return None
+    series = [c for c in ("station",) if c in names]
+    values = [c for c in names if c != "datetime" and c not in KEY_COLUMNS]
+    order = names if series else ["datetime"] + [c for c in names if c != "datetime"]
+    select = ", ".join(
+        "TRY_CAST(datetime AS TIMESTAMP) AS datetime" if c == "datetime" else _quote(c) for c in order
+    )
+    # typed once and stored in time order per station, so each window's range query reads only the
+    # row groups whose min/max datetime overlap it instead of casting and scanning the whole raw table
+    con.execute(
+        f"CREATE OR REPLACE TEMP TABLE _chunk_src AS SELECT {select} FROM {tbl} "
+        f"ORDER BY {'station, ' if series else ''}datetime"
+    )
+
+    limit = int(max_gap_hours)
+    overlap = pd.Timedelta(hours=max_gap_hours)
+    stations = (
+        [r[0] for r in con.execute("SELECT DISTINCT station FROM _chunk_src ORDER BY station").fetchall()]
+        if series else [None]
+    )
+    where = "datetime IS NOT NULL" + (" AND station IS NOT DISTINCT FROM ?" if series else "")
+    large_gaps = nulls_before = nulls_after = cleaned_rows = rows_validated = 0
+    counts = empty_counts(values)
+
+    marks = _watermarks(con, tbl, clean_name, order, series) if incremental else None
+    reprocessed_from = pd.NaT
+    if marks is None:
+        rows_before, rows_after_dt = con.execute("SELECT count(*), count(datetime) FROM _chunk_src").fetchone()
         con.execute(f"DROP TABLE IF EXISTS {clean_name}")
-        con.register("tmp_df", validated)
-        con.execute(f"CREATE TABLE {clean_name} AS SELECT * FROM tmp_df")
-        con.unregister("tmp_df")
-        logger.info(f"✅ Created `{clean_name}` ({len(validated)} rows)")
-
-        # record metrics
-        metrics.append({
-            "table": tbl,
-            "rows_before": rows_before,
-            "rows_after_dt": rows_after_dt,
-            "rows_after_schema": rows_after_schema,
-            "large_gaps_detected": int(large_gaps),
-            "nulls_before_interp": nulls_before,
-            "nulls_after_interp": nulls_after,
-            "values_interpolated": int(interpolated),
-            "cleaned_rows": len(validated),
-            "run_timestamp": datetime.utcnow()
-        })
+    created = marks is not None
 
-    # write out metrics table
+    for station in stations:
+        key = [station] if series else []
+        first, last = con.execute(f"SELECT min(datetime), max(datetime) FROM _chunk_src WHERE {where}", key).fetchone()
+        if first is None:
+            continue
+        first, last = pd.Timestamp(first), pd.Timestamp(last)
+
+        base = 0            # row number of the window's first row, relative to the starting point
+        last_stamp = None   # previous window's last timestamp
+        before = {}         # column → (row number, value) of its last valid value so far
+        if marks is not None and station in marks:
+            if last == marks[station]:
+                continue    # nothing new for this station
+            first, last_stamp, before = _resume_point(con, where, key, values, limit, overlap, marks[station])
+            con.execute(f"DELETE FROM {clean_name} WHERE {where} AND datetime >= ?", key + [first])
+            reprocessed_from = first if pd.isna(reprocessed_from) else min(reprocessed_from, first)
+        edges = [first] + [e for e in (pd.date_range(first, last, freq=chunk) if chunk else []) if e > first]
+        edges.append(last + pd.Timedelta(microseconds=1))
+
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            frame = con.execute(
+                f"SELECT * FROM _chunk_src WHERE {where} AND datetime >= ? AND datetime < ? ORDER BY datetime",
+                key + [lo, hi + overlap],
+            ).df()
+            body = frame[frame["datetime"] < hi].reset_index(drop=True)
+            ahead = frame[frame["datetime"] >= hi].reset_index(drop=True)
+            if body.empty:
+                continue
+            body, window_counts, window_validated = _validate(body, validation, sample_rows)
+            merge_counts(counts, window_counts)
+            rows_validated += window_validated
+            positions = base + np.arange(len(body))
+
+            # detect gaps, including the one across the window boundary
+            diffs = body["datetime"].diff()
+            if last_stamp is not None:
+                diffs.iloc[0] = body["datetime"].iloc[0] - last_stamp
+            large_gaps += int((diffs.dt.total_seconds().div(3600) > max_gap_hours).sum())
+            nulls_before += int(body[values].isna().sum().sum())
+
+            # interpolate small gaps against anchors outside the window
+            for c in values:
+                raw = body[c].to_numpy(dtype=float)
+                after = None
+                if len(raw) and np.isnan(raw[-1]):
+                    look = pd.to_numeric(ahead[c], errors="coerce").to_numpy(dtype=float)
+                    hits = np.flatnonzero(look >= 0)
+                    if len(hits):
+                        after = (base + len(body) + hits[0], look[hits[0]])
+                    else:
+                        after = _next_anchor(con, where, key, c, hi, hi + overlap, base + len(body))
+                body[c] = interpolate_positions(raw, positions, limit, before.get(c), after)
+                valid = np.flatnonzero(~np.isnan(raw))
+                if len(valid):
+                    before[c] = (positions[valid[-1]], raw[valid[-1]])
+            nulls_after += int(body[values].isna().sum().sum())
+
+            # write cleaned window
+            con.register("tmp_df", body)
+            if not created:
+                con.execute(f"CREATE TABLE {clean_name} AS SELECT * FROM tmp_df")
+                created = True
+            else:
+                con.execute(f"INSERT INTO {clean_name} SELECT * FROM tmp_df")
+            con.unregister("tmp_df")
+            cleaned_rows += len(body)
+            base += len(body)
+            last_stamp = body["datetime"].iloc[-1]
+    if not created:
+        con.execute(f"CREATE TABLE {clean_name} AS SELECT * FROM _chunk_src WHERE false")
+    con.execute("DROP TABLE IF EXISTS _chunk_src")
+    if marks is not None:
+        # only the re-cleaned rows are accounted for
+        rows_before = rows_after_dt = cleaned_rows
+
+    return {
+        "table": tbl,
+        "rows_before": rows_before,
+        "rows_after_dt": rows_after_dt,
+        "rows_after_schema": cleaned_rows,
+        "large_gaps_detected": large_gaps,
+        "nulls_before_interp": nulls_before,
+        "nulls_after_interp": nulls_after,
+        "values_interpolated": nulls_before - nulls_after,
+        "cleaned_rows": cleaned_rows,
+        **violation_metrics(counts, rows_before - rows_after_dt, validation, rows_validated),
+        "reprocessed_from": reprocessed_from,
+    }
+
+
+def _valid_sql(column: str) -> str:
+    """Rows where column holds a value that survives validation."""
+    return f"TRY_CAST({_quote(column)} AS DOUBLE) >= 0"
+
+
+def _next_anchor(con, where: str, key: list, column: str, hi, start, hi_position: int):
+    """(row number, value) of the first valid value of column at or after start, or None."""
+    q = _quote(column)
+    found = con.execute(
+        f"SELECT datetime, TRY_CAST({q} AS DOUBLE) FROM _chunk_src WHERE {where} AND datetime >= ? "
+        f"AND {_valid_sql(column)} ORDER BY datetime LIMIT 1",
+        key + [start],
+    ).fetchone()
+    if found is None:
+        return None
+    skipped = con.execute(
+        f"SELECT count(*) FROM _chunk_src WHERE {where} AND datetime >= ? AND datetime < ?",
+        key + [hi, found[0]],
+    ).fetchone()[0]
+    return hi_position + skipped, float(found[1])
+
+
+def _watermarks(con, tbl: str, clean_name: str, order: list, series: list):
+    """
+    Each station's high-watermark (its latest cleaned datetime) for resuming
+    tbl, or None when the table has to be rebuilt instead: no earlier run
+    recorded a watermark in clean_metrics, clean_name no longer matches it or
+    the raw columns, or raw rows at or before a watermark were added or
+    removed since.
+    """
+    tables = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    if "clean_metrics" not in tables or clean_name not in tables:
+        return None
+    if "watermark" not in {r[0] for r in con.execute("DESCRIBE clean_metrics").fetchall()}:
+        return None
+    recorded = con.execute('SELECT max(watermark) FROM clean_metrics WHERE "table" = ?', [tbl]).fetchone()[0]
+    if recorded is None:
+        return None
+    if [r[0] for r in con.execute(f"DESCRIBE {clean_name}").fetchall()] != order:
+        return None
+
+    station = "station" if series else "NULL"
+    match = "r.station IS NOT DISTINCT FROM m._station AND " if series else ""
+    rows = con.execute(
+        f"""
+        SELECT m._station, m._mark, m._rows, count(r.datetime)
+        FROM (SELECT {station} AS _station, max(datetime) AS _mark, count(*) AS _rows
+              FROM {clean_name} GROUP BY ALL) AS m
+        LEFT JOIN _chunk_src AS r ON {match}r.datetime <= m._mark
+        GROUP BY ALL
+        """
+    ).fetchall()
+    if not rows or max(r[1] for r in rows) != recorded or any(r[2] != r[3] for r in rows):
+        return None
+    return {r[0]: pd.Timestamp(r[1]) for r in rows}
+
+
+def _resume_point(con, where: str, key: list, values: list, limit: int, lookback, watermark):
+    """
+    Where cleaning of one series restarts after rows were appended past
+    watermark, and the state carried into that point.
+
+    The restart is max_gap_hours before the watermark, moved further back
+    for any column whose trailing nulls new values may now fill: from the
+    row after its last valid value, or its last `limit` rows if it has none.
+    Returns (start, last timestamp before start, {column: (row number,
+    value)} of each column's last valid value before start, numbered
+    relative to start).
+    """
+    start = watermark - lookback
+    for c in values:
+        last_valid = con.execute(
+            f"SELECT max(datetime) FROM _chunk_src WHERE {where} AND datetime <= ? AND {_valid_sql(c)}",
+            key + [watermark],
+        ).fetchone()[0]
+        if last_valid is None:
+            found = con.execute(
+                f"SELECT datetime FROM _chunk_src WHERE {where} AND datetime <= ? "
+                f"ORDER BY datetime DESC LIMIT 1 OFFSET {max(limit, 1) - 1}",
+                key + [watermark],
+            ).fetchone()
+            found = found[0] if found else con.execute(
+                f"SELECT min(datetime) FROM _chunk_src WHERE {where}", key
+            ).fetchone()[0]
+        elif pd.Timestamp(last_valid) < watermark:
+            found = con.execute(
+                f"SELECT min(datetime) FROM _chunk_src WHERE {where} AND datetime > ?",
+                key + [last_valid],
+            ).fetchone()[0]
+        else:
+            continue
+        start = min(start, pd.Timestamp(found))
+
+    last_stamp = con.execute(
+        f"SELECT max(datetime) FROM _chunk_src WHERE {where} AND datetime < ?", key + [start]
+    ).fetchone()[0]
+    before = {}
+    for c in values:
+        anchor = con.execute(
+            f"SELECT datetime, TRY_CAST({_quote(c)} AS DOUBLE) FROM _chunk_src "
+            f"WHERE {where} AND datetime < ? AND {_valid_sql(c)} ORDER BY datetime DESC LIMIT 1",
+            key + [start],
+        ).fetchone()
+        if anchor is not None:
+            distance = con.execute(
+                f"SELECT count(*) FROM _chunk_src WHERE {where} AND datetime >= ? AND datetime < ?",
+                key + [anchor[0], start],
+            ).fetchone()[0]
+            before[c] = (-distance, float(anchor[1]))
+    return start, (pd.Timestamp(last_stamp) if last_stamp is not None else None), before
+
+
+def _clean_worker(db_path: str, tbl: str, max_gap_hours: int, scratch: str, validation: str,
+                  sample_rows: int):
+    """
+    Process-pool entry point: clean one table over a read-only connection and
+    hand the result back as an Arrow IPC file in scratch.
+    Returns (table, path or None, metrics dict or None, Meter.as_dict() or None).
+    """
+    with Meter() as meter:
+        con = duckdb.connect(db_path, read_only=True)
+        try:
+            result = _clean_table_pandas(con, tbl, max_gap_hours, validation, sample_rows)
+        finally:
+            con.close()
+        if result is None:
+            return tbl, None, None, None
+        validated, metrics = result
+        data = pyarrow.Table.from_pandas(validated, preserve_index=False)
+        path = Path(scratch) / f"{tbl}.arrow"
+        with pa_ipc.new_file(str(path), data.schema) as writer:
+            writer.write_table(data)
+    return tbl, str(path), metrics, meter.as_dict()
+
+
+def _write_clean_table(con, clean_name: str, data):
+    """Replace clean_name with the rows of a DataFrame or Arrow table."""
+    con.execute(f"DROP TABLE IF EXISTS {clean_name}")
+    con.register("tmp_df", data)
+    con.execute(f"CREATE TABLE {clean_name} AS SELECT * FROM tmp_df")
+    con.unregister("tmp_df")
+
+
+def _watermark(con, clean_name: str):
+    """Latest datetime in clean_name: where the next incremental run resumes."""
+    return con.execute(f"SELECT max(datetime) FROM {clean_name}").fetchone()[0]
+
+
+def _write_metrics(con, metrics: list):
+    """
+    Upsert one clean_metrics row per cleaned table; rows of tables not
+    cleaned in this run, and their watermarks, are kept.
+    """
     if metrics:
         mdf = pd.DataFrame(metrics)
-        con.execute("DROP TABLE IF EXISTS clean_metrics")
+        for c in ("watermark", "reprocessed_from"):
+            mdf[c] = pd.to_datetime(mdf[c])
         con.register("m", mdf)
-        con.execute("CREATE TABLE clean_metrics AS SELECT * FROM m")
+        if "clean_metrics" not in {r[0] for r in con.execute("SHOW TABLES").fetchall()}:
+            con.execute("CREATE TABLE clean_metrics AS SELECT * FROM m")
+        else:
+            known = {r[0] for r in con.execute("DESCRIBE clean_metrics").fetchall()}
+            for name, dtype, *_ in con.execute("DESCRIBE m").fetchall():
+                if name not in known:
+                    con.execute(f"ALTER TABLE clean_metrics ADD COLUMN {_quote(name)} {dtype}")
+            con.execute('DELETE FROM clean_metrics WHERE "table" IN (SELECT "table" FROM m)')
+            con.execute("INSERT INTO clean_metrics BY NAME SELECT * FROM m")
+        con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+                "table" VARCHAR, run_timestamp TIMESTAMP, reprocessed_from TIMESTAMP, cleaned_rows BIGINT
+            )
+            """
+        )
+        con.execute(
+            f'INSERT INTO {RUNS_TABLE} SELECT "table", run_timestamp, reprocessed_from, cleaned_rows FROM m'
+        )
         con.unregister("m")
         logger.info("ℹ️  Written `clean_metrics` table with cleaning stats")
 
+
+def _latest_select(con, clean_name: str, where: str) -> str:
+    """Each station × pollutant's latest non-null value among clean_name's rows matching where."""
+    names = [r[0] for r in con.execute(f"DESCRIBE {_quote(clean_name)}").fetchall()]
+    values = value_columns(con, clean_name)
+    station = "CAST(station AS VARCHAR)" if "station" in names else "'" + clean_name[len("clean_"):].replace("'", "''") + "'"
+    return f"""
+        WITH src AS (
+            SELECT {station} AS station, datetime,
+                   {', '.join(f'CAST({_quote(c)} AS DOUBLE) AS {_quote(c)}' for c in values)}
+            FROM {_quote(clean_name)} WHERE datetime IS NOT NULL{where}
+        )
+        SELECT ? AS source, station, pollutant, max(datetime) AS datetime, arg_max(value, datetime) AS value,
+               ? AS updated_at
+        FROM (UNPIVOT src ON {', '.join(_quote(c) for c in values)} INTO NAME pollutant VALUE value)
+        GROUP BY ALL
+    """
+
+
+def update_latest(con, clean_name: str, since=None):
+    """
+    Bring clean_name's rows of latest_readings up to date after its rows
+    from since on were (re)written: only those rows are read, and a series'
+    stored reading is replaced when they hold a later one. since=None, or a
+    stored reading among the rewritten rows that nothing replaces (its value
+    was nulled), reads the whole table.
+    """
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {LATEST_TABLE} (source VARCHAR, station VARCHAR, pollutant VARCHAR, "
+        "datetime TIMESTAMP, value DOUBLE, updated_at TIMESTAMP)"
+    )
+    if not value_columns(con, clean_name):
+        con.execute(f"DELETE FROM {LATEST_TABLE} WHERE source = ?", [clean_name])
+        return
+    now = datetime.utcnow()
+    since = None if since is None or pd.isna(since) else pd.Timestamp(since).to_pydatetime()
+    if since is not None:
+        con.execute(
+            f"CREATE OR REPLACE TEMP TABLE _latest AS {_latest_select(con, clean_name, ' AND datetime >= ?')}",
+            [since, clean_name, now],
+        )
+        orphaned = con.execute(
+            f"""
+            SELECT count(*) FROM {LATEST_TABLE} AS l
+            WHERE l.source = ? AND l.datetime >= ?
+              AND NOT EXISTS (SELECT 1 FROM _latest AS f WHERE f.station = l.station AND f.pollutant = l.pollutant)
+            """,
+            [clean_name, since],
+        ).fetchone()[0]
+        if not orphaned:
+            con.execute(
+                f"""
+                DELETE FROM {LATEST_TABLE} AS l WHERE l.source = ?
+                  AND EXISTS (SELECT 1 FROM _latest AS f WHERE f.station = l.station AND f.pollutant = l.pollutant)
+                """,
+                [clean_name],
+            )
+            con.execute(f"INSERT INTO {LATEST_TABLE} BY NAME SELECT * FROM _latest")
+            con.execute("DROP TABLE _latest")
+            return
+        con.execute("DROP TABLE _latest")
+    con.execute(f"DELETE FROM {LATEST_TABLE} WHERE source = ?", [clean_name])
+    con.execute(
+        f"INSERT INTO {LATEST_TABLE} BY NAME {_latest_select(con, clean_name, '')}", [clean_name, now]
+    )
+
+
+def last_clean_run(con, clean_name: str):
+    """(run_timestamp, reprocessed_from, cleaned_rows) of clean_name's last clean run, or None if unrecorded."""
+    if not con.execute("SELECT count(*) FROM duckdb_tables() WHERE table_name = 'clean_metrics'").fetchone()[0]:
+        return None
+    columns = {r[0] for r in con.execute("DESCRIBE clean_metrics").fetchall()}
+    if not {"run_timestamp", "reprocessed_from", "cleaned_rows"} <= columns:
+        return None
+    return con.execute(
+        'SELECT run_timestamp, reprocessed_from, cleaned_rows FROM clean_metrics WHERE "table" = ?',
+        [clean_name[len("clean_"):]],
+    ).fetchone()
+
+
+def resume_point(con, clean_name: str, state_table: str, incremental: bool = True):
+    """
+    Where a stage derived from clean_name should resume, as (skip, restart
+    point or None to rebuild, last_clean_run()). state_table records, per
+    source, the clean_run the stage last consumed. The stage resumes from
+    the earliest reprocessed_from of the clean runs since that one, so runs
+    it missed (a standalone clean, a failed rollup) are caught up too; if
+    any of them rebuilt the table, or the consumed run is not in RUNS_TABLE,
+    the stage is rebuilt.
+    """
+    run = last_clean_run(con, clean_name)
+    if not incremental or run is None:
+        return False, None, run
+    seen = con.execute(f"SELECT clean_run FROM {state_table} WHERE source = ?", [clean_name]).fetchone()
+    if seen is None:
+        return False, None, run
+    if seen[0] == run[0]:
+        return True, None, run
+    if not con.execute("SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [RUNS_TABLE]).fetchone()[0]:
+        return False, None, run
+    missed = con.execute(
+        f"""
+        SELECT bool_or(run_timestamp = ?),
+               bool_or(run_timestamp > ? AND reprocessed_from IS NULL AND cleaned_rows > 0),
+               min(reprocessed_from) FILTER (WHERE run_timestamp > ?)
+        FROM {RUNS_TABLE} WHERE "table" = ?
+        """,
+        [seen[0], seen[0], seen[0], clean_name[len("clean_"):]],
+    ).fetchone()
+    known, rebuilt, restart = missed
+    if not known or rebuilt:
+        return False, None, run
+    if restart is not None:
+        return False, pd.Timestamp(restart), run
+    # incremental runs that found nothing new leave the table as it was
+    return True, None, run
+
+
+def _clean_parallel(db_path: str, max_gap_hours: int, workers: int, validation: str, sample_rows: int):
+    """
+    Clean all tables concurrently in a process pool. The database is closed
+    while workers read it (DuckDB allows many read-only processes but no
+    concurrent writer), then every clean_* table and clean_metrics are
+    written by this process in one transaction. Returns the per-table
+    report described in clean().
+    """
+    con = duckdb.connect(db_path)
+    tables = raw_tables(con)
     con.close()
+
+    with tempfile.TemporaryDirectory(prefix="clean_") as scratch:
+        handoff = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_clean_worker, db_path, tbl, max_gap_hours, scratch, validation, sample_rows)
+                for tbl in tables
+            ]
+            for future in as_completed(futures):
+                tbl, path, result, usage = future.result()
+                handoff[tbl] = (path, result, usage)
+                logger.info(f"➡️  Cleaned table `{tbl}` in a worker process")
+
+        con = duckdb.connect(db_path)
+        try:
+            con.begin()
+            metrics, report = [], []
+            for tbl in tables:
+                path, result, usage = handoff[tbl]
+                if result is None:
+                    continue
+                report.append({"table": tbl, "rows_in": result["rows_before"], "rows_out": result["cleaned_rows"], **usage})
+                clean_name = f"clean_{tbl}"
+                with pyarrow.memory_map(path) as source:
+                    _write_clean_table(con, clean_name, pa_ipc.open_file(source).read_all())
+                update_latest(con, clean_name)
+                logger.info(f"✅ Created `{clean_name}` ({result['cleaned_rows']} rows)")
+                result["reprocessed_from"] = pd.NaT
+                result["watermark"] = _watermark(con, clean_name)
+                result["run_timestamp"] = datetime.utcnow()
+                metrics.append(result)
+            _write_metrics(con, metrics)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+    logger.info("🎉 Cleaning complete.")
+    return report
+
+
+def clean(db_path: str, max_gap_hours: int = 2, engine: str = "pandas", chunk: str = None,
+          workers: int = 1, validation: str = "fast", sample_rows: int = DEFAULT_SAMPLE_ROWS,
+          incremental: bool = False, con=None):
+    """
+    Read every raw_* table from the DuckDB at db_path,
+    enforce types & ranges, drop/flag large gaps, interpolate small gaps,
+    treating each station as its own series when a table has a station column,
+    and write out clean_<tablename> tables. Also gathers metrics
+    about each table’s cleaning process into a clean_metrics table.
+
+    engine="pandas" pulls each table into a DataFrame; engine="sql" runs the
+    same steps as DuckDB window queries so the data never leaves the
+    database. Both produce the same tables and metrics.
+
+    chunk (pandas engine only) cleans each table in time windows of that
+    length, e.g. "MS" for calendar months, bounding peak memory by the window
+    size instead of the table size; results match the unchunked run exactly.
+
+    workers > 1 (pandas engine, whole tables) cleans tables concurrently in
+    that many processes; results are written back serially.
+
+    validation="fast" checks value columns with vectorised NumPy/DuckDB
+    code, nulls non-numeric and negative values and records per-column
+    counts in clean_metrics; "sample" counts over sample_rows random rows
+    per table (per window when chunked) and scales the counts up, sparing
+    the SQL engine a full counting scan; rows_validated records the sample
+    size. "full" runs the pandera schema and fails on any violation, with
+    its full diagnostic report.
+
+    incremental=True (pandas engine, serial) resumes each table from the
+    watermark recorded in clean_metrics: only rows after it, plus a
+    max_gap_hours look-back and any trailing null run interpolation may now
+    fill, are cleaned again and upserted into the existing clean table.
+    Tables without a usable watermark, or whose rows before it changed, are
+    rebuilt. clean_metrics then describes the re-cleaned rows only, with
+    reprocessed_from set to where the run resumed.
+
+    con is an open connection to db_path to use instead of opening one; it
+    is left open. Not with workers > 1, which needs the database closed.
+
+    Returns one dict per cleaned table: table, rows_in, rows_out and the
+    resource usage measured by Meter (wall and CPU seconds, bytes read,
+    peak RSS).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown cleaning engine: {engine!r}")
+    if validation not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode: {validation!r}")
+    if incremental and engine != "pandas":
+        raise ValueError("incremental applies to the pandas engine")
+    if chunk and engine != "pandas":
+        raise ValueError("chunk applies to the pandas engine; the sql engine never loads whole tables")
+    if workers > 1:
+        if engine != "pandas" or chunk:
+            raise ValueError("workers applies to the pandas engine without chunk")
+        if incremental:
+            raise ValueError("incremental cleaning runs serially; use workers=1")
+        if con is not None:
+            raise ValueError("workers > 1 opens its own connections; do not pass con")
+        return _clean_parallel(db_path, max_gap_hours, workers, validation, sample_rows)
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path))
+    try:
+        report = _clean_tables(con, max_gap_hours, engine, chunk, validation, sample_rows, incremental)
+    finally:
+        if own:
+            con.close()
     logger.info("🎉 Cleaning complete.")
+    return report
+
+
+def _clean_tables(con, max_gap_hours: int, engine: str, chunk: str, validation: str, sample_rows: int,
+                  incremental: bool):
+    """The serial body of clean(), over an open connection."""
+    metrics = []  # will hold one dict per table
+    report = []
+
+    for tbl in raw_tables(con):
+        logger.info(f"➡️  Cleaning table `{tbl}` ({engine})")
+        clean_name = f"clean_{tbl}"
+        result = _clean_one(con, tbl, clean_name, max_gap_hours, engine, chunk, validation, sample_rows,
+                            incremental)
+        if result is None:
+            continue
+        result, usage = result
+        report.append({"table": tbl, "rows_in": result["rows_before"], "rows_out": result["cleaned_rows"], **usage})
+        metrics.append(result)
+
+    # write out metrics table
+    _write_metrics(con, metrics)
+    return report
+
+
+def _clean_one(con, tbl: str, clean_name: str, max_gap_hours: int, engine: str, chunk: str, validation: str,
+               sample_rows: int, incremental: bool):
+    """Clean tbl into clean_name. Returns (metrics dict, Meter.as_dict()), or None if skipped."""
+    with Meter() as meter:
+        if engine == "sql":
+            result = clean_table_sql(con, tbl, clean_name, max_gap_hours, KEY_COLUMNS, validation, sample_rows)
+            if result is None:
+                logger.warning(f"  • `{tbl}` has no 'datetime' column; skipping")
+                return None
+        elif chunk or incremental:
+            con.begin()
+            try:
+                result = _clean_table_chunked(
+                    con, tbl, clean_name, max_gap_hours, chunk, validation, sample_rows, incremental
+                )
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+            if result is None:
+                return None
+        else:
+            result = _clean_table_pandas(con, tbl, max_gap_hours, validation, sample_rows)
+            if result is None:
+                return None
+            validated, result = result
+
+            # write cleaned table
+            _write_clean_table(con, clean_name, validated)
+        since = result.get("reprocessed_from")
+        # an incremental run that found nothing new leaves the table as it was
+        if not (incremental and pd.isna(since) and result["cleaned_rows"] == 0):
+            update_latest(con, clean_name, since)
+    if pd.isna(result.setdefault("reprocessed_from", pd.NaT)):
+        logger.info(f"✅ Created `{clean_name}` ({result['cleaned_rows']} rows)")
+    else:
+        logger.info(
+            f"✅ Updated `{clean_name}` from {result['reprocessed_from']} ({result['cleaned_rows']} rows)"
+        )
+
+    # record metrics
+    result["watermark"] = _watermark(con, clean_name)
+    result["run_timestamp"] = datetime.utcnow()
+    return result, meter.as_dict()
+
+
+@click.command()
+@click.option(
+    "--db-path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="DuckDB file holding the raw tables"
+)
+@click.option(
+    "--max-gap-hours",
+    default=2,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Gaps up to this long are interpolated, longer ones counted"
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="pandas",
+    show_default=True,
+    help="Clean in pandas or inside DuckDB"
+)
+@click.option(
+    "--chunk",
+    default=None,
+    help="Clean in time windows of this pandas offset alias, e.g. MS (pandas engine)"
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Tables cleaned in parallel processes (pandas engine)"
+)
+@click.option(
+    "--validation",
+    type=click.Choice(VALIDATION_MODES),
+    default="fast",
+    show_default=True,
+    help="Value checks: vectorised, sampled, or the full pandera schema"
+)
+@click.option(
+    "--incremental/--full",
+    default=False,
+    show_default=True,
+    help="Re-clean only rows past each table's watermark"
+)
+def main(db_path: Path, max_gap_hours: int, engine: str, chunk: str, workers: int, validation: str,
+         incremental: bool):
+    """Command-line entry point for clean."""
+    clean(str(db_path), max_gap_hours, engine=engine, chunk=chunk, workers=workers,
+          validation=validation, incremental=incremental)
+
+
+if __name__ == "__main__":
+    main()
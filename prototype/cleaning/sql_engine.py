@@ -0,0 +1,153 @@
+# prototype/cleaning/sql_engine.py
+"""
+SQL-native cleaning engine: the same steps as the pandas path in clean.py
+(datetime coercion, non-negative checks, gap detection and bounded linear
+interpolation) expressed as DuckDB window queries, so rows never leave the
+database and DuckDB can spill to disk instead of holding tables in RAM.
+"""
+import logging
+
+from prototype.cleaning.validate import (
+    DEFAULT_SAMPLE_ROWS, count_violations_sql, empty_counts, violation_metrics,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def interpolation_sql(col: str, i: int, limit: int) -> str:
+    """
+    Expression reproducing pandas' interpolate(limit=limit,
+    limit_direction="both") for value column col, given the anchor columns
+    computed in clean_table_sql: a null is filled when it lies within `limit`
+    rows of the previous or the next valid value; between two anchors the
+    value is linear in row position (as np.interp computes it), beyond the
+    first/last anchor the nearest valid value is carried.
+    """
+    q = _quote(col)
+    pr, pv, nr, nv = (f"_pr{i}", f"_pv{i}", f"_nr{i}", f"_nv{i}")
+    return (
+        f"CASE WHEN {q} IS NOT NULL THEN {q} "
+        f"WHEN (_rn - {pr} <= {limit}) OR ({nr} - _rn <= {limit}) THEN "
+        f"CASE WHEN {pr} IS NULL THEN {nv} WHEN {nr} IS NULL THEN {pv} "
+        f"ELSE ({nv} - {pv}) / ({nr} - {pr}) * (_rn - {pr}) + {pv} END "
+        f"END AS {q}"
+    )
+
+
+def clean_table_sql(con, tbl: str, clean_name: str, max_gap_hours: int, key_columns,
+                    validation: str = "fast", sample_rows: int = DEFAULT_SAMPLE_ROWS) -> dict:
+    """
+    Clean raw table tbl into clean_name entirely inside DuckDB and return the
+    same metrics dict as the pandas engine, or None if tbl has no datetime
+    column. Values that are not numeric or negative become null and are
+    counted (see validate.py); with validation="full" any such value raises
+    ValueError instead.
+    """
+    names = [r[0] for r in con.execute(f"DESCRIBE {tbl}").fetchall()]
+    if "datetime" not in names:
+        return None
+    keys = [c for c in names if c in key_columns]
+    values = [c for c in names if c != "datetime" and c not in key_columns]
+
+    series = [c for c in ("station",) if c in names]
+    partition = f"PARTITION BY {', '.join(_quote(c) for c in series)} " if series else ""
+    limit = int(max_gap_hours)
+
+    # coerce datetimes once, then value types with out-of-range values nulled
+    typed = ["datetime"] + [_quote(c) for c in keys]
+    for c in values:
+        q = _quote(c)
+        typed.append(f"CASE WHEN TRY_CAST({q} AS DOUBLE) >= 0 THEN TRY_CAST({q} AS DOUBLE) END AS {q}")
+    con.execute(
+        f"CREATE OR REPLACE TEMP VIEW _clean_typed AS "
+        f"SELECT * REPLACE (TRY_CAST(datetime AS TIMESTAMP) AS datetime) FROM {tbl}"
+    )
+    con.execute("CREATE OR REPLACE TEMP VIEW _clean_checked AS SELECT * FROM _clean_typed WHERE datetime IS NOT NULL")
+    con.execute(f"CREATE OR REPLACE TEMP VIEW _clean_valid AS SELECT {', '.join(typed)} FROM _clean_checked")
+    try:
+        rows_before, rows_after_dt = con.execute(
+            "SELECT count(*), count(datetime) FROM _clean_typed"
+        ).fetchone()
+
+        # range checks
+        if values:
+            counts, rows_validated = count_violations_sql(
+                con, "_clean_checked", values, validation, sample_rows, rows_after_dt
+            )
+        else:
+            counts, rows_validated = empty_counts(values), rows_after_dt
+        if validation == "full" and any(n for kinds in counts.values() for n in kinds.values()):
+            raise ValueError(f"`{tbl}` failed validation: {counts}")
+        rows_after_schema = rows_after_dt
+
+        # detect gaps
+        large_gaps = con.execute(
+            f"""
+            SELECT count(*) FROM (
+                SELECT epoch(datetime - lag(datetime) OVER ({partition}ORDER BY datetime)) / 3600.0 AS gap
+                FROM _clean_valid
+            ) WHERE gap > {float(max_gap_hours)}
+            """
+        ).fetchone()[0]
+
+        # count nulls before interpolation
+        null_count = " + ".join(f"count(*) - count({_quote(c)})" for c in values) or "0"
+        nulls_before = int(con.execute(f"SELECT {null_count} FROM _clean_valid").fetchone()[0] or 0)
+
+        # interpolate small gaps: anchor each row to the previous/next valid value per column
+        anchors = []
+        for i, c in enumerate(values):
+            q = _quote(c)
+            anchors += [
+                f"max(CASE WHEN {q} IS NOT NULL THEN _rn END) OVER _before AS _pr{i}",
+                f"last_value({q} IGNORE NULLS) OVER _before AS _pv{i}",
+                f"min(CASE WHEN {q} IS NOT NULL THEN _rn END) OVER _after AS _nr{i}",
+                f"first_value({q} IGNORE NULLS) OVER _after AS _nv{i}",
+            ]
+        # pandas' output moves datetime to the front unless rows are grouped by station
+        order = names if series else ["datetime"] + [c for c in names if c != "datetime"]
+        output = [
+            interpolation_sql(c, values.index(c), limit) if c in values else _quote(c)
+            for c in order
+        ]
+        sort = ", ".join([_quote(c) for c in series] + ["datetime"])
+        con.execute(f"DROP TABLE IF EXISTS {clean_name}")
+        con.execute(
+            f"""
+            CREATE TABLE {clean_name} AS
+            WITH ordered AS (
+                SELECT *, row_number() OVER ({partition}ORDER BY datetime) AS _rn FROM _clean_valid
+            ), anchored AS (
+                SELECT *{''.join(', ' + a for a in anchors)}
+                FROM ordered
+                WINDOW _before AS ({partition}ORDER BY _rn ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW),
+                       _after AS ({partition}ORDER BY _rn ROWS BETWEEN CURRENT ROW AND UNBOUNDED FOLLOWING)
+            )
+            SELECT {', '.join(output)} FROM anchored ORDER BY {sort}
+            """
+        )
+
+        # count nulls after interpolation
+        cleaned_rows = con.execute(f"SELECT count(*) FROM {clean_name}").fetchone()[0]
+        nulls_after = int(con.execute(f"SELECT {null_count} FROM {clean_name}").fetchone()[0] or 0)
+    finally:
+        con.execute("DROP VIEW IF EXISTS _clean_valid")
+        con.execute("DROP VIEW IF EXISTS _clean_checked")
+        con.execute("DROP VIEW IF EXISTS _clean_typed")
+
+    return {
+        "table": tbl,
+        "rows_before": rows_before,
+        "rows_after_dt": rows_after_dt,
+        "rows_after_schema": rows_after_schema,
+        "large_gaps_detected": int(large_gaps),
+        "nulls_before_interp": nulls_before,
+        "nulls_after_interp": nulls_after,
+        "values_interpolated": nulls_before - nulls_after,
+        "cleaned_rows": cleaned_rows,
+        **violation_metrics(counts, rows_before - rows_after_dt, validation, rows_validated),
+    }
@@ -0,0 +1,110 @@
+# prototype/cleaning/validate.py
+"""
+Fast-path validation for the cleaning step.
+
+The checks are the ones the pandera schema in clean.py encodes (datetime
+present, value columns numeric and >= 0), applied column-wise with NumPy, or
+as one aggregate query for the SQL engine. Offending values are set to null
+and counted instead of failing the run; the counts end up in clean_metrics.
+Pandera is only used for validation="full", which still raises on the first
+bad table with its complete failure report.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+VALIDATION_MODES = ("fast", "sample", "full")
+DEFAULT_SAMPLE_ROWS = 100_000
+SAMPLE_SEED = 0
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def empty_counts(value_columns) -> dict:
+    return {c: {"not_numeric": 0, "negative": 0} for c in value_columns}
+
+
+def scale_counts(counts: dict, rows_validated: int, total_rows: int) -> dict:
+    """Scale counts taken over rows_validated sampled rows up to total_rows."""
+    if not rows_validated or rows_validated >= total_rows:
+        return counts
+    factor = total_rows / rows_validated
+    return {c: {kind: round(n * factor) for kind, n in kinds.items()} for c, kinds in counts.items()}
+
+
+def validate_frame(df: pd.DataFrame, value_columns, mode: str = "fast",
+                   sample_rows: int = DEFAULT_SAMPLE_ROWS):
+    """
+    Coerce value_columns of df to float64 and null out negative values.
+    Returns (df, counts, rows_validated): counts maps each column to its
+    number of non-numeric and negative values. In "sample" mode the counts
+    are taken over a random sample of sample_rows rows and scaled up to the
+    whole frame; the coercion still applies to every row.
+    """
+    sample = None
+    if mode == "sample" and len(df) > sample_rows:
+        rng = np.random.default_rng(SAMPLE_SEED)
+        sample = np.sort(rng.choice(len(df), size=sample_rows, replace=False))
+    counts = {}
+    for c in value_columns:
+        present = df[c].notna().to_numpy()
+        values = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+        not_numeric = present & np.isnan(values)
+        negative = values < 0
+        if sample is not None:
+            not_numeric, negative = not_numeric[sample], negative[sample]
+        counts[c] = {"not_numeric": int(not_numeric.sum()), "negative": int(negative.sum())}
+        df[c] = np.where(values < 0, np.nan, values)
+    if sample is None:
+        return df, counts, len(df)
+    return df, scale_counts(counts, len(sample), len(df)), len(sample)
+
+
+def count_violations_sql(con, relation: str, value_columns, mode: str = "fast",
+                         sample_rows: int = DEFAULT_SAMPLE_ROWS, total_rows: int = None):
+    """
+    SQL counterpart of validate_frame's counting: one aggregate pass over
+    the rows of relation (a table or view whose value columns are still
+    uncoerced), or over a reservoir sample of it in "sample" mode, in which
+    case the counts are scaled up to total_rows when it is given.
+    Returns (counts, rows_validated).
+    """
+    if mode == "sample":
+        relation = f"(SELECT * FROM {relation} USING SAMPLE reservoir({int(sample_rows)} ROWS) REPEATABLE ({SAMPLE_SEED}))"
+    aggregates = ["count(*)"]
+    for c in value_columns:
+        q = _quote(c)
+        aggregates += [
+            f"count(*) FILTER (WHERE {q} IS NOT NULL AND TRY_CAST({q} AS DOUBLE) IS NULL)",
+            f"count(*) FILTER (WHERE TRY_CAST({q} AS DOUBLE) < 0)",
+        ]
+    row = con.execute(f"SELECT {', '.join(aggregates)} FROM {relation} AS checked").fetchone()
+    counts = {
+        c: {"not_numeric": int(row[1 + 2 * i]), "negative": int(row[2 + 2 * i])}
+        for i, c in enumerate(value_columns)
+    }
+    if mode == "sample" and total_rows is not None:
+        counts = scale_counts(counts, int(row[0]), total_rows)
+    return counts, int(row[0])
+
+
+def merge_counts(total: dict, counts: dict) -> dict:
+    for c, kinds in counts.items():
+        for kind, n in kinds.items():
+            total.setdefault(c, {}).setdefault(kind, 0)
+            total[c][kind] += n
+    return total
+
+
+def violation_metrics(counts: dict, dropped_datetimes: int, mode: str, rows_validated: int) -> dict:
+    """The clean_metrics columns describing one table's validation."""
+    report = {"datetime": {"null": int(dropped_datetimes)}, **counts}
+    return {
+        "validation": mode,
+        "rows_validated": int(rows_validated),
+        "violations_total": sum(n for kinds in report.values() for n in kinds.values()),
+        "violations": json.dumps(report, sort_keys=True),
+    }
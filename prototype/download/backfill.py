@@ -0,0 +1,264 @@
+# prototype/download/backfill.py
+"""
+Historical backfill of the DEFRA hourly data straight into DuckDB.
+
+A date range and a list of sites are split into (site, window) requests,
+run by a thread pool whose request starts are spaced to at most `rate` per
+second. Each response is parsed as it arrives (pyarrow's streaming CSV
+reader), every column but datetime as text, as the ingest step reads
+appended tails: flags and "No data" never fail a window, and the clean
+stage casts the values (TRY_CAST). The rows are appended to the BACKFILL_TABLE raw table in the ingest step's
+observations layout (station, datetime, ..., source_file), so no response
+is ever held in memory whole. The clean stage picks the table up like any
+other raw table.
+
+Every window is loaded in its own transaction together with its row in
+the CHECKPOINT_TABLE, so an interrupted backfill resumes with the windows
+it had not finished. Requests failing on the network (connection errors,
+bodies cut short, 5xx and 429 responses) are retried with exponential
+backoff; a response that does not parse fails its window at once.
+"""
+import csv
+import http.client
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import click
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from prototype.ingestion.ingest import STREAM_BLOCK_SIZE, _insert_observations
+from prototype.periods import windows
+from prototype.pipeline.instrument import Meter
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_TABLE = "defra_hourly"
+CHECKPOINT_TABLE = "backfill_checkpoint"
+
+# {site}, {start} and {end} (inclusive dates) are filled in per request
+DEFRA_URL = (
+    "https://uk-air.defra.gov.uk/data_api?module=HourlyData&site={site}"
+    "&start={start:%Y-%m-%d}&end={end:%Y-%m-%d}&format=csv"
+)
+
+WINDOW = "MS"  # one request per site and calendar month
+WORKERS = 4
+RATE = 2.0     # request starts per second, over all workers
+RETRIES = 3
+TIMEOUT = 120
+
+
+class _RateLimit:
+    """Spaces calls to wait() at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        time.sleep(at - now)
+
+
+def _ensure_checkpoint(con):
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            site VARCHAR, window_start TIMESTAMP, window_end TIMESTAMP, row_count BIGINT,
+            loaded_at TIMESTAMP, PRIMARY KEY (site, window_start)
+        )
+        """
+    )
+
+
+def _source_file(site: str, lo) -> str:
+    return f"defra:{site}:{lo:%Y-%m-%d}"
+
+
+class _Body:
+    """A response body that raises IncompleteRead at an end short of its Content-Length."""
+
+    def __init__(self, response):
+        self.response = response
+        self.url = response.url
+        self.expected = response.headers.get("Content-Length")
+        self.received = 0
+
+    def _count(self, data: bytes) -> bytes:
+        self.received += len(data)
+        if not data and self.expected is not None and self.received < int(self.expected):
+            raise http.client.IncompleteRead(b"", int(self.expected) - self.received)
+        return data
+
+    def read(self, size=-1) -> bytes:
+        return self._count(self.response.read(size))
+
+    def readline(self) -> bytes:
+        return self._count(self.response.readline())
+
+    @property
+    def closed(self) -> bool:
+        return self.response.closed
+
+
+def _open_csv(response) -> pa.RecordBatchReader:
+    """
+    A streaming reader of a CSV response: datetime parsed as a timestamp,
+    every other column read as text, so no later block or window can
+    disagree with the types the first one would have inferred.
+    """
+    header = next(csv.reader([response.readline().decode("utf-8-sig")]), [])
+    if "datetime" not in header:
+        raise ValueError(f"{response.url}: no datetime column")
+    return pacsv.open_csv(
+        response,
+        read_options=pacsv.ReadOptions(column_names=header, block_size=STREAM_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: pa.timestamp("s") if c == "datetime" else pa.string() for c in header},
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def _load_window(con, ddl_lock, limit, url_template: str, site: str, lo, hi, timeout: float) -> int:
+    """Stream one (site, window) response into BACKFILL_TABLE and checkpoint it, in one transaction."""
+    url = url_template.format(site=site, start=lo, end=hi - pd.Timedelta(days=1))
+    limit.wait()
+    cur = con.cursor()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            reader = _open_csv(_Body(response))
+            source = _source_file(site, lo)
+            with ddl_lock:
+                # create the table or add new columns up front: DuckDB fails appends racing an ALTER
+                exists = bool(cur.execute(
+                    "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [BACKFILL_TABLE]
+                ).fetchone()[0])
+                _insert_observations(cur, reader.schema.empty_table(), site, source, exists, BACKFILL_TABLE)
+            cur.begin()
+            try:
+                cur.execute(f"DELETE FROM {BACKFILL_TABLE} WHERE source_file = ?", [source])
+                rows = _insert_observations(cur, reader, site, source, True, BACKFILL_TABLE)
+                cur.execute(
+                    f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} VALUES (?, ?, ?, ?, ?)",
+                    [site, lo.to_pydatetime(), hi.to_pydatetime(), rows, datetime.utcnow()],
+                )
+                cur.commit()
+            except Exception:
+                cur.rollback()
+                raise
+    finally:
+        cur.close()
+    return rows
+
+
+def backfill(db_path, sites, start, end, window: str = WINDOW, workers: int = WORKERS, rate: float = RATE,
+             retries: int = RETRIES, backoff: float = 1.0, url_template: str = DEFRA_URL,
+             timeout: float = TIMEOUT, con=None) -> list:
+    """
+    Load every site's hourly data for [start, end) into BACKFILL_TABLE of
+    the DuckDB at db_path, one request per site and window (a pandas offset
+    alias), skipping windows the checkpoint already records. Requests run
+    in `workers` threads, starting at most `rate` per second; a failed one
+    is retried up to `retries` times after backoff, 2·backoff... seconds.
+    con is an open connection to db_path to use instead of opening one; it
+    is left open.
+
+    Returns one dict per window loaded: site, start, end, rows and the
+    resource usage measured by Meter. Re-raises the first window that
+    still fails, after the others finished.
+    """
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path))
+    try:
+        _ensure_checkpoint(con)
+        done = {
+            (site, pd.Timestamp(lo))
+            for site, lo in con.execute(f"SELECT site, window_start FROM {CHECKPOINT_TABLE}").fetchall()
+        }
+        jobs = [(site, lo, hi) for site in sites for lo, hi in windows(start, end, window) if (site, lo) not in done]
+        logger.info(f"➡️  Backfilling {len(jobs)} windows ({len(done)} already loaded)")
+        ddl_lock, limit = threading.Lock(), _RateLimit(rate)
+
+        def attempt(site, lo, hi):
+            for tried in range(retries + 1):
+                try:
+                    with Meter() as meter:
+                        rows = _load_window(con, ddl_lock, limit, url_template, site, lo, hi, timeout)
+                    logger.info(f"✅ Loaded {site} {lo:%Y-%m-%d}..{hi:%Y-%m-%d}: {rows} rows")
+                    return {"site": site, "start": lo, "end": hi, "rows": rows, **meter.as_dict()}
+                except (OSError, http.client.HTTPException, duckdb.TransactionException) as exc:
+                    # network failures only (URLError is an OSError); a body that does not parse is not retried
+                    if isinstance(exc, urllib.error.HTTPError) and exc.code < 500 and exc.code != 429 \
+                            or tried == retries:
+                        raise
+                    logger.warning(f"⚠️  {site} {lo:%Y-%m-%d}: {exc}; retrying")
+                    time.sleep(backoff * 2 ** tried)
+
+        report, failure = [], None
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs) or 1))) as pool:
+            futures = [pool.submit(attempt, *job) for job in jobs]
+            for future in as_completed(futures):
+                try:
+                    report.append(future.result())
+                except Exception as exc:
+                    failure = failure or exc
+        if failure is not None:
+            raise failure
+    finally:
+        if own:
+            con.close()
+    return sorted(report, key=lambda r: (r["site"], r["start"]))
+
+
+@click.command()
+@click.option(
+    "--db-path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="DuckDB file to load the backfill into"
+)
+@click.option("--site", "sites", multiple=True, required=True, help="Site code (repeatable)")
+@click.option("--start", required=True, type=click.DateTime(["%Y-%m-%d"]), help="First day to load")
+@click.option("--end", required=True, type=click.DateTime(["%Y-%m-%d"]), help="Day after the last to load")
+@click.option(
+    "--window",
+    default=WINDOW,
+    show_default=True,
+    help="Request size as a pandas offset alias, e.g. MS or W"
+)
+@click.option(
+    "--workers",
+    default=WORKERS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Requests in flight at once"
+)
+@click.option(
+    "--rate",
+    default=RATE,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Request starts per second"
+)
+def main(db_path: Path, sites: tuple, start: datetime, end: datetime, window: str, workers: int, rate: float):
+    """Command-line entry point for backfill."""
+    backfill(db_path, sites, start, end, window=window, workers=workers, rate=rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# prototype/download/fetch.py
+"""
+Download the raw data files: many at once, resumable, and only when they
+changed.
+
+- Files are fetched by a bounded thread pool, at most per_host at a time
+  from any one host.
+- Bytes go to <dest>.part, renamed over dest only once complete (and, when
+  a SHA-256 is given, verified), so dest is never a partial file.
+- An interrupted .part is resumed with a Range request guarded by If-Range,
+  so a file that changed in between is fetched again from the start.
+- The ETag, Last-Modified, length and SHA-256 of every completed download
+  are kept in <dest>.meta.json; the next run sends If-None-Match /
+  If-Modified-Since and keeps dest on 304 Not Modified. A dest whose size
+  no longer matches (truncated, edited) is fetched again.
+
+Only the standard library is used (urllib), so the downloader runs
+wherever the pipeline does.
+"""
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import click
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+WORKERS = 8
+PER_HOST = 2
+TIMEOUT = 60
+RETRIES = 3
+
+
+@dataclass(frozen=True)
+class Download:
+    """One file to fetch: its URL, where it goes and, optionally, its expected SHA-256."""
+    url: str
+    dest: Path
+    sha256: str = None
+
+
+def _meta_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".meta.json")
+
+
+def _part_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part")
+
+
+def _read_meta(dest: Path) -> dict:
+    try:
+        return json.loads(_meta_path(dest).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(dest: Path, meta: dict):
+    """Replace dest's metadata atomically."""
+    tmp = _meta_path(dest).with_suffix(".tmp")
+    tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp, _meta_path(dest))
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _validators(headers) -> dict:
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+
+def _request(download: Download, meta: dict, offset: int) -> urllib.request.Request:
+    """The GET for download: conditional on the stored validators when dest is intact, ranged when resuming."""
+    headers = {}
+    dest = Path(download.dest)
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        validator = meta.get("part_etag") or meta.get("part_last_modified")
+        if validator:
+            headers["If-Range"] = validator
+    elif dest.exists() and meta.get("length") == dest.stat().st_size:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    elif dest.exists() and not meta:
+        # a file from before metadata was kept: only fetch it again if the server's copy is newer
+        headers["If-Modified-Since"] = formatdate(dest.stat().st_mtime, usegmt=True)
+    return urllib.request.Request(download.url, headers=headers)
+
+
+def fetch(download: Download, timeout: float = TIMEOUT, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Bring download.dest up to date with download.url in one attempt.
+    Returns {"url", "dest", "status": "downloaded" | "resumed" |
+    "not_modified", "bytes" (received), "seconds"}. Raises ValueError on a
+    checksum mismatch (the partial file is discarded) and urllib's errors
+    on failed requests (the partial file is kept for the next attempt).
+    """
+    started = time.perf_counter()
+    dest, part = Path(download.dest), _part_path(Path(download.dest))
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    meta = _read_meta(dest)
+    offset = part.stat().st_size if part.exists() else 0
+    try:
+        response = urllib.request.urlopen(_request(download, meta, offset), timeout=timeout)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304:
+            logger.info(f"⏭️  Not modified: {dest}")
+            return {"url": download.url, "dest": str(dest), "status": "not_modified", "bytes": 0,
+                    "seconds": time.perf_counter() - started}
+        if exc.code == 416 and offset:
+            # the partial file is no prefix of the current one: start over
+            part.unlink()
+            return fetch(download, timeout, chunk_size)
+        raise
+
+    received = 0
+    with response:
+        resumed = bool(offset) and response.status == 206
+        if not resumed:
+            offset = 0
+            # remember what the partial file is a prefix of, for If-Range when resuming it
+            meta.update({f"part_{k}": v for k, v in _validators(response.headers).items()})
+            _write_meta(dest, meta)
+        with open(part, "ab" if resumed else "wb") as f:
+            for block in iter(lambda: response.read(chunk_size), b""):
+                f.write(block)
+                received += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        expected = response.headers.get("Content-Length")
+        if expected is not None and received != int(expected):
+            raise urllib.error.URLError(f"{download.url}: received {received} of {expected} bytes")
+        validators = _validators(response.headers)
+
+    digest = _sha256(part)
+    if download.sha256 and digest != download.sha256.lower():
+        part.unlink()
+        raise ValueError(f"{download.url}: SHA-256 {digest} does not match the expected {download.sha256}")
+    length = part.stat().st_size
+    os.replace(part, dest)
+    _write_meta(dest, {**validators, "length": length, "sha256": digest, "url": download.url})
+    status = "resumed" if resumed else "downloaded"
+    logger.info(f"✅ {status.capitalize()}: {dest} ({received} bytes)")
+    return {"url": download.url, "dest": str(dest), "status": status, "bytes": received,
+            "seconds": time.perf_counter() - started}
+
+
+def fetch_all(downloads, workers: int = WORKERS, per_host: int = PER_HOST, timeout: float = TIMEOUT,
+              retries: int = RETRIES, backoff: float = 1.0) -> list:
+    """
+    Fetch every Download concurrently, in up to workers threads with at
+    most per_host requests to any one host at a time. A failed transfer is
+    retried up to retries times, resuming from what it received, after
+    backoff, 2·backoff... seconds. Returns fetch()'s result per download,
+    in order; re-raises the first download that still fails.
+    """
+    downloads = list(downloads)
+    hosts = {urlsplit(d.url).netloc for d in downloads}
+    limits = {host: threading.Semaphore(per_host) for host in hosts}
+
+    def attempt(download):
+        for tried in range(retries + 1):
+            try:
+                with limits[urlsplit(download.url).netloc]:
+                    return fetch(download, timeout)
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as exc:
+                if isinstance(exc, urllib.error.HTTPError) and exc.code < 500 or tried == retries:
+                    raise
+                logger.warning(f"⚠️  {download.url}: {exc}; retrying")
+                time.sleep(backoff * 2 ** tried)
+
+    results = [None] * len(downloads)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(downloads)))) as pool:
+        futures = {pool.submit(attempt, d): i for i, d in enumerate(downloads)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+@click.command()
+@click.argument("urls", nargs=-1, required=True)
+@click.option(
+    "--dest-dir",
+    default=Path("data") / "raw",
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory the files are saved to, under their URL's file name"
+)
+@click.option(
+    "--workers",
+    default=WORKERS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Files downloaded at once"
+)
+@click.option(
+    "--per-host",
+    default=PER_HOST,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Files downloaded at once from one host"
+)
+def main(urls: tuple, dest_dir: Path, workers: int, per_host: int):
+    """Command-line entry point for fetch_all."""
+    downloads = [Download(url, dest_dir / Path(urlsplit(url).path).name) for url in urls]
+    fetch_all(downloads, workers=workers, per_host=per_host)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# prototype/export/parquet.py
+"""
+Export the clean_* tables as Parquet datasets, one per table, partitioned
+by station and year (hive layout: <table>/station=<s>/year=<y>/*.parquet).
+Rows are sorted by datetime so each row group's min/max statistics cover a
+narrow time range, and readers can skip whole files and row groups.
+
+read_clean() is the consumer side: it loads only the requested columns and
+partitions, memory-mapping the files so pyarrow reads them without copying.
+"""
+import logging
+import shutil
+from pathlib import Path
+
+import click
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from prototype.cleaning.clean import SYSTEM_TABLES
+from prototype.pipeline.instrument import Meter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUT_DIR = Path("data") / "clean" / "parquet"
+
+# an upper bound: files are already split per station and year, and an hourly
+# station-year (at most 8,784 rows) fits in one row group, so readers prune by
+# partition first; row group statistics only narrow reads inside denser files
+ROW_GROUP_SIZE = 100_000
+
+PARTITIONING = ds.partitioning(pa.schema([("station", pa.string()), ("year", pa.int32())]), flavor="hive")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def clean_tables(con) -> list:
+    """All clean_* tables with a datetime column (clean_metrics excluded)."""
+    return [
+        name
+        for (name,) in con.execute("SHOW TABLES").fetchall()
+        if name.startswith("clean_") and name not in SYSTEM_TABLES
+        and "datetime" in {r[0] for r in con.execute(f"DESCRIBE {_quote(name)}").fetchall()}
+    ]
+
+
+def _export_table(con, table: str, target: Path, row_group_size: int) -> int:
+    """
+    COPY one clean table to target, replacing what was there. Tables
+    without a station column (one table per site) use the site name, the
+    table name without its clean_ prefix. Returns the number of rows.
+    """
+    columns = [r[0] for r in con.execute(f"DESCRIBE {_quote(table)}").fetchall()]
+    station = "station" if "station" in columns else f"{_literal(table[len('clean_'):])} AS station"
+    rest = ", ".join(_quote(c) for c in columns if c != "station")
+    staging = target.with_name(target.name + ".tmp")
+    previous = target.with_name(target.name + ".old")
+    if previous.exists() and not target.exists():
+        # an earlier export stopped between its two renames: put its dataset back first
+        previous.rename(target)
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(previous, ignore_errors=True)
+    con.execute(
+        f"""
+        COPY (
+            SELECT {station}, year(datetime) AS year, {rest}
+            FROM {_quote(table)} WHERE datetime IS NOT NULL
+            ORDER BY station, datetime
+        ) TO {_literal(str(staging))} (
+            FORMAT PARQUET, PARTITION_BY (station, year), ROW_GROUP_SIZE {int(row_group_size)},
+            COMPRESSION ZSTD
+        )
+        """
+    )
+    rows = con.execute(f"SELECT count(datetime) FROM {_quote(table)}").fetchone()[0]
+    # Swap in the finished dataset by two renames, so readers never see a half-written one and a crash
+    # never loses the old one. A directory cannot be renamed over a non-empty one, so target is
+    # missing for the instant between the renames.
+    if target.exists():
+        target.rename(previous)
+    if staging.exists():
+        staging.rename(target)
+    shutil.rmtree(previous, ignore_errors=True)
+    return rows
+
+
+def export(db_path: str, out_dir=DEFAULT_OUT_DIR, row_group_size: int = ROW_GROUP_SIZE, con=None) -> list:
+    """
+    Write every clean_* table in the DuckDB at db_path to out_dir/<table>.
+    con is an open connection to db_path to use instead of opening one; it
+    is left open. Returns one dict per table: table, rows_in, rows_out
+    (rows exported) and the resource usage measured by Meter.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path), read_only=True)
+    try:
+        exported = []
+        for table in clean_tables(con):
+            with Meter() as meter:
+                rows = _export_table(con, table, out_dir / table, row_group_size)
+            exported.append({"table": table, "rows_in": rows, "rows_out": rows, **meter.as_dict()})
+            logger.info(f"✅ Exported `{table}` ({rows} rows) → {out_dir / table}")
+    finally:
+        if own:
+            con.close()
+    return exported
+
+
+def dataset(path) -> ds.Dataset:
+    """The Parquet dataset of one exported table, read through memory maps."""
+    return ds.dataset(
+        str(path), format="parquet", partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def read_clean(path, columns=None, stations=None, years=None, start=None, end=None) -> pa.Table:
+    """
+    Read an exported table as an Arrow table. Only the given columns are
+    decoded; stations/years prune partition directories, start/end (on
+    datetime, end exclusive) prune row groups by their statistics.
+    """
+    data = dataset(path)
+    stamp = data.schema.field("datetime").type
+    filters = []
+    if stations is not None:
+        filters.append(ds.field("station").isin(list(stations)))
+    if years is not None:
+        filters.append(ds.field("year").isin([int(y) for y in years]))
+    if start is not None:
+        filters.append(ds.field("datetime") >= pa.scalar(pd.Timestamp(start).to_pydatetime(), type=stamp))
+    if end is not None:
+        filters.append(ds.field("datetime") < pa.scalar(pd.Timestamp(end).to_pydatetime(), type=stamp))
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+    return data.to_table(columns=columns, filter=expression)
+
+
+@click.command()
+@click.option(
+    "--db-path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="DuckDB file holding the clean_* tables"
+)
+@click.option(
+    "--out-dir",
+    default=DEFAULT_OUT_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory to write one Parquet dataset per table into"
+)
+@click.option(
+    "--row-group-size",
+    default=ROW_GROUP_SIZE,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Rows per Parquet row group"
+)
+def main(db_path: Path, out_dir: Path, row_group_size: int):
+    """Command-line entry point for the Parquet export."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
+    export(db_path, out_dir, row_group_size)
+
+
+if __name__ == "__main__":
+    main()
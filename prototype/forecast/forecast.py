@@ -0,0 +1,214 @@
+# prototype/forecast/forecast.py
+"""
+Fit the forecasting model (model.py) to every station × pollutant of the
+hourly rollups and persist the results:
+
+    forecast_models  coefficients, training span, fit RMSE and the
+                     seasonal-naive RMSE to compare it with
+    forecasts        hourly forecasts for HORIZON hours past each source's
+                     latest hour, with a 95% band
+
+Each source is fitted on its trailing HISTORY_HOURS, all its series in one
+batched solve, and only refitted when its rollups changed since the last
+fit (rollup_state.rolled_at) or the settings did.
+"""
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import click
+import duckdb
+import numpy as np
+import pandas as pd
+
+from prototype.forecast.model import BAND, design, fit, predict, seasonal_naive_rmse, terms
+from prototype.pipeline.instrument import Meter
+from prototype.rollup.rollup import STATE_TABLE as ROLLUP_STATE_TABLE
+from prototype.rollup.rollup import ensure_tables as ensure_rollup_tables
+
+logger = logging.getLogger(__name__)
+
+MODELS_TABLE = "forecast_models"
+FORECASTS_TABLE = "forecasts"
+STATE_TABLE = "forecast_state"
+
+# hours forecast past the latest data
+HORIZON = 168
+
+# trailing hours each model is fitted on
+HISTORY_HOURS = 8 * 168
+
+
+def ensure_tables(con):
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MODELS_TABLE} (
+            source VARCHAR, station VARCHAR, pollutant VARCHAR, origin TIMESTAMP,
+            trained_from TIMESTAMP, trained_to TIMESTAMP, n_obs BIGINT, rmse DOUBLE, baseline_rmse DOUBLE,
+            terms VARCHAR[], coefficients DOUBLE[], fitted_at TIMESTAMP
+        )
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {FORECASTS_TABLE} (
+            source VARCHAR, station VARCHAR, pollutant VARCHAR, datetime TIMESTAMP,
+            forecast DOUBLE, lower DOUBLE, upper DOUBLE
+        )
+        """
+    )
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+        "(source VARCHAR PRIMARY KEY, rolled_at TIMESTAMP, settings VARCHAR, fitted_at TIMESTAMP)"
+    )
+
+
+def _fit_source(con, source: str, horizon: int, history_hours: int, fitted_at) -> tuple:
+    """Refit every series of source and replace its models and forecasts. Returns (rows read, forecast rows)."""
+    for table in (MODELS_TABLE, FORECASTS_TABLE):
+        con.execute(f"DELETE FROM {table} WHERE source = ?", [source])
+    last = con.execute("SELECT max(period) FROM rollup_hourly WHERE source = ?", [source]).fetchone()[0]
+    if last is None:
+        return 0, 0
+    last = pd.Timestamp(last)
+    first = last - pd.Timedelta(hours=history_hours - 1)
+    rows = con.execute(
+        "SELECT station, pollutant, period, mean FROM rollup_hourly WHERE source = ? AND period >= ?",
+        [source, first.to_pydatetime()],
+    ).df()
+    grid = pd.date_range(first, last, freq="h")
+    wide = rows.pivot_table(index="period", columns=["station", "pollutant"], values="mean").reindex(grid)
+    y = wide.to_numpy(dtype=float)
+
+    coef, n, rmse = fit(design(grid, last), y)
+    baseline = seasonal_naive_rmse(y)
+    future = pd.date_range(last + pd.Timedelta(hours=1), periods=horizon, freq="h")
+    ahead = predict(design(future, last), np.nan_to_num(coef))
+    fitted = np.isfinite(coef).all(axis=1)
+    series = [key for key, ok in zip(wide.columns, fitted) if ok]
+    if not series:
+        return len(rows), 0
+
+    models = pd.DataFrame({
+        "source": source,
+        "station": [str(s) for s, _ in series],
+        "pollutant": [p for _, p in series],
+        "origin": last,
+        "trained_from": grid[0],
+        "trained_to": last,
+        "n_obs": n[fitted],
+        "rmse": rmse[fitted],
+        "baseline_rmse": baseline[fitted],
+        "terms": [terms()] * len(series),
+        "coefficients": [list(c) for c in coef[fitted]],
+        "fitted_at": fitted_at,
+    })
+    band = BAND * rmse[fitted]
+    values = ahead[:, fitted]
+    forecasts = pd.DataFrame({
+        "source": source,
+        "station": np.repeat(models["station"].to_numpy(), horizon),
+        "pollutant": np.repeat(models["pollutant"].to_numpy(), horizon),
+        "datetime": np.tile(future.to_numpy(), len(series)),
+        "forecast": values.T.ravel(),
+        "lower": (values - band).T.ravel(),
+        "upper": (values + band).T.ravel(),
+    })
+    for table, frame in ((MODELS_TABLE, models), (FORECASTS_TABLE, forecasts)):
+        con.register("_forecast_rows", frame)
+        try:
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM _forecast_rows")
+        finally:
+            con.unregister("_forecast_rows")
+    return len(rows), len(forecasts)
+
+
+def forecast(db_path: str, horizon: int = HORIZON, history_hours: int = HISTORY_HOURS, incremental: bool = True,
+             con=None) -> list:
+    """
+    Refit the forecasts of every source in the DuckDB at db_path whose
+    hourly rollups changed since its last fit (every source unless
+    incremental). Run after the rollup stage. con is an open connection to
+    db_path to use instead of opening one; it is left open.
+
+    Returns one dict per refitted source: table, rows_in (hourly rollup
+    rows read), rows_out (forecast rows written) and the resource usage
+    measured by Meter.
+    """
+    settings = f"horizon={horizon} history_hours={history_hours}"
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path))
+    try:
+        ensure_rollup_tables(con)
+        ensure_tables(con)
+        rolled = dict(con.execute(f"SELECT source, rolled_at FROM {ROLLUP_STATE_TABLE}").fetchall())
+        seen = {
+            source: (rolled_at, fit_settings)
+            for source, rolled_at, fit_settings in con.execute(
+                f"SELECT source, rolled_at, settings FROM {STATE_TABLE}"
+            ).fetchall()
+        }
+        report = []
+        for source, rolled_at in sorted(rolled.items()):
+            if incremental and seen.get(source) == (rolled_at, settings):
+                logger.info(f"⏭️  `{source}` forecasts are up to date")
+                continue
+            fitted_at = datetime.utcnow()
+            with Meter() as meter:
+                con.begin()
+                try:
+                    rows_in, rows_out = _fit_source(con, source, horizon, history_hours, fitted_at)
+                    con.execute(f"DELETE FROM {STATE_TABLE} WHERE source = ?", [source])
+                    con.execute(f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?)",
+                                [source, rolled_at, settings, fitted_at])
+                    con.commit()
+                except Exception:
+                    con.rollback()
+                    raise
+            report.append({"table": source, "rows_in": rows_in, "rows_out": rows_out, **meter.as_dict()})
+            logger.info(f"✅ Forecast `{source}`: {rows_out} rows from {rows_in} hourly values")
+
+        for source in set(seen) - set(rolled):
+            for table in (MODELS_TABLE, FORECASTS_TABLE, STATE_TABLE):
+                con.execute(f"DELETE FROM {table} WHERE source = ?", [source])
+    finally:
+        if own:
+            con.close()
+    return report
+
+
+@click.command()
+@click.option(
+    "--db-path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="DuckDB file holding the rollup tables"
+)
+@click.option(
+    "--horizon",
+    default=HORIZON,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Hours to forecast past the latest data"
+)
+@click.option(
+    "--history-hours",
+    default=HISTORY_HOURS,
+    show_default=True,
+    type=click.IntRange(min=48),
+    help="Trailing hours each model is fitted on"
+)
+@click.option(
+    "--incremental/--full",
+    default=True,
+    show_default=True,
+    help="Refit only sources whose rollups changed"
+)
+def main(db_path: Path, horizon: int, history_hours: int, incremental: bool):
+    """Command-line entry point for forecast."""
+    forecast(str(db_path), horizon=horizon, history_hours=history_hours, incremental=incremental)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# prototype/forecast/model.py
+"""
+Harmonic regression with a linear trend, fitted to many series at once.
+
+Every series shares one design matrix over an hourly time axis:
+
+    1, t, sin/cos(2πk·h/24) for k ≤ DAILY, sin/cos(2πk·h/168) for k ≤ WEEKLY
+
+with h the hours since the Unix epoch (so phases do not depend on where
+the data starts) and t the years since the model's origin. Missing values
+differ per series, so each one is solved from its own normal equations,
+XᵀMX·β = XᵀMy with M its mask, built for all series by two matrix
+products and solved as one batched np.linalg.solve.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+DAILY = 3
+WEEKLY = 2
+
+HOURS_PER_YEAR = 24 * 365.25
+
+# weight of the ridge penalty, relative to each series' number of values
+RIDGE = 1e-6
+
+# multiplier of the residual RMSE giving a 95% band
+BAND = 1.96
+
+
+def terms(daily: int = DAILY, weekly: int = WEEKLY) -> list:
+    """Names of the design matrix columns, in order."""
+    names = ["intercept", "trend"]
+    for period, count in ((24, daily), (168, weekly)):
+        for k in range(1, count + 1):
+            names += [f"sin_{period}h_{k}", f"cos_{period}h_{k}"]
+    return names
+
+
+def _hours(times) -> np.ndarray:
+    return pd.DatetimeIndex(times).as_unit("s").asi8 / 3600.0
+
+
+def design(times, origin, daily: int = DAILY, weekly: int = WEEKLY) -> np.ndarray:
+    """The (len(times) × len(terms())) design matrix at times."""
+    h = _hours(times)
+    columns = [np.ones_like(h), (h - _hours([origin])[0]) / HOURS_PER_YEAR]
+    for period, count in ((24, daily), (168, weekly)):
+        for k in range(1, count + 1):
+            angle = 2 * np.pi * k * h / period
+            columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+
+def _rms(errors: np.ndarray) -> np.ndarray:
+    """Root mean square per column, ignoring NaN; NaN for columns without any value."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.sqrt(np.nanmean(errors ** 2, axis=0))
+
+
+def fit(x: np.ndarray, y: np.ndarray, ridge: float = RIDGE):
+    """
+    Coefficients (series × terms), number of values and residual RMSE per
+    series for the columns of y (rows × series, NaN = missing) on design x.
+    Series without enough values to fit get NaN coefficients.
+    """
+    y = np.asarray(y, dtype=float)
+    if y.ndim == 1:
+        y = y[:, None]
+    mask = ~np.isnan(y)
+    filled = np.where(mask, y, 0.0)
+    rows, p = x.shape
+    # every series' XᵀMX at once: (series × rows) @ (rows × p·p)
+    gram = (mask.T.astype(float) @ (x[:, :, None] * x[:, None, :]).reshape(rows, p * p)).reshape(-1, p, p)
+    moments = filled.T @ x
+    n = mask.sum(axis=0)
+    gram += (ridge * np.maximum(n, 1))[:, None, None] * np.eye(p)
+    coef = np.linalg.solve(gram, moments[:, :, None])[:, :, 0]
+    coef[n < 2 * p] = np.nan
+    resid = np.where(mask, y - x @ np.nan_to_num(coef).T, np.nan)
+    return coef, n, np.where(n >= 2 * p, _rms(resid), np.nan)
+
+
+def predict(x: np.ndarray, coef: np.ndarray) -> np.ndarray:
+    """Fitted values (rows × series) on design x."""
+    return x @ np.atleast_2d(coef).T
+
+
+def seasonal_naive_rmse(y: np.ndarray, season: int = 168) -> np.ndarray:
+    """RMSE per series of predicting each hourly value by the one a season earlier: the baseline to beat."""
+    y = np.asarray(y, dtype=float)
+    if y.ndim == 1:
+        y = y[:, None]
+    if len(y) <= season:
+        return np.full(y.shape[1], np.nan)
+    return _rms(y[season:] - y[:-season])
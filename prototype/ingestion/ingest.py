@@ -2,71 +2,647 @@
 """
 Ingest all CSVs from a raw directory into DuckDB, with logging, CLI args,
 and transactional safety.
+
+Plain CSVs and gzipped CSVs are read by DuckDB directly; CSV members of
+.tar/.tar.gz/.zip archives are streamed through pyarrow into DuckDB without
+being extracted to disk. Members are streamed as text and typed by DuckDB
+once all their rows are in, so a late value cannot break the load.
+
+Files land either in one table per CSV or, with the "observations" layout,
+in a single long observations table tagged with station and source_file.
+
+Every ingested file is fingerprinted (size, mtime, SHA-256) in the
+``ingest_manifest`` table. In incremental mode unchanged files are skipped and
+files that only grew have just their new rows appended.
 """
+import csv
+import hashlib
+import os
+import re
+import tarfile
+import time
+import zipfile
 import duckdb
 import click
 import logging
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Configure module-level logger
 logger = logging.getLogger(__name__)
 
+MANIFEST_TABLE = "ingest_manifest"
+OBSERVATIONS_TABLE = "observations"
+HASH_BLOCK_SIZE = 1 << 20  # 1 MiB
+STREAM_BLOCK_SIZE = 16 << 20  # bytes parsed per streamed batch
+DEFAULT_PATTERNS = ("*.csv", "*.csv.gz", "*.tar", "*.tar.gz", "*.tgz", "*.zip")
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".zip")
+MEMBER_TYPES = ("BIGINT", "DOUBLE", "TIMESTAMP")  # tried in order on archive member columns
+
+
+def _table_name(csv_file) -> str:
+    """Table name for a CSV: its stem, lowercased, spaces → underscores."""
+    name = Path(csv_file).name.lower()
+    for suffix in (".gz", ".csv"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name.replace(' ', '_')
+
+
+def _member_table(archive: Path, member: str) -> str:
+    """
+    Table name for an archive member: the archive's stem and the member's
+    path inside it, lowercased, with anything but letters, digits and
+    underscores turned into underscores.
+    """
+    stem = archive.name.lower()
+    for suffix in ARCHIVE_SUFFIXES:
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+    name = member.lower()
+    if name.endswith(".csv"):
+        name = name[:-len(".csv")]
+    return re.sub(r"[^0-9a-z_]", "_", f"{stem}/{name}")
+
+
+def _kind(path: Path):
+    """'csv' for plain CSVs, 'gzip' for .csv.gz, 'archive' for tar/zip, else None."""
+    name = path.name.lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".csv.gz"):
+        return "gzip"
+    if name.endswith(ARCHIVE_SUFFIXES):
+        return "archive"
+    return None
+
+
+class _HashingReader:
+    """A read-only file wrapper that feeds every byte read into a digest."""
+
+    def __init__(self, f, digest):
+        self._f = f
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.digest.update(data)
+        return data
+
+    def drain(self):
+        while self.read(HASH_BLOCK_SIZE):
+            pass
+
+
+def _archive_members(path: Path, digest=None):
+    """
+    Yield (member name, binary stream) for every CSV inside a tar or zip
+    archive. Members are decompressed on the fly and never touch the disk.
+    A digest, if given, is fed the archive's bytes: a tar's as they are
+    streamed, a zip's (which is read out of order) once its members are done.
+    """
+    if path.name.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(".csv"):
+                    with zf.open(info) as f:
+                        yield info.filename, f
+        if digest is not None:
+            _hash_range(path, 0, path.stat().st_size, digest)
+    else:
+        with open(path, "rb") as raw:
+            source = raw if digest is None else _HashingReader(raw, digest)
+            # "r|*" reads the archive strictly sequentially, without seeking
+            with tarfile.open(fileobj=source, mode="r|*") as tar:
+                for member in tar:
+                    if member.isfile() and member.name.lower().endswith(".csv"):
+                        yield member.name, tar.extractfile(member)
+            if digest is not None:
+                source.drain()
+
+
+def _stream_csv(stream) -> pa.RecordBatchReader:
+    """
+    A streaming reader of a CSV member with every column read as text, so no
+    later block can disagree with types inferred from the first one;
+    _typed_select gives the columns their types inside DuckDB.
+    """
+    header = next(csv.reader([stream.readline().decode("utf-8-sig")]), [])
+    return pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(column_names=header, block_size=STREAM_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: pa.string() for c in header},
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def _hash_range(path: Path, start: int, stop: int, digest=None):
+    """Feed bytes [start, stop) of path into a SHA-256 digest and return it."""
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def _ends_with_newline(path: Path, size: int) -> bool:
+    """True if the byte at offset size-1 is a newline (a clean record boundary)."""
+    if size == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def _ensure_manifest(con):
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            source      VARCHAR PRIMARY KEY,
+            table_name  VARCHAR,
+            size        BIGINT,
+            mtime_ns    BIGINT,
+            sha256      VARCHAR,
+            row_count   BIGINT,
+            ingested_at TIMESTAMPTZ
+        )
+        """
+    )
+    # manifests written before ingested_at was time-zone aware hold naive UTC stamps
+    dtype = con.execute(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = 'ingested_at'",
+        [MANIFEST_TABLE],
+    ).fetchone()[0]
+    if dtype == "TIMESTAMP":
+        con.execute(
+            f"ALTER TABLE {MANIFEST_TABLE} ALTER ingested_at TYPE TIMESTAMPTZ USING timezone('UTC', ingested_at)"
+        )
+
+
+def _read_manifest(con) -> dict:
+    rows = con.execute(
+        f"SELECT source, table_name, size, mtime_ns, sha256, row_count FROM {MANIFEST_TABLE}"
+    ).fetchall()
+    return {
+        r[0]: {"table_name": r[1], "size": r[2], "mtime_ns": r[3], "sha256": r[4], "row_count": r[5]}
+        for r in rows
+    }
+
+
+def _record(con, source: str, table: str, size: int, mtime_ns: int, sha256: str, row_count: int):
+    con.execute(
+        f"INSERT OR REPLACE INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [source, table, size, mtime_ns, sha256, row_count, datetime.now(timezone.utc)],
+    )
+
+
+def _load_full(con, csv_file: Path, table: str) -> int:
+    """(Re)create table from the whole CSV; returns the number of rows loaded."""
+    con.execute(f"DROP TABLE IF EXISTS {table}")
+    con.execute(
+        f"CREATE TABLE {table} AS SELECT * FROM read_csv_auto('{csv_file}', header=True)"
+    )
+    return con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+
+def _read_tail(csv_file: Path, offset: int, columns: list) -> pa.Table:
+    """
+    Parse the rows stored after byte offset. The tail has no header, so it is
+    read as text against the given columns and cast by DuckDB on insert.
+    """
+    with open(csv_file, "rb") as f:
+        f.seek(offset)
+        return pacsv.read_csv(
+            f,
+            read_options=pacsv.ReadOptions(column_names=columns),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in columns},
+                strings_can_be_null=True,
+            ),
+        )
+
+
+def _append_tail(con, csv_file: Path, table: str, offset: int) -> int:
+    """Append the rows stored after byte offset to an existing table."""
+    columns = [r[0] for r in con.execute(f"DESCRIBE {table}").fetchall()]
+    tail = _read_tail(csv_file, offset, columns)
+    if tail.num_rows:
+        con.register("tail_rows", tail)
+        con.execute(f"INSERT INTO {table} SELECT * FROM tail_rows")
+        con.unregister("tail_rows")
+    return tail.num_rows
+
+
+def _plan(csv_file: Path, size: int, mtime_ns: int, prev, appendable: bool = True):
+    """
+    Decide what to do with a file given its previous manifest entry.
+    Returns (action, digest) where action is one of "skip", "touch",
+    "append" or "load"; digest holds the hash of the previously seen prefix
+    when it is still valid. Compressed files are never "append"ed.
+    """
+    if prev is None:
+        return "load", None
+    if prev["size"] == size and prev["mtime_ns"] == mtime_ns:
+        return "skip", None
+    if size >= prev["size"]:
+        digest = _hash_range(csv_file, 0, prev["size"])
+        if digest.hexdigest() == prev["sha256"]:
+            if size == prev["size"]:
+                return "touch", digest
+            if appendable and _ends_with_newline(csv_file, prev["size"]):
+                return "append", digest
+    return "load", None
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _read_file(csv_file: Path, threads: int):
+    """Read one CSV into Arrow on a private in-memory connection; returns (table, seconds)."""
+    start = time.perf_counter()
+    con = duckdb.connect()
+    try:
+        con.execute(f"SET threads = {threads}")
+        data = con.read_csv(str(csv_file), header=True).to_arrow_table()
+    finally:
+        con.close()
+    return data, time.perf_counter() - start
+
+
+def _insert_observations(con, batch, station: str, source_file: str, exists: bool,
+                         table: str = OBSERVATIONS_TABLE) -> int:
+    """
+    Insert one file's rows (an Arrow table, or the name of a DuckDB relation)
+    into the observations table (or another table of that layout), tagging
+    them with station (unless the file carries its own) and source_file.
+    Columns not seen before are added to the table.
+    """
+    if isinstance(batch, str):
+        relation = batch
+        columns = [r[0] for r in con.execute(f"DESCRIBE {relation}").fetchall()]
+    else:
+        relation = "obs_batch"
+        columns = batch.schema.names
+    select = ["station" if "station" in columns else "CAST(? AS VARCHAR) AS station"]
+    select += [_quote(c) for c in columns if c not in ("station", "source_file")]
+    select.append("CAST(? AS VARCHAR) AS source_file")
+    params = ([] if "station" in columns else [station]) + [source_file]
+    query = f"SELECT {', '.join(select)} FROM {relation}"
+
+    if relation == "obs_batch":
+        con.register("obs_batch", batch)
+    try:
+        if not exists:
+            rows = con.execute(f"CREATE TABLE {table} AS {query}", params).fetchone()[0]
+        else:
+            known = {r[0] for r in con.execute(f"DESCRIBE {table}").fetchall()}
+            for name, dtype, *_ in con.execute(f"DESCRIBE {query}", params).fetchall():
+                if name not in known:
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(name)} {dtype}")
+            rows = con.execute(f"INSERT INTO {table} BY NAME {query}", params).fetchone()[0]
+    finally:
+        if relation == "obs_batch":
+            con.unregister("obs_batch")
+    return rows
+
+
+def _typed_select(con, relation: str) -> str:
+    """
+    A SELECT over relation (text columns) casting each column to the first of
+    BIGINT, DOUBLE and TIMESTAMP that all its non-null values fit, or leaving
+    it VARCHAR. One aggregate scan sizes every column up.
+    """
+    columns = [r[0] for r in con.execute(f"DESCRIBE {relation}").fetchall()]
+    if not columns:
+        return f"SELECT * FROM {relation}"
+    checks = []
+    for c in columns:
+        q = _quote(c)
+        checks += [
+            f"count({q})",
+            f"count(*) FILTER (WHERE regexp_full_match(trim({q}), '[+-]?[0-9]+') "
+            f"AND TRY_CAST({q} AS BIGINT) IS NOT NULL)",
+            f"count(TRY_CAST({q} AS DOUBLE))",
+            f"count(TRY_CAST({q} AS TIMESTAMP))",
+        ]
+    row = con.execute(f"SELECT {', '.join(checks)} FROM {relation}").fetchone()
+    select = []
+    for i, c in enumerate(columns):
+        present, *fits = row[4 * i:4 * i + 4]
+        dtype = next((t for t, n in zip(MEMBER_TYPES, fits) if present and n == present), None)
+        select.append(f"CAST({_quote(c)} AS {dtype}) AS {_quote(c)}" if dtype else _quote(c))
+    return f"SELECT {', '.join(select)} FROM {relation}"
+
+
+def _stage_member(con, stream):
+    """
+    Stream an archive member into a temporary text table and return the name
+    of a view over it with the columns typed; drop both with _drop_member.
+    """
+    con.register("member_stream", _stream_csv(stream))
+    try:
+        con.execute("CREATE OR REPLACE TEMP TABLE _member_rows AS SELECT * FROM member_stream")
+    finally:
+        con.unregister("member_stream")
+    con.execute(f"CREATE OR REPLACE TEMP VIEW _member_typed AS {_typed_select(con, '_member_rows')}")
+    return "_member_typed"
+
+
+def _drop_member(con):
+    con.execute("DROP VIEW IF EXISTS _member_typed")
+    con.execute("DROP TABLE IF EXISTS _member_rows")
+
+
+def _ingest_archive(con, archive: Path, size: int, mtime_ns: int, manifest: dict,
+                    tables: set, layout: str, stats: list):
+    """
+    Stream every CSV member of an archive into DuckDB. The manifest gets one
+    row per member (keyed "<archive>!<member>") carrying the archive's
+    fingerprint, so an unchanged archive is skipped as a whole. It is only
+    hashed up front when its size still matches and just the mtime moved;
+    otherwise the hash is taken while the members are streamed. Tables of
+    members that are no longer in the archive are dropped.
+    """
+    prefix = f"{archive}!"
+    observations = layout == "observations"
+    prev = [v for k, v in manifest.items() if k.startswith(prefix)]
+    current = prev and all(
+        p["table_name"] in tables and (p["table_name"] == OBSERVATIONS_TABLE) == observations
+        for p in prev
+    )
+    if current and all(p["size"] == size and p["mtime_ns"] == mtime_ns for p in prev):
+        logger.info("Skipping %s (unchanged)", archive.name)
+        return
+    sha = None
+    if current and all(p["size"] == size for p in prev):
+        sha = _hash_range(archive, 0, size).hexdigest()
+        if all(p["sha256"] == sha for p in prev):
+            logger.info("Skipping %s (touched, content unchanged)", archive.name)
+            con.execute(f"UPDATE {MANIFEST_TABLE} SET mtime_ns = ? WHERE starts_with(source, ?)", [mtime_ns, prefix])
+            return
+
+    stale = {
+        r[0] for r in con.execute(
+            f"SELECT table_name FROM {MANIFEST_TABLE} WHERE starts_with(source, ?)", [prefix]
+        ).fetchall()
+    }
+    con.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE starts_with(source, ?)", [prefix])
+    if observations and OBSERVATIONS_TABLE in tables:
+        con.execute(f"DELETE FROM {OBSERVATIONS_TABLE} WHERE starts_with(source_file, ?)", [f"{archive.name}/"])
+    digest = hashlib.sha256() if sha is None else None
+    loaded = []
+    for member, stream in _archive_members(archive, digest):
+        start = time.perf_counter()
+        typed = _stage_member(con, stream)
+        try:
+            if observations:
+                table = OBSERVATIONS_TABLE
+                rows = _insert_observations(
+                    con, typed, _table_name(member), f"{archive.name}/{member}",
+                    OBSERVATIONS_TABLE in tables,
+                )
+            else:
+                table = _member_table(archive, member)
+                con.execute(f"DROP TABLE IF EXISTS {table}")
+                rows = con.execute(f"CREATE TABLE {table} AS SELECT * FROM {typed}").fetchone()[0]
+        finally:
+            _drop_member(con)
+        tables.add(table)
+        stale.discard(table)
+        loaded.append((member, table, rows))
+        _report(stats, f"{archive.name}/{member}", table, "Streamed", rows, time.perf_counter() - start)
+    if sha is None:
+        sha = digest.hexdigest()
+    for member, table, rows in loaded:
+        _record(con, f"{prefix}{member}", table, size, mtime_ns, sha, rows)
+
+    for table in sorted(stale - {OBSERVATIONS_TABLE}):
+        # another source may have claimed the name since
+        claimed = con.execute(f"SELECT count(*) FROM {MANIFEST_TABLE} WHERE table_name = ?", [table]).fetchone()[0]
+        if not claimed:
+            logger.info("Dropping %s (no longer in %s)", table, archive.name)
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+            tables.discard(table)
+
+
+def _header(csv_file: Path) -> list:
+    with open(csv_file, newline="", encoding="utf-8", errors="replace") as f:
+        return next(csv.reader(f))
+
+
+def _report(stats: list, source, table: str, action: str, rows: int, seconds: float):
+    rate = rows / seconds if seconds > 0 else float("nan")
+    logger.info(
+        "%s %s → '%s': %d rows in %.3fs (%.0f rows/s)",
+        action, Path(source).name if isinstance(source, Path) else source, table, rows, seconds, rate,
+    )
+    stats.append({
+        "source": str(source),
+        "table": table,
+        "action": action,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rate,
+    })
+
+
+def ingest(
+    raw_dir,
+    db_path,
+    pattern=DEFAULT_PATTERNS,
+    incremental: bool = False,
+    layout: str = "tables",
+    workers: int = 4,
+    con=None,
+):
+    """
+    Ingest matching CSVs from raw_dir into DuckDB.
+
+    pattern is a glob or a sequence of globs. Besides plain CSVs, .csv.gz
+    files and the CSV members of .tar/.tar.gz/.zip archives are loaded
+    straight from the compressed bytes, inside the same transaction.
+
+    layout="tables" makes one table per CSV, named after the CSV stem,
+    cleaned (lowercase, no spaces); archive members are named after the
+    archive stem and their path inside it, e.g. wx_midas_hourly_2024.
+    layout="observations" loads every file into a single
+    observations(station, datetime, ..., source_file) table; files are
+    parsed by `workers` threads in parallel and inserted serially inside the
+    one transaction. station comes from the file's own station column when
+    it has one, otherwise from the file stem.
+
+    With incremental=True, files whose size and mtime match the manifest are
+    skipped without being read, and files that grew while keeping their
+    previous bytes intact (append-only feeds) only have the new rows appended.
+    Anything else is reloaded in full.
+
+    Returns one dict per file that was loaded or appended, with its row count,
+    elapsed seconds and rows/sec.
+
+    con is an open connection to db_path to use instead of opening one; it
+    is left open.
+    """
+    if layout not in ("tables", "observations"):
+        raise ValueError(f"Unknown ingest layout: {layout!r}")
+    raw_dir = Path(raw_dir).resolve()
+    db_path = Path(db_path).resolve()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    stats = []
+
+    # Connect with a transaction for atomicity
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path))
+    try:
+        con.begin()
+        _ensure_manifest(con)
+        manifest = _read_manifest(con) if incremental else {}
+        tables = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+        if layout == "observations" and not incremental:
+            con.execute(f"DROP TABLE IF EXISTS {OBSERVATIONS_TABLE}")
+            tables.discard(OBSERVATIONS_TABLE)
+
+        patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+        files = sorted({f for p in patterns for f in raw_dir.glob(p) if _kind(f)})
+        if not files:
+            logger.warning("No files matched %s in %s", ", ".join(patterns), raw_dir)
+
+        to_load = []
+        for csv_file in files:
+            kind = _kind(csv_file)
+            stat = csv_file.stat()
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+            if kind == "archive":
+                _ingest_archive(con, csv_file, size, mtime_ns, manifest, tables, layout, stats)
+                continue
+
+            table = OBSERVATIONS_TABLE if layout == "observations" else _table_name(csv_file)
+            prev = manifest.get(str(csv_file))
+            if prev is not None and (prev["table_name"] != table or table not in tables):
+                prev = None
+
+            action, digest = _plan(csv_file, size, mtime_ns, prev, appendable=kind == "csv")
+            if action == "skip":
+                logger.info("Skipping %s (unchanged)", csv_file.name)
+            elif action == "touch":
+                logger.info("Skipping %s (touched, content unchanged)", csv_file.name)
+                _record(con, str(csv_file), table, size, mtime_ns, prev["sha256"], prev["row_count"])
+            elif action == "append":
+                start = time.perf_counter()
+                if layout == "observations":
+                    tail = _read_tail(csv_file, prev["size"], _header(csv_file))
+                    added = _insert_observations(con, tail, _table_name(csv_file), csv_file.name, True)
+                else:
+                    added = _append_tail(con, csv_file, table, prev["size"])
+                sha = _hash_range(csv_file, prev["size"], size, digest).hexdigest()
+                _record(con, str(csv_file), table, size, mtime_ns, sha, prev["row_count"] + added)
+                _report(stats, csv_file, table, "Appended", added, time.perf_counter() - start)
+            elif layout == "observations":
+                if prev is not None or table in tables:
+                    con.execute(f"DELETE FROM {OBSERVATIONS_TABLE} WHERE source_file = ?", [csv_file.name])
+                to_load.append((csv_file, size, mtime_ns))
+            else:
+                start = time.perf_counter()
+                rows = _load_full(con, csv_file, table)
+                sha = _hash_range(csv_file, 0, size).hexdigest()
+                _record(con, str(csv_file), table, size, mtime_ns, sha, rows)
+                tables.add(table)
+                _report(stats, csv_file, table, "Ingested", rows, time.perf_counter() - start)
+
+        if to_load:
+            workers = max(1, min(workers, len(to_load)))
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(_read_file, csv_file, threads): (csv_file, size, mtime_ns)
+                    for csv_file, size, mtime_ns in to_load
+                }
+                for future in as_completed(futures):
+                    csv_file, size, mtime_ns = futures[future]
+                    data, read_seconds = future.result()
+                    start = time.perf_counter()
+                    rows = _insert_observations(
+                        con, data, _table_name(csv_file), csv_file.name,
+                        OBSERVATIONS_TABLE in tables,
+                    )
+                    tables.add(OBSERVATIONS_TABLE)
+                    sha = _hash_range(csv_file, 0, size).hexdigest()
+                    _record(con, str(csv_file), OBSERVATIONS_TABLE, size, mtime_ns, sha, rows)
+                    _report(stats, csv_file, OBSERVATIONS_TABLE, "Ingested", rows,
+                            read_seconds + time.perf_counter() - start)
+        con.commit()
+        logger.info("✅ Ingestion complete into %s", db_path)
+    except Exception:
+        con.rollback()
+        logger.exception("Ingestion failed, rolled back transaction")
+        raise
+    finally:
+        if own:
+            con.close()
+    return stats
+
+
 @click.command()
 @click.option(
-    "--raw-dir", 
-    required=True, 
+    "--raw-dir",
+    required=True,
     type=click.Path(exists=True, file_okay=False, path_type=Path),
     help="Directory containing raw CSV files"
 )
 @click.option(
-    "--db-path", 
-    required=True, 
+    "--db-path",
+    required=True,
     type=click.Path(path_type=Path),
     help="DuckDB file path to write to"
 )
 @click.option(
-    "--pattern", 
-    default="*.csv", 
+    "--pattern",
+    multiple=True,
+    default=DEFAULT_PATTERNS,
     show_default=True,
-    help="Glob pattern to match CSV files"
+    help="Glob pattern to match CSV files or archives (repeatable)"
 )
-def ingest(raw_dir: Path, db_path: Path, pattern: str):
-    """
-    Ingest matching CSVs from raw_dir into DuckDB.
-    Each table is named after the CSV stem, cleaned (lowercase, no spaces).
-    """
+@click.option(
+    "--incremental/--full",
+    default=False,
+    show_default=True,
+    help="Skip unchanged files and append only new rows of grown files"
+)
+@click.option(
+    "--layout",
+    type=click.Choice(["tables", "observations"]),
+    default="tables",
+    show_default=True,
+    help="One table per CSV, or a single observations table"
+)
+@click.option(
+    "--workers",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Files parsed in parallel (observations layout)"
+)
+def main(raw_dir: Path, db_path: Path, pattern: tuple, incremental: bool, layout: str, workers: int):
+    """Command-line entry point for ingest."""
     # Setup logging
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s %(levelname)s %(message)s"
     )
+    ingest(raw_dir, db_path, pattern=pattern, incremental=incremental, layout=layout, workers=workers)
 
-    raw_dir = raw_dir.resolve()
-    db_path = db_path.resolve()
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Connect with a transaction for atomicity
-    con = duckdb.connect(str(db_path))
-    try:
-        con.begin()
-        files = sorted(raw_dir.glob(pattern))
-        if not files:
-            logger.warning("No files matched %s in %s", pattern, raw_dir)
-        for csv_file in files:
-            table = csv_file.stem.lower().replace(' ', '_')
-            logger.info("Ingesting %s → table '%s'", csv_file.name, table)
-            con.execute(f"DROP TABLE IF EXISTS {table}")
-            con.execute(
-                f"CREATE TABLE {table} AS SELECT * FROM read_csv_auto('{csv_file}', header=True)"
-            )
-        con.commit()
-        logger.info("✅ Ingestion complete into %s", db_path)
-    except Exception as e:
-        con.rollback()
-        logger.exception("Ingestion failed, rolled back transaction")
-        raise
-    finally:
-        con.close()
 
 if __name__ == "__main__":
-    ingest()
+    main()
@@ -0,0 +1,10 @@
+# prototype/periods.py
+"""Splitting of date ranges into calendar periods, shared by the backfill and the reports."""
+import pandas as pd
+
+
+def windows(start, end, freq: str) -> list:
+    """[start, end) split at the boundaries of the pandas offset alias freq, as (lo, hi) pairs."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    edges = [start] + [e for e in pd.date_range(start, end, freq=freq) if start < e < end] + [end]
+    return list(zip(edges[:-1], edges[1:]))
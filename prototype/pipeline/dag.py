@@ -0,0 +1,176 @@
+# prototype/pipeline/dag.py
+"""
+A small in-process DAG runner for the pipeline stages.
+
+Stages share one DuckDB connection: each runs on its own cursor (DuckDB
+cursors are independent connections to the same database, safe to use
+from separate threads), so nothing is re-imported or reopened between
+stages. A stage starts as soon as all of its dependencies have finished,
+which runs independent stages concurrently on a thread pool.
+
+Each stage has a cache key: its own input fingerprint (input files,
+parameters) combined with the keys of its dependencies. The key of every
+successful run is stored in the pipeline_stage_cache table. A stage is
+skipped when its key matches the stored one, none of its dependencies
+ran, and its outputs still exist.
+
+Every run is recorded in pipeline_runs, and every stage (ran, skipped or
+failed) in pipeline_stage_metrics together with the per-table report its
+run() returns; see instrument.py.
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from prototype.pipeline.instrument import Meter, finish_run, profiled, record_stage, start_run
+
+logger = logging.getLogger(__name__)
+
+STAGE_CACHE_TABLE = "pipeline_stage_cache"
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One pipeline step. run(con) does the work on the connection it is
+    given and may return a per-table report (a list of {"table",
+    "rows_in", "rows_out", ...} dicts); fingerprint() describes its inputs
+    as a string, computed before it runs; outputs_exist() reports whether
+    a skipped run would still leave its outputs in place.
+    """
+    name: str
+    run: Callable
+    deps: tuple = ()
+    fingerprint: Callable = lambda: ""
+    outputs_exist: Callable = lambda: True
+
+
+def topological_order(stages) -> list:
+    """stages sorted so each comes after its dependencies; raises ValueError on unknown or cyclic deps."""
+    by_name = {s.name: s for s in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    order, state = [], {}
+
+    def visit(stage, path):
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Stage dependency cycle: {' → '.join(path + [stage.name])}")
+        state[stage.name] = "visiting"
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stage {dep!r}")
+            visit(by_name[dep], path + [stage.name])
+        state[stage.name] = "done"
+        order.append(stage)
+
+    for stage in stages:
+        visit(stage, [])
+    return order
+
+
+def _ensure_cache(con):
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STAGE_CACHE_TABLE} (
+            stage TEXT PRIMARY KEY,
+            cache_key TEXT,
+            completed_at TIMESTAMP,
+            seconds DOUBLE
+        )
+        """
+    )
+
+
+def _run_stage(con, stage: Stage, profile_dir=None, profiler: str = "cprofile"):
+    """Run stage on its own cursor, under the profiler if profile_dir is set. Returns (Meter, report)."""
+    cursor = con.cursor()
+    try:
+        with Meter() as meter:
+            if profile_dir is None:
+                report = stage.run(cursor)
+            else:
+                with profiled(stage.name, profile_dir, profiler):
+                    report = stage.run(cursor)
+        return meter, report if isinstance(report, list) else None
+    finally:
+        cursor.close()
+
+
+def run_dag(con, stages, force: bool = False, max_workers: int = 4, options: dict = None,
+            profile=(), profile_dir="profiles", profiler: str = "cprofile") -> dict:
+    """
+    Run stages over the open connection con, each once its dependencies
+    are done. force=True ignores the cache. The first failing stage stops
+    the run (stages already running finish) and its exception is raised.
+
+    options (the run's settings) are stored with the run in pipeline_runs.
+    Stages named in profile run under cProfile or pyinstrument (profiler)
+    with the dump written to profile_dir.
+
+    Returns {stage name: "ran" or "skipped"}.
+    """
+    order = topological_order(stages)
+    _ensure_cache(con)
+    cached = dict(con.execute(f"SELECT stage, cache_key FROM {STAGE_CACHE_TABLE}").fetchall())
+    run_id = start_run(con, options)
+    run_start = time.perf_counter()
+    peak_rss = None
+
+    keys, status, started = {}, {}, {}
+    pending = list(order)
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                for stage in [s for s in pending if all(d in status for d in s.deps)]:
+                    pending.remove(stage)
+                    parts = [stage.name, stage.fingerprint()] + [keys[d] for d in stage.deps]
+                    keys[stage.name] = hashlib.sha256("\0".join(parts).encode()).hexdigest()
+                    fresh = (
+                        not force
+                        and cached.get(stage.name) == keys[stage.name]
+                        and all(status[d] == "skipped" for d in stage.deps)
+                        and stage.outputs_exist()
+                    )
+                    started[stage.name] = datetime.utcnow()
+                    if fresh:
+                        logger.info("⏭️  Skipping stage %s (inputs unchanged)", stage.name)
+                        status[stage.name] = "skipped"
+                        record_stage(con, run_id, stage.name, "skipped", started[stage.name])
+                    else:
+                        logger.info("▶ Running stage %s", stage.name)
+                        stage_profile = profile_dir if stage.name in profile else None
+                        running[pool.submit(_run_stage, con, stage, stage_profile, profiler)] = stage
+                if not running:
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logger.error("Stage %s failed; not starting the remaining stages", stage.name)
+                        record_stage(con, run_id, stage.name, "failed", started[stage.name])
+                        pending.clear()
+                        wait(running)
+                        raise error
+                    meter, report = future.result()
+                    con.execute(
+                        f"INSERT OR REPLACE INTO {STAGE_CACHE_TABLE} VALUES (?, ?, ?, ?)",
+                        [stage.name, keys[stage.name], datetime.utcnow(), meter.wall_seconds],
+                    )
+                    record_stage(con, run_id, stage.name, "ran", started[stage.name], meter, report)
+                    peak_rss = max(peak_rss or 0, meter.peak_rss_bytes)
+                    status[stage.name] = "ran"
+                    logger.info("✅ Stage %s done in %.2fs", stage.name, meter.wall_seconds)
+    except Exception:
+        finish_run(con, run_id, "failed", time.perf_counter() - run_start, peak_rss)
+        raise
+    finish_run(con, run_id, "succeeded", time.perf_counter() - run_start, peak_rss)
+    return status
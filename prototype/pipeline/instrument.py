@@ -0,0 +1,234 @@
+# prototype/pipeline/instrument.py
+"""
+Resource accounting for pipeline stages.
+
+Meter measures a block of work: wall time, CPU time, bytes read and peak
+RSS. The last three are process-wide, taken from /proc/self on Linux
+with getrusage as the fallback elsewhere. Peak RSS is reset (through
+/proc/self/clear_refs) only when no other Meter is open, so a stage's
+meter is not undone by the per-table meters inside it or by a stage
+running alongside; a meter opened inside others reports the peak since
+the outermost one began. Work running concurrently in the same process
+shares all three figures.
+
+record_run/record_stage write the pipeline_runs and pipeline_stage_metrics
+tables; profiled() runs a callable under cProfile or pyinstrument.
+"""
+import cProfile
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+RUNS_TABLE = "pipeline_runs"
+STAGE_METRICS_TABLE = "pipeline_stage_metrics"
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+# Meters open in this process, over all threads; only the outermost resets peak RSS
+_open_meters = 0
+_open_lock = threading.Lock()
+
+
+def _proc_status_kb(field: str):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Restart peak RSS tracking from the current RSS (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size since the last reset (or since process start)."""
+    kb = _proc_status_kb("VmHWM")
+    if kb is not None:
+        return kb * 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bytes_read():
+    """Bytes this process has read through read(2)-style calls, or None where unknown."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class Meter:
+    """
+    Context manager measuring the block it wraps; afterwards as_dict()
+    holds wall_seconds, cpu_seconds, bytes_read and peak_rss_bytes.
+    """
+
+    def __enter__(self):
+        global _open_meters
+        with _open_lock:
+            if _open_meters == 0:
+                reset_peak_rss()
+            _open_meters += 1
+        self._read = bytes_read()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_seconds = time.perf_counter() - self._wall
+        self.cpu_seconds = time.process_time() - self._cpu
+        read = bytes_read()
+        self.bytes_read = read - self._read if read is not None and self._read is not None else None
+        self.peak_rss_bytes = peak_rss_bytes()
+        global _open_meters
+        with _open_lock:
+            _open_meters -= 1
+        return False
+
+    def as_dict(self) -> dict:
+        return {
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "bytes_read": self.bytes_read,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+def ensure_tables(con):
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+            run_id TEXT PRIMARY KEY,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            status TEXT,
+            wall_seconds DOUBLE,
+            peak_rss_bytes BIGINT,
+            options TEXT
+        )
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STAGE_METRICS_TABLE} (
+            run_id TEXT,
+            stage TEXT,
+            table_name TEXT,
+            status TEXT,
+            started_at TIMESTAMP,
+            wall_seconds DOUBLE,
+            cpu_seconds DOUBLE,
+            rows_in BIGINT,
+            rows_out BIGINT,
+            rows_per_sec DOUBLE,
+            bytes_read BIGINT,
+            peak_rss_bytes BIGINT
+        )
+        """
+    )
+
+
+def start_run(con, options: dict = None) -> str:
+    """Open a pipeline_runs row and return its run_id."""
+    ensure_tables(con)
+    run_id = uuid.uuid4().hex
+    con.execute(
+        f"INSERT INTO {RUNS_TABLE} (run_id, started_at, status, options) VALUES (?, ?, 'running', ?)",
+        [run_id, datetime.utcnow(), json.dumps(options or {}, sort_keys=True, default=str)],
+    )
+    return run_id
+
+
+def finish_run(con, run_id: str, status: str, wall_seconds: float, peak_rss: int = None):
+    con.execute(
+        f"UPDATE {RUNS_TABLE} SET finished_at = ?, status = ?, wall_seconds = ?, peak_rss_bytes = ? "
+        f"WHERE run_id = ?",
+        [datetime.utcnow(), status, wall_seconds, peak_rss, run_id],
+    )
+
+
+def _rate(rows, seconds):
+    return rows / seconds if rows is not None and seconds else None
+
+
+def record_stage(con, run_id: str, stage: str, status: str, started_at, meter: Meter = None, report=None):
+    """
+    Write a stage's pipeline_stage_metrics rows: one for the stage as a
+    whole (table_name NULL) and one per entry of report, the list of
+    {"table", "rows_in", "rows_out", wall_seconds, ...} dicts the stage
+    returned. Stage rows totals are the sums over its tables.
+    """
+    report = report or []
+    totals = meter.as_dict() if meter is not None else {}
+    rows_in = sum(r.get("rows_in") or 0 for r in report) if report else None
+    rows_out = sum(r.get("rows_out") or 0 for r in report) if report else None
+    rows = [(None, status, started_at, totals, rows_in, rows_out)]
+    rows += [(r["table"], status, None, r, r.get("rows_in"), r.get("rows_out")) for r in report]
+    con.executemany(
+        f"INSERT INTO {STAGE_METRICS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            [
+                run_id, stage, table, state, started, m.get("wall_seconds"), m.get("cpu_seconds"),
+                n_in, n_out, _rate(n_out, m.get("wall_seconds")), m.get("bytes_read"), m.get("peak_rss_bytes"),
+            ]
+            for table, state, started, m, n_in, n_out in rows
+        ],
+    )
+
+
+@contextmanager
+def profiled(name: str, out_dir, profiler: str = "cprofile"):
+    """
+    Profile the enclosed block and dump the result to out_dir: <name>.prof
+    for cProfile (open with pstats or snakeviz), <name>.html for
+    pyinstrument, which has to be installed.
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {profiler!r}")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            path = out_dir / f"{name}.html"
+            path.write_text(prof.output_html())
+            logger.info("ℹ️  Wrote profile of %s to %s", name, path)
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        path = out_dir / f"{name}.prof"
+        prof.dump_stats(str(path))
+        logger.info("ℹ️  Wrote profile of %s to %s", name, path)
@@ -0,0 +1,78 @@
+# prototype/pipeline/stages.py
+"""
+The ingest → clean → export/rollup/anomalies → forecast stages of
+run_pipeline.py, as DAG stages (see dag.py). Stages that only read the
+clean tables depend on "clean" and run alongside each other; forecast
+reads the hourly rollups.
+"""
+from pathlib import Path
+
+from prototype.anomalies.detect import THRESHOLD, WINDOWS, detect
+from prototype.cleaning.clean import clean
+from prototype.export.parquet import DEFAULT_OUT_DIR, export
+from prototype.forecast.forecast import HISTORY_HOURS, HORIZON, forecast
+from prototype.ingestion.ingest import DEFAULT_PATTERNS, _kind, ingest
+from prototype.pipeline.dag import Stage
+from prototype.rollup.rollup import rollup
+
+
+def raw_files_fingerprint(raw_dir, patterns) -> str:
+    """Path, size and mtime of every file ingest would consider; no file is read."""
+    raw_dir = Path(raw_dir).resolve()
+    patterns = [patterns] if isinstance(patterns, str) else list(patterns)
+    files = sorted({f for p in patterns for f in raw_dir.glob(p) if _kind(f)})
+    return "\n".join(f"{f}:{f.stat().st_size}:{f.stat().st_mtime_ns}" for f in files)
+
+
+def ingest_report(stats) -> list:
+    """ingest()'s per-file stats in the per-table report shape of the other stages."""
+    return [
+        {"table": s["table"], "rows_in": s["rows"], "rows_out": s["rows"], "wall_seconds": s["seconds"]}
+        for s in stats
+    ]
+
+
+def pipeline_stages(raw_dir, db_path, gap_hours: int = 2, incremental: bool = True, layout: str = "tables",
+                    export_dir=DEFAULT_OUT_DIR, patterns=DEFAULT_PATTERNS) -> list:
+    """The pipeline's stages for one set of run_pipeline options."""
+    settings = f"incremental={incremental}"
+    return [
+        Stage(
+            "ingest",
+            lambda con: ingest_report(
+                ingest(raw_dir, db_path, patterns, incremental=incremental, layout=layout, con=con)
+            ),
+            fingerprint=lambda: f"{settings} layout={layout}\n" + raw_files_fingerprint(raw_dir, patterns),
+        ),
+        Stage(
+            "clean",
+            lambda con: clean(db_path, gap_hours, incremental=incremental, con=con),
+            deps=("ingest",),
+            fingerprint=lambda: f"{settings} gap_hours={gap_hours}",
+        ),
+        Stage(
+            "export",
+            lambda con: export(db_path, export_dir, con=con),
+            deps=("clean",),
+            fingerprint=lambda: f"export_dir={Path(export_dir).resolve()}",
+            outputs_exist=lambda: Path(export_dir).is_dir(),
+        ),
+        Stage(
+            "rollup",
+            lambda con: rollup(db_path, incremental=incremental, con=con),
+            deps=("clean",),
+            fingerprint=lambda: settings,
+        ),
+        Stage(
+            "anomalies",
+            lambda con: detect(db_path, WINDOWS, THRESHOLD, incremental=incremental, con=con),
+            deps=("clean",),
+            fingerprint=lambda: f"{settings} windows={WINDOWS} threshold={THRESHOLD}",
+        ),
+        Stage(
+            "forecast",
+            lambda con: forecast(db_path, HORIZON, HISTORY_HOURS, incremental=incremental, con=con),
+            deps=("rollup",),
+            fingerprint=lambda: f"{settings} horizon={HORIZON} history_hours={HISTORY_HOURS}",
+        ),
+    ]
@@ -0,0 +1,171 @@
+# prototype/pipeline/watch.py
+"""
+Live tail: watch the raw directory and keep the database current.
+
+Every `interval` seconds the raw files are fingerprinted (path, size and
+mtime, nothing is read; see stages.raw_files_fingerprint). When that
+changes, the LIVE_STAGES of the pipeline run incrementally: ingest appends
+only the new rows of files that grew, clean resumes at each station's
+watermark (updating latest_readings), and the rollups and anomalies pick
+up from where clean resumed. Each refresh that changed anything bumps the
+dataset version in <db>.version, which the dashboard polls to rerun.
+Export and forecast are left to the scheduled run_pipeline.py runs.
+
+DuckDB lets one process write a database file and then locks every other
+process out, readers included. The watcher therefore holds its write
+connection only while refreshing, and the dashboard opens a short
+read-only connection per rerun; both wait for the other's lock to clear.
+"""
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+import duckdb
+
+from prototype.ingestion.ingest import DEFAULT_PATTERNS
+from prototype.pipeline.dag import run_dag
+from prototype.pipeline.stages import pipeline_stages, raw_files_fingerprint
+
+logger = logging.getLogger(__name__)
+
+LIVE_STAGES = ("ingest", "clean", "rollup", "anomalies")
+INTERVAL = 5.0
+LOCK_TIMEOUT = 30.0
+
+
+def version_path(db_path) -> Path:
+    return Path(f"{db_path}.version")
+
+
+def read_version(db_path) -> dict:
+    """The dataset version last bumped for db_path ({"version": n, "updated_at": ..., ...}), or {} if none."""
+    try:
+        return json.loads(version_path(db_path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def bump_version(db_path, **info) -> int:
+    """Increment db_path's dataset version, recording info with it; the file is replaced atomically."""
+    version = read_version(db_path).get("version", 0) + 1
+    path = version_path(db_path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": version, "updated_at": datetime.utcnow().isoformat(), **info}))
+    os.replace(tmp, path)
+    return version
+
+
+def is_lock_conflict(exc: Exception) -> bool:
+    """Whether a DuckDB error means another process holds the database file's lock."""
+    return isinstance(exc, duckdb.IOException) and "lock" in str(exc).lower()
+
+
+def connect_when_free(db_path, read_only: bool = False, timeout: float = LOCK_TIMEOUT, poll: float = 0.1):
+    """duckdb.connect(db_path), retried while another process holds the file's lock, for up to timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return duckdb.connect(str(db_path), read_only=read_only)
+        except duckdb.IOException as exc:
+            if not is_lock_conflict(exc) or time.monotonic() >= deadline:
+                raise
+            time.sleep(poll)
+
+
+def refresh(raw_dir, db_path, stages=LIVE_STAGES, gap_hours: int = 2, layout: str = "tables",
+            patterns=DEFAULT_PATTERNS, lock_timeout: float = LOCK_TIMEOUT) -> dict:
+    """
+    Run the named pipeline stages incrementally, then bump the dataset
+    version if any of them ran. Returns run_dag's {stage: status}.
+    """
+    selected = [s for s in pipeline_stages(raw_dir, db_path, gap_hours, True, layout, patterns=patterns)
+                if s.name in stages]
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    con = connect_when_free(db_path, timeout=lock_timeout)
+    try:
+        options = dict(raw_dir=str(raw_dir), gap_hours=gap_hours, incremental=True, layout=layout, live=True)
+        status = run_dag(con, selected, options=options)
+    finally:
+        con.close()
+    if "ran" in status.values():
+        version = bump_version(db_path, stages=status)
+        logger.info(f"🔄 Dataset version {version}: " + ", ".join(f"{k} {v}" for k, v in status.items()))
+    return status
+
+
+def watch(raw_dir, db_path, interval: float = INTERVAL, stages=LIVE_STAGES, gap_hours: int = 2,
+          layout: str = "tables", patterns=DEFAULT_PATTERNS, cycles: int = None, sleep=time.sleep):
+    """
+    Poll raw_dir every interval seconds and refresh() whenever its files
+    changed (the first poll always refreshes). Runs forever, or for
+    `cycles` polls. A failed refresh is logged and retried at the next poll.
+    """
+    seen = None
+    polls = 0
+    while cycles is None or polls < cycles:
+        fingerprint = raw_files_fingerprint(raw_dir, patterns)
+        if fingerprint != seen:
+            try:
+                refresh(raw_dir, db_path, stages, gap_hours, layout, patterns)
+                seen = fingerprint
+            except Exception:
+                logger.exception("Refresh failed; retrying at the next poll")
+        polls += 1
+        if cycles is None or polls < cycles:
+            sleep(interval)
+
+
+@click.command()
+@click.option(
+    "--raw-dir",
+    required=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Directory of raw files to watch"
+)
+@click.option(
+    "--db-path",
+    default="data/airquality.duckdb",
+    show_default=True,
+    help="DuckDB database path"
+)
+@click.option(
+    "--interval",
+    default=INTERVAL,
+    show_default=True,
+    type=click.FloatRange(min=0.1),
+    help="Seconds between polls of the raw directory"
+)
+@click.option(
+    "--gap-hours",
+    default=2,
+    show_default=True,
+    help="Max gap hours for cleaning"
+)
+@click.option(
+    "--layout",
+    type=click.Choice(["tables", "observations"]),
+    default="tables",
+    show_default=True,
+    help="One raw table per CSV, or a single observations table"
+)
+@click.option(
+    "--stage",
+    "stages",
+    multiple=True,
+    type=click.Choice(["ingest", "clean", "export", "rollup", "anomalies", "forecast"]),
+    default=LIVE_STAGES,
+    show_default=True,
+    help="Stage run on every change (repeatable)"
+)
+def main(raw_dir: Path, db_path: str, interval: float, gap_hours: int, layout: str, stages: tuple):
+    """Command-line entry point for watch."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    watch(raw_dir, db_path, interval, stages, gap_hours, layout)
+
+
+if __name__ == "__main__":
+    main()
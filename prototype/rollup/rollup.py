@@ -0,0 +1,228 @@
+# prototype/rollup/rollup.py
+"""
+Rollup tables of the clean_* tables, per station and pollutant, in long
+form (source, station, pollutant, period, mean, min, max, count):
+
+    rollup_hourly, rollup_daily, rollup_monthly
+    rollup_weekday_hour   (year, weekday 1=Monday..7, hour) climatology
+    rollup_month_day      (year, month, day) climatology
+
+Hourly rows are aggregated from the clean table; every coarser table is
+aggregated from the one below it, means weighted by count. Climatologies
+keep one partial per year, so readers combine the years they need and a
+new year never rewrites the old ones.
+
+Updates are incremental: the cleaning_runs log says where each clean run
+since the last rollup resumed (reprocessed_from), and only the periods
+from the earliest of those on are deleted and aggregated again. Sources
+whose clean run is the one already rolled up are skipped; sources cleaned
+from scratch since are rebuilt.
+"""
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import click
+import duckdb
+import pandas as pd
+
+from prototype.cleaning.clean import resume_point, value_columns
+from prototype.export.parquet import clean_tables
+from prototype.pipeline.instrument import Meter
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = "rollup_state"
+
+# grain → (table, the finer table it is aggregated from, date_trunc part)
+GRAINS = {
+    "hourly": ("rollup_hourly", None, "hour"),
+    "daily": ("rollup_daily", "rollup_hourly", "day"),
+    "monthly": ("rollup_monthly", "rollup_daily", "month"),
+}
+
+# climatology → (table, the table it is aggregated from, its key columns)
+CLIMATOLOGIES = {
+    "weekday_hour": ("rollup_weekday_hour", "rollup_hourly", {"weekday": "isodow(period)", "hour": "hour(period)"}),
+    "month_day": ("rollup_month_day", "rollup_daily", {"month": "month(period)", "day": "day(period)"}),
+}
+
+ROLLUP_TABLES = [table for table, _, _ in GRAINS.values()] + [table for table, _, _ in CLIMATOLOGIES.values()]
+
+_STATS = "mean DOUBLE, min DOUBLE, max DOUBLE, count BIGINT"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def ensure_tables(con):
+    for table, _, _ in GRAINS.values():
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            f"(source VARCHAR, station VARCHAR, pollutant VARCHAR, period TIMESTAMP, {_STATS})"
+        )
+    for table, _, keys in CLIMATOLOGIES.values():
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (source VARCHAR, station VARCHAR, pollutant VARCHAR, "
+            f"year INTEGER, {', '.join(f'{k} INTEGER' for k in keys)}, {_STATS})"
+        )
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+        "(source VARCHAR PRIMARY KEY, clean_run TIMESTAMP, rolled_at TIMESTAMP)"
+    )
+
+
+def _delete(con, table: str, source: str, where: str = "", params=()):
+    con.execute(f"DELETE FROM {table} WHERE source = ?{where}", [source, *params])
+
+
+def _roll_hourly(con, source: str, restart) -> tuple:
+    """Aggregate source's clean rows from restart into rollup_hourly. Returns (rows read, rows written)."""
+    names = [r[0] for r in con.execute(f"DESCRIBE {_quote(source)}").fetchall()]
+    values = value_columns(con, source)
+    bound = None if restart is None else pd.Timestamp(restart).floor("h").to_pydatetime()
+    where = " AND datetime >= ?" if bound is not None else ""
+    params = [bound] if bound is not None else []
+    _delete(con, "rollup_hourly", source, " AND period >= ?" if bound is not None else "", params)
+    rows_in = con.execute(
+        f"SELECT count(*) FROM {_quote(source)} WHERE datetime IS NOT NULL{where}", params
+    ).fetchone()[0]
+    if not values or not rows_in:
+        return rows_in, 0
+    station = "CAST(station AS VARCHAR)" if "station" in names else f"'{source[len('clean_'):]}'"
+    before = con.execute("SELECT count(*) FROM rollup_hourly WHERE source = ?", [source]).fetchone()[0]
+    con.execute(
+        f"""
+        INSERT INTO rollup_hourly
+        WITH src AS (
+            SELECT {station} AS station, datetime,
+                   {', '.join(f'CAST({_quote(c)} AS DOUBLE) AS {_quote(c)}' for c in values)}
+            FROM {_quote(source)} WHERE datetime IS NOT NULL{where}
+        )
+        SELECT ? AS source, station, pollutant, date_trunc('hour', datetime) AS period,
+               avg(value), min(value), max(value), count(value)
+        FROM (UNPIVOT src ON {', '.join(_quote(c) for c in values)} INTO NAME pollutant VALUE value)
+        GROUP BY ALL
+        """,
+        params + [source],
+    )
+    after = con.execute("SELECT count(*) FROM rollup_hourly WHERE source = ?", [source]).fetchone()[0]
+    return rows_in, after - before
+
+
+def _roll_up(con, table: str, parent: str, keys: dict, source: str, where: str, params: list):
+    """Aggregate parent's rows of source (filtered by where) into table, grouped by keys."""
+    columns = ", ".join(keys)
+    selects = ", ".join(f"{expr} AS {name}" for name, expr in keys.items())
+    con.execute(
+        f"""
+        INSERT INTO {table} ({columns}, source, station, pollutant, mean, min, max, count)
+        SELECT {selects}, source, station, pollutant,
+               sum(mean * count) / sum(count), min(min), max(max), sum(count)
+        FROM {parent} WHERE source = ?{where}
+        GROUP BY ALL
+        """,
+        [source, *params],
+    )
+
+
+def _roll_source(con, source: str, restart) -> tuple:
+    """Bring every rollup of source up to date from restart (None: rebuild). Returns (rows read, hourly rows)."""
+    if restart is None:
+        for table in ROLLUP_TABLES:
+            _delete(con, table, source)
+    rows_in, rows_out = _roll_hourly(con, source, restart)
+
+    for grain, (table, parent, part) in GRAINS.items():
+        if parent is None:
+            continue
+        if restart is None:
+            where, params = "", []
+        else:
+            where, params = f" AND period >= date_trunc('{part}', ?::TIMESTAMP)", [restart.to_pydatetime()]
+            _delete(con, table, source, where, params)
+        _roll_up(con, table, parent, {"period": f"date_trunc('{part}', period)"}, source, where, params)
+
+    for name, (table, parent, keys) in CLIMATOLOGIES.items():
+        if restart is None:
+            where, params = "", []
+        else:
+            where, params = " AND year(period) >= ?", [restart.year]
+            _delete(con, table, source, " AND year >= ?", params)
+        _roll_up(con, table, parent, {"year": "year(period)", **keys}, source, where, params)
+    return rows_in, rows_out
+
+
+def rollup(db_path: str, incremental: bool = True, con=None) -> list:
+    """
+    Update the rollup tables from the clean_* tables in the DuckDB at
+    db_path: from where each table's last clean run resumed when
+    incremental, otherwise from scratch. Rollups of clean tables that no
+    longer exist are dropped. con is an open connection to db_path to use
+    instead of opening one; it is left open.
+
+    Returns one dict per rolled-up table: table, rows_in (clean rows read),
+    rows_out (hourly rows written) and the resource usage measured by Meter.
+    """
+    own = con is None
+    if own:
+        con = duckdb.connect(str(db_path))
+    try:
+        ensure_tables(con)
+        sources = clean_tables(con)
+        report = []
+        for source in sources:
+            skip, restart, run = resume_point(con, source, STATE_TABLE, incremental)
+            if skip:
+                logger.info(f"⏭️  `{source}` rollups are up to date")
+                continue
+            with Meter() as meter:
+                con.begin()
+                try:
+                    rows_in, rows_out = _roll_source(con, source, restart)
+                    con.execute(f"DELETE FROM {STATE_TABLE} WHERE source = ?", [source])
+                    con.execute(
+                        f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?)",
+                        [source, run[0] if run else None, datetime.utcnow()],
+                    )
+                    con.commit()
+                except Exception:
+                    con.rollback()
+                    raise
+            report.append({"table": source, "rows_in": rows_in, "rows_out": rows_out, **meter.as_dict()})
+            logger.info(
+                f"✅ Rolled up `{source}` " + (f"from {restart}" if restart is not None else "from scratch")
+                + f" ({rows_in} rows)"
+            )
+
+        gone = [s for (s,) in con.execute(f"SELECT source FROM {STATE_TABLE}").fetchall() if s not in sources]
+        for source in gone:
+            for table in ROLLUP_TABLES + [STATE_TABLE]:
+                _delete(con, table, source)
+    finally:
+        if own:
+            con.close()
+    return report
+
+
+@click.command()
+@click.option(
+    "--db-path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="DuckDB file holding the clean tables"
+)
+@click.option(
+    "--incremental/--full",
+    default=True,
+    show_default=True,
+    help="Re-aggregate only periods the last clean run touched"
+)
+def main(db_path: Path, incremental: bool):
+    """Command-line entry point for rollup."""
+    rollup(str(db_path), incremental=incremental)
+
+
+if __name__ == "__main__":
+    main()
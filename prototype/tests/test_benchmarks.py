@@ -0,0 +1,33 @@
+# prototype/tests/test_benchmarks.py
+import json
+import pandas as pd
+from app.loader import load_and_clean
+from benchmarks.generate import ensure_dataset, station_block
+from benchmarks.run import run
+
+
+def test_generator_is_deterministic_with_gaps():
+    a = station_block(0, 3, 1, 2000, ["no2", "pm25"])
+    b = station_block(0, 3, 1, 2000, ["no2", "pm25"])
+    pd.testing.assert_frame_equal(a, b)
+    assert len(a) < 2000                      # outages removed rows
+    assert a[["no2", "pm25"]].isna().any().all()
+    assert (a[["no2", "pm25"]].dropna() >= 0).all().all()
+
+
+def test_ukair_file_loads_like_the_pipeline_csvs(tmp_path):
+    dataset = ensure_dataset(tmp_path, stations=2, years=0.1, pollutants=["no2", "pm10"])
+    df = load_and_clean(dataset["ukair_csv"])
+    raw = pd.concat(pd.read_csv(f) for f in sorted((tmp_path / dataset["raw_dir"]).glob("*.csv")))
+    # rows with every pollutant missing are dropped by the dashboard loader
+    assert len(df) == raw[["no2", "pm10"]].notna().any(axis=1).sum()
+    assert list(df.columns) == ["Datetime", "Nitrogen dioxide", "PM10", "station"]
+    assert df["Datetime"].is_monotonic_increasing
+
+
+def test_benchmark_report_is_json(tmp_path):
+    report = run(["10k"], tmp_path, years=0.05, repeat=1)
+    names = [r["benchmark"] for r in report["results"]]
+    assert names[:3] == ["ingest", "clean", "load_and_clean"]
+    assert all(r["wall_seconds"] > 0 and r["rows"] > 0 for r in report["results"])
+    json.dumps(report)
@@ -1,7 +1,10 @@
 # prototype/tests/test_clean.py
+import json
+import numpy as np
 import pandas as pd
 import duckdb
 import pytest
+from pandera.errors import SchemaErrors
 from prototype.ingestion.ingest import ingest
 from prototype.cleaning.clean import clean
 
@@ -52,3 +55,226 @@ def test_clean_creates_clean_tables(sample_db):
     # Spot-check met cleaning: original had 1 row → should still be 1
     df_clean_met = con.execute("SELECT * FROM clean_met").df()
     assert len(df_clean_met) == 1
+
+def test_clean_observations_per_station(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    pd.DataFrame({
+        "datetime": ["2025-01-01 00:00:00", "2025-01-01 01:00:00", "2025-01-01 02:00:00"],
+        "no2": [1.0, None, 3.0],
+    }).to_csv(raw / "site_a.csv", index=False)
+    pd.DataFrame({
+        "datetime": ["2025-01-01 00:30:00", "2025-01-01 01:30:00"],
+        "no2": [None, 10.0],
+    }).to_csv(raw / "site_b.csv", index=False)
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db), layout="observations")
+
+    clean(db_path=str(db), max_gap_hours=2)
+
+    con = duckdb.connect(str(db), read_only=True)
+    df = con.execute("SELECT station, no2 FROM clean_observations ORDER BY station, datetime").df()
+    # Interpolation never borrows values from another station
+    assert df["no2"].tolist() == [1.0, 2.0, 3.0, 10.0, 10.0]
+
+
+def _gappy_frame(seed, n=400):
+    rng = np.random.default_rng(seed)
+    stamps = pd.date_range("2025-01-01", periods=n, freq="h")
+    stamps = stamps[np.sort(rng.choice(n, size=n * 3 // 4, replace=False))]
+    values = {}
+    for col in ("no2", "pm25"):
+        v = rng.gamma(2.0, 10.0, size=len(stamps))
+        # null runs of 1..6 rows, including at both ends
+        for start in rng.choice(len(stamps), size=25, replace=False):
+            v[start:start + rng.integers(1, 7)] = np.nan
+        v[:2] = np.nan
+        values[col] = v
+    return pd.DataFrame({"datetime": stamps, **values})
+
+
+def _clean_outputs(db):
+    """Every clean_* table in db as a DataFrame, keyed by name."""
+    con = duckdb.connect(str(db), read_only=True)
+    tables = sorted(r[0] for r in con.execute("SHOW TABLES").fetchall() if r[0].startswith("clean_"))
+    outputs = {t: con.execute(f"SELECT * FROM {t}").df() for t in tables}
+    con.close()
+    return outputs
+
+
+def _assert_same_outputs(actual, expected, **kwargs):
+    assert actual.keys() == expected.keys()
+    for table in expected:
+        a, e = actual[table], expected[table]
+        if table == "clean_metrics":
+            a, e = a.drop(columns="run_timestamp"), e.drop(columns="run_timestamp")
+        pd.testing.assert_frame_equal(a, e, **kwargs)
+
+
+@pytest.mark.parametrize("layout", ["tables", "observations"])
+def test_sql_engine_matches_pandas(tmp_path, layout):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _gappy_frame(1).to_csv(raw / "site_a.csv", index=False)
+    _gappy_frame(2).to_csv(raw / "site_b.csv", index=False)
+
+    results = {}
+    for engine in ("pandas", "sql"):
+        db = tmp_path / f"{engine}.db"
+        ingest(raw_dir=str(raw), db_path=str(db), layout=layout)
+        clean(db_path=str(db), max_gap_hours=2, engine=engine)
+        results[engine] = _clean_outputs(db)
+
+    _assert_same_outputs(results["sql"], results["pandas"], check_dtype=False)
+
+
+def test_engines_treat_a_null_station_as_its_own_series(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    frame = _gappy_frame(5)
+    frame.insert(0, "station", np.where(np.arange(len(frame)) % 3 == 0, None, "site_a"))
+    frame.to_csv(raw / "sites.csv", index=False)
+
+    results = {}
+    for engine, chunk in (("pandas", None), ("sql", None), ("pandas", "2D")):
+        db = tmp_path / f"{engine}_{chunk}.db"
+        ingest(raw_dir=str(raw), db_path=str(db), layout="observations")
+        clean(db_path=str(db), max_gap_hours=2, engine=engine, chunk=chunk)
+        results[engine, chunk] = _clean_outputs(db)
+
+    nulls = results["pandas", None]["clean_observations"].query("station.isna()")
+    assert len(nulls) == (len(frame) + 2) // 3 and nulls["no2"].notna().any()
+    _assert_same_outputs(results["sql", None], results["pandas", None], check_dtype=False)
+    _assert_same_outputs(results["pandas", "2D"], results["pandas", None], check_dtype=False)
+
+
+@pytest.mark.parametrize("layout", ["tables", "observations"])
+def test_chunked_clean_matches_whole_table(tmp_path, layout):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    _gappy_frame(3).to_csv(raw / "site_a.csv", index=False)
+    _gappy_frame(4).to_csv(raw / "site_b.csv", index=False)
+
+    results = {}
+    for chunk in (None, "2D"):
+        db = tmp_path / f"{chunk}.db"
+        ingest(raw_dir=str(raw), db_path=str(db), layout=layout)
+        clean(db_path=str(db), max_gap_hours=2, chunk=chunk)
+        results[chunk] = _clean_outputs(db)
+
+    _assert_same_outputs(results["2D"], results[None], check_dtype=False)
+
+
+def test_parallel_clean_matches_serial(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for i, site in enumerate(("site_a", "site_b", "site_c")):
+        _gappy_frame(10 + i).to_csv(raw / f"{site}.csv", index=False)
+
+    results = {}
+    for workers in (1, 2):
+        db = tmp_path / f"{workers}.db"
+        ingest(raw_dir=str(raw), db_path=str(db))
+        clean(db_path=str(db), max_gap_hours=2, workers=workers)
+        results[workers] = _clean_outputs(db)
+
+    assert list(results[2]) == ["clean_metrics", "clean_site_a", "clean_site_b", "clean_site_c"]
+    _assert_same_outputs(results[2], results[1])
+
+
+@pytest.mark.parametrize("engine", ["pandas", "sql"])
+def test_fast_validation_counts_and_nulls_violations(tmp_path, engine):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    pd.DataFrame({
+        "datetime": ["2025-01-01 00:00:00", "not a date", "2025-01-01 01:00:00", "2025-01-01 02:00:00"],
+        "no2": [10.0, 1.0, -5.0, 30.0],
+        "pm25": [1.0, 1.0, 2.0, -1.0],
+    }).to_csv(raw / "aurn.csv", index=False)
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db))
+
+    clean(db_path=str(db), max_gap_hours=2, engine=engine)
+
+    con = duckdb.connect(str(db), read_only=True)
+    # negatives become gaps and are interpolated like any other missing value
+    assert con.execute("SELECT no2, pm25 FROM clean_aurn ORDER BY datetime").fetchall() == [
+        (10.0, 1.0), (20.0, 2.0), (30.0, 2.0),
+    ]
+    total, violations = con.execute("SELECT violations_total, violations FROM clean_metrics").fetchone()
+    assert total == 3
+    assert json.loads(violations) == {
+        "datetime": {"null": 1},
+        "no2": {"negative": 1, "not_numeric": 0},
+        "pm25": {"negative": 1, "not_numeric": 0},
+    }
+    con.close()
+
+    with pytest.raises((ValueError, SchemaErrors)):
+        clean(db_path=str(db), max_gap_hours=2, engine=engine, validation="full")
+
+
+@pytest.mark.parametrize("engine", ["pandas", "sql"])
+def test_sampled_validation_checks_a_subset(tmp_path, engine):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    frame = _gappy_frame(7)
+    frame["pm25"] = -1.0
+    frame.to_csv(raw / "aurn.csv", index=False)
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db))
+
+    clean(db_path=str(db), max_gap_hours=2, engine=engine, validation="sample", sample_rows=50)
+
+    con = duckdb.connect(str(db), read_only=True)
+    assert con.execute("SELECT validation, rows_validated FROM clean_metrics").fetchone() == ("sample", 50)
+    # counts over the sample are scaled up to the whole table
+    violations = json.loads(con.execute("SELECT violations FROM clean_metrics").fetchone()[0])
+    assert violations["pm25"] == {"negative": len(frame), "not_numeric": 0}
+    assert violations["no2"] == {"negative": 0, "not_numeric": 0}
+    # every row is still coerced
+    assert con.execute("SELECT count(pm25) FROM clean_aurn").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("layout", ["tables", "observations"])
+def test_incremental_clean_matches_full_rebuild(tmp_path, layout):
+    frames = {"site_a": _gappy_frame(20), "site_b": _gappy_frame(21)}
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    db = tmp_path / "incremental.db"
+    # first run sees the first 250 rows, which end inside null runs
+    for site, frame in frames.items():
+        frame.iloc[:250].to_csv(raw / f"{site}.csv", index=False)
+    ingest(raw_dir=str(raw), db_path=str(db), layout=layout, incremental=True)
+    clean(db_path=str(db), max_gap_hours=2, incremental=True)
+
+    # then the rest is appended
+    for site, frame in frames.items():
+        frame.to_csv(raw / f"{site}.csv", index=False)
+    ingest(raw_dir=str(raw), db_path=str(db), layout=layout, incremental=True)
+    clean(db_path=str(db), max_gap_hours=2, incremental=True)
+
+    full = tmp_path / "full.db"
+    ingest(raw_dir=str(raw), db_path=str(full), layout=layout)
+    clean(db_path=str(full), max_gap_hours=2)
+
+    actual, expected = _clean_outputs(db), _clean_outputs(full)
+    metrics = actual.pop("clean_metrics")
+    expected.pop("clean_metrics")
+    assert metrics["reprocessed_from"].notna().all()
+    # only the tail was cleaned again
+    for table, rows in zip(metrics["table"], metrics["cleaned_rows"]):
+        assert rows < len(actual[f"clean_{table}"]) / 4
+    sort = ["station", "datetime"] if layout == "observations" else ["datetime"]
+    actual = {t: df.sort_values(sort, ignore_index=True) for t, df in actual.items()}
+    _assert_same_outputs(actual, expected, check_dtype=False)
+
+    # latest_readings was kept current by the incremental runs: each series' last non-null value
+    query = "SELECT * EXCLUDE (updated_at) FROM latest_readings ORDER BY station, pollutant"
+    latest = duckdb.connect(str(db), read_only=True).execute(query).df()
+    pd.testing.assert_frame_equal(latest, duckdb.connect(str(full), read_only=True).execute(query).df())
+    for site, frame in frames.items():
+        for column in ("no2", "pm25"):
+            last = frame.dropna(subset=[column]).iloc[-1]
+            row = latest[(latest["station"] == site) & (latest["pollutant"] == column)].iloc[0]
+            assert (row["datetime"], row["value"]) == (last["datetime"], last[column])
@@ -0,0 +1,65 @@
+# prototype/tests/test_decimate.py
+import numpy as np
+import pandas as pd
+import pytest
+from app import analytics
+from app.decimate import decimate, envelope, lttb, min_max, thin_scatter
+
+
+def _series(n=10_000):
+    rng = np.random.default_rng(0)
+    t = pd.date_range("2020-01-01", periods=n, freq="h")
+    v = 20 + 10 * np.sin(np.arange(n) / 500) + rng.normal(0, 1, n)
+    v[5000] = 500.0  # a spike
+    return pd.DataFrame({"Datetime": t, "Value": v})
+
+
+@pytest.mark.parametrize("method", [lttb, min_max])
+def test_methods_respect_budget_and_keep_extremes(method):
+    df = _series()
+    picks = method(df["Datetime"], df["Value"], 200)
+    assert len(picks) <= 200
+    assert np.all(np.diff(picks) > 0)
+    assert 5000 in picks
+
+
+def test_decimate_keeps_flagged_points_and_gaps_per_series():
+    a, b = _series(), _series()
+    a.loc[100:120, "Value"] = np.nan
+    long_df = pd.concat([a.assign(Pollutant="a"), b.assign(Pollutant="b")], ignore_index=True)
+    keep = long_df.index.isin([7, 10_007 + 3])
+
+    out = decimate(long_df, "Datetime", "Value", budget=300, by="Pollutant", keep=keep)
+    assert (out["Pollutant"] == "a").sum() <= 300 + 2 and (out["Pollutant"] == "b").sum() <= 300 + 1
+    assert {7, 10_010} <= set(out.index)
+    # the gap still breaks the line
+    assert out.loc[100:120, "Value"].isna().any()
+    # small series are left alone
+    assert len(decimate(a.iloc[:50], "Datetime", "Value", budget=300)) == 50
+
+
+def test_thin_scatter_and_exact_summaries():
+    df = _series().assign(Other=lambda d: d["Value"] * 2)
+    thinned = thin_scatter(df, "Value", "Other", budget=400)
+    assert len(thinned) <= 400
+    assert thinned["Value"].max() == 500.0
+
+    fit = analytics.linear_fit(df, "Value", "Other")
+    assert fit["Other"].tolist() == pytest.approx([2 * df["Value"].min(), 1000.0])
+    bars = analytics.histogram_long(df, ["Value"], maxbins=10)
+    assert bars["count"].sum() == len(df)
+
+
+def test_envelope_is_bounded_by_the_width_and_keeps_peaks_and_gaps():
+    df = _series(100_000)
+    df.loc[20_000:21_000, "Value"] = np.nan
+    x, y = envelope(df["Datetime"].to_numpy(), df["Value"].to_numpy(), 400)
+    assert len(x) == len(y) <= 800
+    assert x.dtype == df["Datetime"].to_numpy().dtype and np.all(np.diff(x.astype("int64")) >= 0)
+    assert np.nanmax(y) == 500.0 and np.nanmin(y) == df["Value"].min()
+    assert np.isnan(y).any()
+    # short series are drawn as they are
+    times = _series()["Datetime"]
+    assert envelope(times, _series()["Value"], 5000)[0] is times
+    with pytest.raises(ValueError, match="sorted"):
+        envelope(df["Datetime"].to_numpy()[::-1], df["Value"].to_numpy(), 400)
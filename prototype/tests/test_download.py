@@ -0,0 +1,201 @@
+# prototype/tests/test_download.py
+import hashlib
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+from prototype.cleaning.clean import clean
+from prototype.download.backfill import backfill
+from prototype.download.fetch import Download, fetch_all
+from prototype.periods import windows
+
+
+class FileServer(ThreadingHTTPServer):
+    """Serves files with ETags and byte ranges; can cut a response short once."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.files = {}      # path → (body, etag)
+        self.cut = {}        # path → bytes sent before the connection drops, once
+        self.requests = []   # (path, headers)
+        self.generate = None  # path → (status, body) for paths not in files
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(0.05)
+            if self.path not in server.files and server.generate is not None:
+                status, body = server.generate(self.path)
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            body, etag = server.files[self.path]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            start = 0
+            ranged = self.headers.get("Range")
+            if ranged and self.headers.get("If-Range", etag) == etag:
+                start = int(ranged.split("=")[1].rstrip("-"))
+            self.send_response(206 if start else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body) - start))
+            self.end_headers()
+            cut = server.cut.pop(self.path, None)
+            self.wfile.write(body[start:cut])
+            if cut is not None:
+                self.close_connection = True
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@pytest.fixture
+def server():
+    srv = FileServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_downloads_concurrently_and_skips_unchanged_files(server, tmp_path):
+    for i in range(6):
+        server.files[f"/f{i}.csv"] = (f"datetime,no2\n{i}\n".encode() * 100, f'"v{i}"')
+    downloads = [Download(server.url(f"/f{i}.csv"), tmp_path / f"f{i}.csv") for i in range(6)]
+
+    results = fetch_all(downloads, workers=6, per_host=2)
+    assert [r["status"] for r in results] == ["downloaded"] * 6
+    assert server.peak == 2
+    assert all((tmp_path / f"f{i}.csv").read_bytes() == server.files[f"/f{i}.csv"][0] for i in range(6))
+    assert not list(tmp_path.glob("*.part"))
+
+    # unchanged files are not transferred again; a changed or truncated one is
+    server.files["/f0.csv"] = (b"datetime,no2\nnew\n", '"v0-2"')
+    (tmp_path / "f1.csv").write_bytes(b"datetime")
+    results = fetch_all(downloads, workers=6)
+    assert [r["status"] for r in results] == ["downloaded", "downloaded"] + ["not_modified"] * 4
+    assert (tmp_path / "f0.csv").read_bytes() == b"datetime,no2\nnew\n"
+    assert (tmp_path / "f1.csv").read_bytes() == server.files["/f1.csv"][0]
+    conditional = {path for path, headers in server.requests[6:] if "If-None-Match" in headers}
+    assert conditional == {"/f0.csv", "/f2.csv", "/f3.csv", "/f4.csv", "/f5.csv"}
+
+
+def test_interrupted_download_resumes_with_a_range(server, tmp_path):
+    body = bytes(range(256)) * 400
+    server.files["/big.csv"] = (body, '"big"')
+    server.cut["/big.csv"] = 30_000
+    dest = tmp_path / "big.csv"
+    result, = fetch_all([Download(server.url("/big.csv"), dest, hashlib.sha256(body).hexdigest())],
+                        retries=1, backoff=0)
+    assert result["status"] == "resumed" and result["bytes"] == len(body) - 30_000
+    assert server.requests[-1][1]["Range"] == "bytes=30000-"
+    assert dest.read_bytes() == body
+
+    # a file that changed since the partial download is fetched from the start
+    server.files["/big.csv"] = (body[::-1], '"big-2"')
+    server.cut["/big.csv"] = 10_000
+    dest.with_name("big.csv.meta.json").unlink()
+    dest.unlink()
+    with pytest.raises(urllib.error.URLError, match="received 10000"):
+        fetch_all([Download(server.url("/big.csv"), dest)], retries=0)
+    assert dest.with_name("big.csv.part").stat().st_size == 10_000
+    server.files["/big.csv"] = (body, '"big-3"')
+    result, = fetch_all([Download(server.url("/big.csv"), dest)], retries=0)
+    assert result["status"] == "downloaded" and dest.read_bytes() == body
+
+
+def test_checksum_mismatch_leaves_no_file(server, tmp_path):
+    server.files["/a.csv"] = (b"datetime,no2\n", '"a"')
+    dest = tmp_path / "a.csv"
+    with pytest.raises(ValueError, match="SHA-256"):
+        fetch_all([Download(server.url("/a.csv"), dest, "0" * 64)])
+    assert not dest.exists() and not dest.with_name("a.csv.part").exists()
+
+
+def test_backfill_streams_windows_into_duckdb_and_resumes(server, tmp_path):
+    failures = {("MY1", "2025-02-01"): [500, 404]}  # one retried error, then one that stops the first run
+
+    def hourly_csv(path):
+        query = {k: v[0] for k, v in parse_qs(urlsplit(path).query).items()}
+        pending = failures.get((query["site"], query["start"]))
+        if pending:
+            return pending.pop(0), b"error"
+        stamps = pd.date_range(query["start"], pd.Timestamp(query["end"]) + pd.Timedelta(hours=23), freq="h")
+        frame = pd.DataFrame({"datetime": stamps, "no2": float(len(query["site"])), "pm25": 1, "status": "V"})
+        if query["start"] == "2025-03-01":
+            frame["pm25"] = frame["pm25"].astype(object)
+            frame.loc[frame.index[-1], "pm25"] = "No data"  # text in a column other windows send as numbers
+        return 200, frame.to_csv(index=False).encode()
+
+    server.generate = hourly_csv
+    url = server.url("/data_api?site={site}&start={start:%Y-%m-%d}&end={end:%Y-%m-%d}")
+    db = tmp_path / "test.db"
+    assert windows("2025-01-15", "2025-03-01", "MS") == [
+        (pd.Timestamp("2025-01-15"), pd.Timestamp("2025-02-01")),
+        (pd.Timestamp("2025-02-01"), pd.Timestamp("2025-03-01")),
+    ]
+
+    args = (db, ["MY1", "KC1"], "2025-01-01", "2025-04-01")
+    with pytest.raises(urllib.error.HTTPError):
+        backfill(*args, url_template=url, rate=100, backoff=0)
+    report = backfill(*args, url_template=url, rate=100, backoff=0)
+    assert [(r["site"], r["start"]) for r in report] == [("MY1", pd.Timestamp("2025-02-01"))]
+    assert backfill(*args, url_template=url, rate=100) == []
+
+    con = duckdb.connect(str(db))
+    counts = con.execute(
+        "SELECT station, count(*), count(DISTINCT datetime), min(datetime), max(datetime), any_value(no2::DOUBLE) "
+        "FROM defra_hourly GROUP BY station ORDER BY station"
+    ).fetchall()
+    hours = len(pd.date_range("2025-01-01", "2025-03-31 23:00", freq="h"))
+    last = pd.Timestamp("2025-03-31 23:00").to_pydatetime()
+    assert counts == [("KC1", hours, hours, pd.Timestamp("2025-01-01").to_pydatetime(), last, 3.0),
+                      ("MY1", hours, hours, pd.Timestamp("2025-01-01").to_pydatetime(), last, 3.0)]
+    con.close()
+    # the backfilled table is cleaned like any raw table, per station
+    clean(db_path=str(db), max_gap_hours=2)
+    con = duckdb.connect(str(db), read_only=True)
+    assert con.execute("SELECT count(DISTINCT station) FROM clean_defra_hourly").fetchone() == (2,)
+    assert con.execute("SELECT count(pm25) FROM clean_defra_hourly").fetchone() == (2 * hours,)
+    con.close()
+
+
+def test_backfill_retries_a_cut_body_but_not_one_that_does_not_parse(server, tmp_path):
+    body = pd.DataFrame({"datetime": pd.date_range("2025-01-01", periods=744, freq="h"), "no2": 1.0})
+    server.files["/jan.csv"] = (body.to_csv(index=False).encode(), '"jan"')
+    server.cut["/jan.csv"] = 5_000
+    report = backfill(tmp_path / "test.db", ["MY1"], "2025-01-01", "2025-02-01",
+                      url_template=server.url("/jan.csv"), backoff=0)
+    assert [r["rows"] for r in report] == [744] and len(server.requests) == 2
+
+    server.generate = lambda path: (200, b"datetime,no2\nnot a time,1\n")
+    url = server.url("/data_api?site={site}&start={start:%Y-%m-%d}")
+    with pytest.raises(pa.ArrowInvalid):
+        backfill(tmp_path / "other.db", ["MY1"], "2025-01-01", "2025-02-01", url_template=url, backoff=0)
+    assert len(server.requests) == 3
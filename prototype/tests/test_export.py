@@ -0,0 +1,78 @@
+# prototype/tests/test_export.py
+import duckdb
+import pandas as pd
+import pytest
+from prototype.ingestion.ingest import ingest
+from prototype.cleaning.clean import clean
+from prototype.export.parquet import export, read_clean
+
+
+@pytest.fixture
+def clean_db(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for i, site in enumerate(("site_a", "site_b")):
+        stamps = pd.date_range("2024-12-31 20:00", periods=10, freq="h")
+        pd.DataFrame({"datetime": stamps, "no2": range(i, i + 10), "pm25": 1.5}).to_csv(
+            raw / f"{site}.csv", index=False
+        )
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db), layout="observations")
+    clean(db_path=str(db), max_gap_hours=2)
+    return db
+
+
+def test_export_partitions_by_station_and_year(clean_db, tmp_path):
+    out = tmp_path / "parquet"
+    (report,) = export(clean_db, out)
+    assert (report["table"], report["rows_out"]) == ("clean_observations", 20)
+
+    files = sorted(p.relative_to(out).as_posix() for p in out.rglob("*.parquet"))
+    assert [f.rsplit("/", 1)[0] for f in files] == [
+        "clean_observations/station=site_a/year=2024",
+        "clean_observations/station=site_a/year=2025",
+        "clean_observations/station=site_b/year=2024",
+        "clean_observations/station=site_b/year=2025",
+    ]
+
+    con = duckdb.connect(str(clean_db), read_only=True)
+    expected = con.execute("SELECT datetime, no2, pm25 FROM clean_observations ORDER BY station, datetime").df()
+    con.close()
+    table = read_clean(out / "clean_observations", columns=["datetime", "no2", "pm25"])
+    actual = table.to_pandas().sort_values("datetime", kind="stable")
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True),
+        expected.sort_values("datetime", kind="stable").reset_index(drop=True),
+        check_dtype=False,
+    )
+
+    # an export that stopped between its renames left only the old copy aside: the next one recovers
+    (out / "clean_observations").rename(out / "clean_observations.old")
+    export(clean_db, out)
+    assert sorted(p.name for p in out.iterdir()) == ["clean_observations"]
+    assert read_clean(out / "clean_observations", columns=["no2"]).num_rows == 20
+
+
+def test_read_clean_prunes_columns_and_partitions(clean_db, tmp_path):
+    out = tmp_path / "parquet"
+    export(clean_db, out)
+
+    table = read_clean(out / "clean_observations", columns=["datetime", "no2"], stations=["site_b"], years=[2025])
+    assert table.column_names == ["datetime", "no2"]
+    assert table.column("no2").to_pylist() == [5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+
+    table = read_clean(out / "clean_observations", columns=["no2"], start="2025-01-01 02:00", end="2025-01-01 04:00")
+    assert sorted(table.column("no2").to_pylist()) == [6.0, 7.0, 7.0, 8.0]
+
+
+def test_export_names_stations_with_apostrophes(tmp_path):
+    db = tmp_path / "test.db"
+    con = duckdb.connect(str(db))
+    con.execute("""CREATE TABLE "clean_st_paul's" AS SELECT TIMESTAMP '2025-01-01' AS datetime, 1.0 AS no2""")
+    con.close()
+
+    out = tmp_path / "parquet"
+    (report,) = export(db, out)
+    assert report["rows_out"] == 1
+    table = read_clean(out / "clean_st_paul's", columns=["station", "no2"])
+    assert table.to_pylist() == [{"station": "st_paul's", "no2": 1.0}]
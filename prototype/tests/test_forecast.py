@@ -0,0 +1,77 @@
+# prototype/tests/test_forecast.py
+import duckdb
+import numpy as np
+import pandas as pd
+from prototype.ingestion.ingest import ingest
+from prototype.cleaning.clean import clean
+from prototype.rollup.rollup import rollup
+from prototype.forecast.forecast import forecast
+from prototype.forecast.model import design, fit, predict, seasonal_naive_rmse, terms
+
+
+def _seasonal(times, level, slope, seed):
+    hours = np.asarray(pd.DatetimeIndex(times).as_unit("s").asi8 / 3600.0)
+    noise = np.random.default_rng(seed).normal(0, 0.5, len(hours))
+    return level + slope * (hours - hours[0]) / 1000 + 8 * np.sin(2 * np.pi * hours / 24) + noise
+
+
+def test_batched_fit_recovers_every_series():
+    times = pd.date_range("2025-01-01", periods=24 * 56, freq="h")
+    y = np.column_stack([_seasonal(times, 40, 2, 0), _seasonal(times, 10, -1, 1), np.full(len(times), np.nan)])
+    y[100:300, 0] = np.nan
+    y[5:, 2] = np.nan
+    y[:3, 2] = 1.0
+
+    x = design(times, times[-1])
+    coef, n, rmse = fit(x, y)
+    assert coef.shape == (3, len(terms()))
+    assert n.tolist() == [len(times) - 200, len(times), 3]
+    # each series is fitted from its own values only, as if alone
+    alone, _, _ = fit(x[~np.isnan(y[:, 0])], y[~np.isnan(y[:, 0]), 0])
+    np.testing.assert_allclose(coef[0], alone[0], rtol=1e-8)
+    np.testing.assert_allclose(rmse[:2], 0.5, atol=0.05)
+    # too few values to fit
+    assert np.isnan(coef[2]).all() and np.isnan(rmse[2])
+    # the daily cycle beats predicting last week's value
+    assert (rmse[:2] < seasonal_naive_rmse(y)[:2]).all()
+    np.testing.assert_allclose(predict(x, coef[1])[:, 0], _seasonal(times, 10, -1, 1), atol=2.5)
+
+
+def test_forecasts_are_stored_and_refitted_when_rollups_change(tmp_path):
+    times = pd.date_range("2025-01-01", periods=24 * 21, freq="h")
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    db = tmp_path / "test.db"
+    frames = {
+        site: pd.DataFrame({"datetime": times, "no2": _seasonal(times, 30 + i, 1, i)})
+        for i, site in enumerate(("site_a", "site_b"))
+    }
+    for site, frame in frames.items():
+        frame.iloc[:-24].to_csv(raw / f"{site}.csv", index=False)
+    ingest(raw_dir=str(raw), db_path=str(db))
+    clean(db_path=str(db), max_gap_hours=2)
+    rollup(str(db))
+    assert [r["rows_out"] for r in forecast(str(db), horizon=48)] == [48, 48]
+    assert forecast(str(db), horizon=48) == []
+
+    frames["site_a"].to_csv(raw / "site_a.csv", index=False)
+    ingest(raw_dir=str(raw), db_path=str(db), incremental=True)
+    clean(db_path=str(db), max_gap_hours=2, incremental=True)
+    rollup(str(db))
+    assert [r["table"] for r in forecast(str(db), horizon=48)] == ["clean_site_a"]
+
+    con = duckdb.connect(str(db), read_only=True)
+    models = con.execute(
+        "SELECT station, trained_to, n_obs, len(coefficients), rmse < baseline_rmse FROM forecast_models ORDER BY station"
+    ).fetchall()
+    assert models == [
+        ("site_a", times[-1].to_pydatetime(), len(times), len(terms()), True),
+        ("site_b", times[-25].to_pydatetime(), len(times) - 24, len(terms()), True),
+    ]
+    stored = con.execute(
+        "SELECT datetime, forecast, lower, upper FROM forecasts WHERE station = 'site_a' ORDER BY datetime"
+    ).df()
+    assert stored["datetime"].tolist() == list(pd.date_range(times[-1], periods=49, freq="h")[1:])
+    assert (stored["lower"] < stored["forecast"]).all() and (stored["forecast"] < stored["upper"]).all()
+    expected = _seasonal(pd.date_range(times[0], periods=len(times) + 48, freq="h"), 30, 1, 0)[-48:]
+    np.testing.assert_allclose(stored["forecast"], expected, atol=3)
@@ -1,7 +1,13 @@
 # prototype/tests/test_ingest.py
+import gzip
+import io
+import os
+import tarfile
+import zipfile
 import pandas as pd
 import duckdb
 import pytest
+from prototype.ingestion import ingest as ingest_module
 from prototype.ingestion.ingest import ingest
 
 def test_ingest_multiple_csv_files(tmp_path):
@@ -32,3 +38,190 @@ def test_ingest_multiple_csv_files(tmp_path):
     df_db_b = con.execute("SELECT * FROM met").df()
     df_db_b = df_db_b.sort_values("foo").reset_index(drop=True)
     pd.testing.assert_frame_equal(df_b.sort_values("foo").reset_index(drop=True), df_db_b)
+
+def test_incremental_ingest_skips_and_appends(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    csv = raw / "aurn.csv"
+    csv.write_text("datetime,no2\n2025-01-01 00:00:00,10.0\n2025-01-01 01:00:00,11.5\n")
+    db_path = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+
+    # Unchanged file: the table must not be rebuilt
+    con = duckdb.connect(str(db_path))
+    con.execute("INSERT INTO aurn VALUES ('2024-12-31 23:00:00', 1.0)")
+    con.close()
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+    con = duckdb.connect(str(db_path), read_only=True)
+    assert con.execute("SELECT count(*) FROM aurn").fetchone()[0] == 3
+    con.close()
+
+    # Appended rows: only the tail is loaded
+    with open(csv, "a") as f:
+        f.write("2025-01-01 02:00:00,\n2025-01-01 03:00:00,9.25\n")
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+    con = duckdb.connect(str(db_path), read_only=True)
+    rows = con.execute("SELECT datetime, no2 FROM aurn ORDER BY datetime").fetchall()
+    assert len(rows) == 5
+    assert rows[-2][1] is None and rows[-1][1] == 9.25
+    manifest = con.execute("SELECT size, row_count FROM ingest_manifest").fetchone()
+    assert manifest == (csv.stat().st_size, 4)
+    con.close()
+
+    # Rewritten file: full reload drops the manually inserted row
+    csv.write_text("datetime,no2\n2025-02-01 00:00:00,5.0\n")
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+    con = duckdb.connect(str(db_path), read_only=True)
+    assert con.execute("SELECT count(*) FROM aurn").fetchone()[0] == 1
+
+def test_ingest_observations_layout(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    pd.DataFrame({"datetime": ["2025-01-01 00:00:00", "2025-01-01 01:00:00"], "no2": [1.0, 2.0]}).to_csv(
+        raw / "site_a.csv", index=False)
+    pd.DataFrame({"datetime": ["2025-01-01 00:00:00"], "no2": [3.0], "pm25": [4.0]}).to_csv(
+        raw / "site_b.csv", index=False)
+
+    db_path = tmp_path / "test.db"
+    stats = ingest(raw_dir=str(raw), db_path=str(db_path), layout="observations", workers=2)
+    assert sorted(s["rows"] for s in stats) == [1, 2]
+    assert all(s["rows_per_sec"] > 0 for s in stats)
+
+    con = duckdb.connect(str(db_path), read_only=True)
+    tables = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    assert "observations" in tables and "site_a" not in tables
+    cols = [r[0] for r in con.execute("DESCRIBE observations").fetchall()]
+    assert cols[:2] == ["station", "datetime"] and "source_file" in cols and "pm25" in cols
+    rows = con.execute(
+        "SELECT station, source_file, no2, pm25 FROM observations ORDER BY station, datetime"
+    ).fetchall()
+    assert rows == [
+        ("site_a", "site_a.csv", 1.0, None),
+        ("site_a", "site_a.csv", 2.0, None),
+        ("site_b", "site_b.csv", 3.0, 4.0),
+    ]
+
+def test_ingest_streams_compressed_sources(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    body = b"datetime,temp\n2024-01-01 00:00:00,5.5\n2024-01-01 01:00:00,6.0\n"
+    with gzip.open(raw / "hourly_2023.csv.gz", "wb") as f:
+        f.write(body)
+    with tarfile.open(raw / "wx.tar.gz", "w:gz") as tar:
+        info = tarfile.TarInfo("midas/hourly_2024.csv")
+        info.size = len(body)
+        tar.addfile(info, io.BytesIO(body))
+    with zipfile.ZipFile(raw / "wx.zip", "w") as zf:
+        zf.writestr("hourly_2025.csv", body)
+
+    db_path = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+    # Nothing was extracted next to the archives
+    assert sorted(p.name for p in raw.iterdir()) == ["hourly_2023.csv.gz", "wx.tar.gz", "wx.zip"]
+
+    con = duckdb.connect(str(db_path), read_only=True)
+    for table in ("hourly_2023", "wx_midas_hourly_2024", "wx_hourly_2025"):
+        assert con.execute(f"SELECT sum(temp) FROM {table}").fetchone()[0] == 11.5
+    con.close()
+
+    # Second incremental run skips all three sources
+    assert ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True) == []
+
+def test_archive_members_are_named_per_archive(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    with zipfile.ZipFile(raw / "north.zip", "w") as zf:
+        zf.writestr("hourly.csv", "temp\n1\n")
+        zf.writestr("retired.csv", "temp\n9\n")
+    with zipfile.ZipFile(raw / "south.zip", "w") as zf:
+        zf.writestr("hourly.csv", "temp\n2\n")
+
+    db_path = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+    con = duckdb.connect(str(db_path), read_only=True)
+    assert con.execute("SELECT temp FROM north_hourly").fetchone() == (1,)
+    assert con.execute("SELECT temp FROM south_hourly").fetchone() == (2,)
+    con.close()
+
+    # A member dropped from its archive takes its table with it
+    with zipfile.ZipFile(raw / "north.zip", "w") as zf:
+        zf.writestr("hourly.csv", "temp\n3\n")
+    ingest(raw_dir=str(raw), db_path=str(db_path), incremental=True)
+    con = duckdb.connect(str(db_path), read_only=True)
+    tables = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    assert tables == {"ingest_manifest", "north_hourly", "south_hourly"}
+    assert con.execute("SELECT temp FROM north_hourly").fetchone() == (3,)
+    con.close()
+
+@pytest.mark.parametrize("layout", ["tables", "observations"])
+def test_archive_member_types_may_change_after_the_first_block(tmp_path, monkeypatch, layout):
+    monkeypatch.setattr(ingest_module, "STREAM_BLOCK_SIZE", 1 << 10)
+    stamps = pd.date_range("2024-01-01", periods=500, freq="h")
+    body = "datetime,count,temp\n" + "".join(f"{t},{i},\n" for i, t in enumerate(stamps))
+    # well past the first block: text in an integer column, decimals in an all-empty one
+    body += "2024-02-01 00:00:00,x,4.5\n"
+    with zipfile.ZipFile(tmp_path / "wx.zip", "w") as zf:
+        zf.writestr("late.csv", body)
+
+    db_path = tmp_path / "test.db"
+    ingest(raw_dir=str(tmp_path), db_path=str(db_path), layout=layout)
+
+    table = "wx_late" if layout == "tables" else "observations"
+    con = duckdb.connect(str(db_path), read_only=True)
+    types = {r[0]: r[1] for r in con.execute(f"DESCRIBE {table}").fetchall()}
+    assert (types["datetime"], types["count"], types["temp"]) == ("TIMESTAMP", "VARCHAR", "DOUBLE")
+    assert con.execute(f"SELECT count(*), sum(temp) FROM {table}").fetchone() == (501, 4.5)
+    con.close()
+
+
+def test_archives_are_hashed_while_streamed(tmp_path, monkeypatch):
+    body = b"datetime,temp\n2024-01-01 00:00:00,5.5\n"
+    with tarfile.open(tmp_path / "wx.tar.gz", "w:gz") as tar:
+        info = tarfile.TarInfo("hourly.csv")
+        info.size = len(body)
+        tar.addfile(info, io.BytesIO(body))
+    db_path = tmp_path / "test.db"
+
+    hashed = []
+    hash_range = ingest_module._hash_range
+    monkeypatch.setattr(ingest_module, "_hash_range", lambda *args: hashed.append(args) or hash_range(*args))
+    ingest(raw_dir=str(tmp_path), db_path=str(db_path), pattern="*.tar.gz", incremental=True)
+    assert hashed == []
+
+    con = duckdb.connect(str(db_path))
+    recorded = con.execute("SELECT sha256 FROM ingest_manifest").fetchone()[0]
+    con.close()
+    assert recorded == hash_range(tmp_path / "wx.tar.gz", 0, (tmp_path / "wx.tar.gz").stat().st_size).hexdigest()
+
+    # only a touched archive of the same size is hashed up front, and then skipped
+    stat = (tmp_path / "wx.tar.gz").stat()
+    os.utime(tmp_path / "wx.tar.gz", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert ingest(raw_dir=str(tmp_path), db_path=str(db_path), pattern="*.tar.gz", incremental=True) == []
+    assert len(hashed) == 1
+
+
+def test_manifest_stamps_are_utc_aware(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    pd.DataFrame({"x": [1]}).to_csv(raw / "aurn.csv", index=False)
+    db_path = tmp_path / "test.db"
+    # a manifest from before ingested_at carried a time zone, holding naive UTC
+    con = duckdb.connect(str(db_path))
+    con.execute(
+        "CREATE TABLE ingest_manifest (source VARCHAR PRIMARY KEY, table_name VARCHAR, size BIGINT, "
+        "mtime_ns BIGINT, sha256 VARCHAR, row_count BIGINT, ingested_at TIMESTAMP)"
+    )
+    con.execute("INSERT INTO ingest_manifest VALUES ('old.csv', 'old', 0, 0, '', 0, TIMESTAMP '2025-01-01 12:00')")
+    con.close()
+
+    ingest(raw_dir=str(raw), db_path=str(db_path))
+
+    con = duckdb.connect(str(db_path), read_only=True)
+    con.execute("SET TimeZone = 'UTC'")
+    stamps = dict(con.execute("SELECT table_name, ingested_at::VARCHAR FROM ingest_manifest").fetchall())
+    recent = con.execute(
+        "SELECT ingested_at > now() - INTERVAL 5 MINUTE FROM ingest_manifest WHERE table_name = 'aurn'"
+    ).fetchone()[0]
+    con.close()
+    assert stamps["old"] == "2025-01-01 12:00:00+00"
+    assert recent
@@ -0,0 +1,45 @@
+# prototype/tests/test_loader.py
+import io
+import pandas as pd
+import pytest
+from app.loader import load_and_clean
+
+UKAIR = """Hourly measurement data supplied by UK-air on 19/05/2025;;;;;
+All Data GMT hour ending;;;;;
+Date;Time;Nitrogen dioxide;Status;PM2.5 particulate matter (Hourly measured);Status
+02-01-2025;01:00;12,5;V ug/m3;No data;
+01-01-2025;23:00;10;V ug/m3;4,25;V ug/m3
+01-01-2025;24:00;11;V ug/m3;5;V ug/m3
+02-01-2025;02:00;No data;;No data;
+"""
+
+
+def test_loader_parses_preamble_decimal_commas_and_missing_values(tmp_path):
+    path = tmp_path / "ukair.csv"
+    path.write_text(UKAIR)
+    df = load_and_clean(str(path))
+    assert list(df.columns) == ["Datetime", "Nitrogen dioxide", "PM2.5"]
+    # "24:00" does not parse and the all-missing row is dropped; rows come out sorted
+    assert df["Datetime"].tolist() == [pd.Timestamp("2025-01-01 23:00"), pd.Timestamp("2025-01-02 01:00")]
+    assert df["Nitrogen dioxide"].tolist() == [10.0, 12.5]
+    assert df["PM2.5"].iloc[0] == 4.25 and pd.isna(df["PM2.5"].iloc[1])
+
+
+def test_loader_counts_malformed_rows(tmp_path, caplog):
+    path = tmp_path / "ukair.csv"
+    path.write_text(UKAIR + "03-01-2025;01:00;7\n03-01-2025;02:00;8;V ug/m3;1;V ug/m3;extra\n")
+    with caplog.at_level("WARNING", logger="app.loader"):
+        df = load_and_clean(str(path))
+    assert df.attrs["skipped_rows"] == 2
+    assert len(df) == 2
+    assert "Skipped 2 malformed row(s)" in caplog.text
+
+    path.write_text(UKAIR)
+    assert load_and_clean(str(path)).attrs["skipped_rows"] == 0
+
+
+def test_loader_reads_uploaded_files_and_rejects_headerless_ones():
+    upload = io.BytesIO(UKAIR.encode())
+    assert len(load_and_clean(upload)) == 2
+    with pytest.raises(ValueError, match="Date"):
+        load_and_clean(io.BytesIO(b"a,b\n1,2\n"))
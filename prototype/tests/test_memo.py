@@ -0,0 +1,53 @@
+# prototype/tests/test_memo.py
+import numpy as np
+import pandas as pd
+from app import analytics, memo
+
+
+def test_cached_keys_on_version_and_params_not_data():
+    calls = []
+
+    def summarise(df, column):
+        calls.append(column)
+        return df[column].sum()
+
+    cached = memo.cached(summarise, maxsize=2, name="test.summarise")
+    df = pd.DataFrame({"a": [1, 2], "b": [3, 4]})
+    v1 = memo.version("data.csv", 1)
+    assert cached(v1, df, "a") == 3
+    assert cached(v1, df.copy(), "a") == 3          # same version: the frame is not looked at
+    assert cached(v1, df, "b") == 7
+    assert cached(memo.version("data.csv", 2), df, "a") == 3  # new version: recomputed, LRU drops (v1, "a")
+    assert cached(v1, df, "a") == 3
+    assert calls == ["a", "b", "a", "a"]
+    assert memo.stats()["test.summarise"] == {
+        "hits": 1, "misses": 4, "evictions": 2, "size": 2, "maxsize": 2, "ttl": None,
+    }
+    # wrapping again (as every Streamlit rerun does) finds the same cache
+    assert memo.cached(summarise, maxsize=2, name="test.summarise").cache is cached.cache
+
+
+def test_cache_entries_expire_after_ttl():
+    now = [0.0]
+    cache = memo.Cache(maxsize=8, ttl=10, clock=lambda: now[0])
+    cache.put("k", 1)
+    now[0] = 5
+    assert cache.get("k") == (True, 1)
+    now[0] = 16
+    assert cache.get("k") == (False, None)
+    assert cache.info()["evictions"] == 1
+
+
+def test_harmonic_forecast_extends_trend_and_daily_cycle():
+    stamps = pd.date_range("2025-01-01", periods=24 * 28, freq="h")
+    df = pd.DataFrame({"Datetime": stamps, "no2": 20 + 6 * np.sin(2 * np.pi * stamps.hour / 24)})
+    history, future, info = analytics.harmonic_forecast(df, "no2", 6, "h")
+    assert len(history) == len(df) and info["n_obs"] == len(df)
+    assert future["Datetime"].tolist() == list(pd.date_range(stamps[-1], periods=7, freq="h")[1:])
+    ahead = future["Datetime"].dt.hour
+    np.testing.assert_allclose(future["no2"], 20 + 6 * np.sin(2 * np.pi * ahead / 24), atol=1e-3)
+    assert (future["lower"] <= future["no2"]).all() and (future["no2"] <= future["upper"]).all()
+    # daily means keep only the trend and weekly terms
+    daily = df.set_index("Datetime").resample("D").mean().reset_index()
+    assert analytics.harmonic_forecast(daily, "no2", 3, "D")[1]["no2"].round(3).tolist() == [20.0] * 3
+    assert analytics.harmonic_forecast(df.iloc[:1], "no2", 3, "h") is None
@@ -0,0 +1,172 @@
+# prototype/tests/test_pipeline.py
+import subprocess
+import sys
+import threading
+import duckdb
+import pandas as pd
+import pytest
+from prototype.pipeline.dag import Stage, run_dag, topological_order
+from prototype.pipeline.instrument import Meter, _proc_status_kb, reset_peak_rss
+from prototype.pipeline.stages import pipeline_stages
+from prototype.pipeline.watch import LIVE_STAGES, connect_when_free, read_version, refresh, watch
+
+STAGES = ("ingest", "clean", "export", "rollup", "anomalies", "forecast")
+
+
+def test_pipeline_skips_stages_with_unchanged_inputs(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    stamps = pd.date_range("2025-01-01", periods=5, freq="h")
+    pd.DataFrame({"datetime": stamps, "no2": [1.0, None, 3.0, 4.0, 5.0]}).to_csv(raw / "site_a.csv", index=False)
+    db = tmp_path / "test.db"
+    stages = pipeline_stages(str(raw), str(db), export_dir=tmp_path / "parquet")
+
+    con = duckdb.connect(str(db))
+    assert run_dag(con, stages) == dict.fromkeys(STAGES, "ran")
+    assert run_dag(con, stages) == dict.fromkeys(STAGES, "skipped")
+    assert con.execute("SELECT no2 FROM clean_site_a ORDER BY datetime").fetchall()[1] == (2.0,)
+
+    # a changed input file reruns everything downstream of it
+    pd.DataFrame({"datetime": stamps, "no2": 1.0}).to_csv(raw / "site_a.csv", index=False)
+    assert run_dag(con, stages) == dict.fromkeys(STAGES, "ran")
+    con.close()
+    assert (tmp_path / "parquet" / "clean_site_a" / "station=site_a" / "year=2025").is_dir()
+
+
+def test_independent_stages_run_concurrently(tmp_path):
+    both_running = threading.Barrier(2, timeout=10)
+    ran = []
+    stages = [
+        Stage("a", lambda con: ran.append("a")),
+        Stage("b", lambda con: both_running.wait(), deps=("a",)),
+        Stage("c", lambda con: both_running.wait(), deps=("a",)),
+        Stage("d", lambda con: ran.append("d"), deps=("b", "c")),
+    ]
+    con = duckdb.connect(str(tmp_path / "test.db"))
+    assert run_dag(con, stages) == {"a": "ran", "b": "ran", "c": "ran", "d": "ran"}
+    assert ran == ["a", "d"]
+
+
+def test_failed_stage_stops_its_dependents(tmp_path):
+    def fail(con):
+        raise RuntimeError("boom")
+
+    ran = []
+    stages = [Stage("a", fail), Stage("b", lambda con: ran.append("b"), deps=("a",))]
+    con = duckdb.connect(str(tmp_path / "test.db"))
+    with pytest.raises(RuntimeError, match="boom"):
+        run_dag(con, stages)
+    assert ran == []
+    # nothing cached, so the next run retries the stage
+    assert con.execute("SELECT count(*) FROM pipeline_stage_cache").fetchone() == (0,)
+
+
+def test_dependency_cycles_are_rejected():
+    stages = [Stage("a", print, deps=("b",)), Stage("b", print, deps=("a",))]
+    with pytest.raises(ValueError, match="cycle"):
+        topological_order(stages)
+
+
+def test_runs_record_stage_and_table_metrics(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for site in ("site_a", "site_b"):
+        pd.DataFrame({"datetime": pd.date_range("2025-01-01", periods=4, freq="h"), "no2": 1.0}).to_csv(
+            raw / f"{site}.csv", index=False
+        )
+    db = tmp_path / "test.db"
+    stages = pipeline_stages(str(raw), str(db), export_dir=tmp_path / "parquet")
+    con = duckdb.connect(str(db))
+    run_dag(con, stages, options={"gap_hours": 2}, profile=["clean"], profile_dir=tmp_path / "profiles")
+    run_dag(con, stages)
+
+    runs = con.execute("SELECT status, wall_seconds > 0, peak_rss_bytes > 0 FROM pipeline_runs ORDER BY started_at")
+    # nothing ran the second time, so no memory was measured
+    assert runs.fetchall() == [("succeeded", True, True), ("succeeded", True, None)]
+    rows = con.execute(
+        """
+        SELECT stage, table_name, status, rows_in, rows_out, wall_seconds > 0, cpu_seconds >= 0, peak_rss_bytes > 0
+        FROM pipeline_stage_metrics
+        WHERE run_id = (SELECT run_id FROM pipeline_runs ORDER BY started_at LIMIT 1)
+        ORDER BY stage, table_name NULLS FIRST
+        """
+    ).fetchall()
+    assert rows == [
+        ("anomalies", None, "ran", 8, 0, True, True, True),
+        ("anomalies", "clean_site_a", "ran", 4, 0, True, True, True),
+        ("anomalies", "clean_site_b", "ran", 4, 0, True, True, True),
+        ("clean", None, "ran", 8, 8, True, True, True),
+        ("clean", "site_a", "ran", 4, 4, True, True, True),
+        ("clean", "site_b", "ran", 4, 4, True, True, True),
+        ("export", None, "ran", 8, 8, True, True, True),
+        ("export", "clean_site_a", "ran", 4, 4, True, True, True),
+        ("export", "clean_site_b", "ran", 4, 4, True, True, True),
+        ("forecast", None, "ran", 8, 0, True, True, True),
+        ("forecast", "clean_site_a", "ran", 4, 0, True, True, True),
+        ("forecast", "clean_site_b", "ran", 4, 0, True, True, True),
+        ("ingest", None, "ran", 8, 8, True, True, True),
+        ("ingest", "site_a", "ran", 4, 4, True, None, None),
+        ("ingest", "site_b", "ran", 4, 4, True, None, None),
+        ("rollup", None, "ran", 8, 8, True, True, True),
+        ("rollup", "clean_site_a", "ran", 4, 4, True, True, True),
+        ("rollup", "clean_site_b", "ran", 4, 4, True, True, True),
+    ]
+    # the second run skipped every stage and says so
+    assert con.execute(
+        "SELECT DISTINCT status FROM pipeline_stage_metrics "
+        "WHERE run_id = (SELECT run_id FROM pipeline_runs ORDER BY started_at DESC LIMIT 1)"
+    ).fetchall() == [("skipped",)]
+    assert (tmp_path / "profiles" / "clean.prof").stat().st_size > 0
+
+
+@pytest.mark.skipif(not reset_peak_rss(), reason="peak RSS cannot be reset on this platform")
+def test_nested_meters_keep_the_outer_peak():
+    with Meter() as outer:
+        before = _proc_status_kb("VmRSS") * 1024
+        block = b"x" * (100 << 20)
+        del block
+        with Meter() as inner:
+            pass
+    assert outer.peak_rss_bytes >= before + (90 << 20)
+    assert inner.peak_rss_bytes <= outer.peak_rss_bytes
+
+
+def test_watch_refreshes_only_when_raw_files_change(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    stamps = pd.date_range("2025-01-01", periods=5, freq="h")
+    pd.DataFrame({"datetime": stamps, "no2": 1.0}).to_csv(raw / "site_a.csv", index=False)
+    db = tmp_path / "test.db"
+
+    watch(raw, db, cycles=2, sleep=lambda seconds: None)
+    assert read_version(db)["version"] == 1
+    assert refresh(raw, db) == dict.fromkeys(LIVE_STAGES, "skipped")
+    assert read_version(db)["version"] == 1
+
+    # new readings appended to a raw file reach the clean and latest tables
+    more = pd.date_range("2025-01-01 05:00", periods=3, freq="h")
+    pd.DataFrame({"datetime": more, "no2": 2.0}).to_csv(raw / "site_a.csv", mode="a", header=False, index=False)
+    assert refresh(raw, db) == dict.fromkeys(LIVE_STAGES, "ran")
+    assert read_version(db)["version"] == 2
+    con = duckdb.connect(str(db), read_only=True)
+    assert con.execute("SELECT count(*) FROM clean_site_a").fetchone() == (8,)
+    assert con.execute("SELECT value FROM latest_readings WHERE pollutant = 'no2'").fetchone() == (2.0,)
+    con.close()
+
+
+def test_connect_waits_for_another_process_to_release_the_lock(tmp_path):
+    db = tmp_path / "test.db"
+    duckdb.connect(str(db)).close()
+    holder = subprocess.Popen(
+        [sys.executable, "-c",
+         f"import duckdb, sys, time; con = duckdb.connect({str(db)!r}, read_only=True); "
+         "print('locked', flush=True); time.sleep(1)"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    assert holder.stdout.readline().strip() == "locked"
+    with pytest.raises(duckdb.IOException):
+        connect_when_free(db, timeout=0)
+    con = connect_when_free(db, timeout=30)
+    con.execute("CREATE TABLE t (x INTEGER)")
+    con.close()
+    holder.wait()
@@ -0,0 +1,84 @@
+# prototype/tests/test_reports.py
+import pandas as pd
+import pytest
+from prototype.ingestion.ingest import ingest
+from prototype.cleaning.clean import clean
+from prototype.export.parquet import export
+from reports import report_generator as reports
+
+
+@pytest.fixture
+def pipeline_db(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    stamps = pd.date_range("2025-01-06", periods=24 * 10, freq="h")
+    pd.DataFrame({"datetime": stamps, "no2": range(240), "pm25": 1.0}).to_csv(raw / "site_a.csv", index=False)
+    pd.DataFrame({"datetime": stamps, "no2": 100.0}).to_csv(raw / "site_b.csv", index=False)
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db), layout="observations")
+    clean(db_path=str(db), max_gap_hours=2)
+    export(str(db), tmp_path / "parquet")
+    return db
+
+
+def test_plan_splits_each_station_and_pollutant_into_periods():
+    charts = reports.plan(["a", "b"], ["no2"], "2025-01-08", "2025-01-20")
+    assert [(c.station, c.start, c.end) for c in charts] == [
+        ("a", pd.Timestamp("2025-01-08"), pd.Timestamp("2025-01-13")),
+        ("b", pd.Timestamp("2025-01-08"), pd.Timestamp("2025-01-13")),
+        ("a", pd.Timestamp("2025-01-13"), pd.Timestamp("2025-01-20")),
+        ("b", pd.Timestamp("2025-01-13"), pd.Timestamp("2025-01-20")),
+    ]
+    assert charts[0].title == "a: NO₂, 08 Jan – 12 Jan 2025"
+
+
+def test_database_and_parquet_give_the_same_slices(pipeline_db, tmp_path):
+    args = (["site_a", "site_b"], ["no2", "pm25"], "2025-01-07", "2025-01-09")
+    from_db = reports._from_db(pipeline_db, *args)
+    from_parquet = reports._from_parquet(tmp_path / "parquet" / "clean_observations", *args)
+    assert sorted(from_db) == sorted(from_parquet) == ["site_a", "site_b"]
+    for station, frame in from_db.items():
+        assert list(frame.columns) == ["datetime", "no2", "pm25"] and len(frame) == 48
+        pd.testing.assert_frame_equal(frame.reset_index(drop=True), from_parquet[station].reset_index(drop=True),
+                                      check_dtype=False)
+    assert from_db["site_b"]["pm25"].isna().all()
+
+
+def test_unchanged_slices_reuse_their_charts(pipeline_db, tmp_path):
+    frames = reports._from_db(pipeline_db, ["site_a", "site_b"], ["no2", "pm25"], "2025-01-06", "2025-01-16")
+    charts = reports.plan(["site_a", "site_b"], ["no2", "pm25"], "2025-01-06", "2025-01-20")
+    chart = charts[0]
+    rows = frames["site_a"][["datetime", "no2"]]
+    assert reports.chart_hash(chart, rows) == reports.chart_hash(chart, rows.copy())
+    assert reports.chart_hash(chart, rows) != reports.chart_hash(chart, rows.assign(no2=rows["no2"] + 1))
+    assert reports.chart_hash(chart, rows) != reports.chart_hash(chart, rows, full_resolution=True)
+
+    # every chart with data is already drawn: render() reuses the files as they are
+    expected = {}
+    for c in charts:
+        sliced = frames[c.station]
+        sliced = sliced.loc[(sliced["datetime"] >= c.start) & (sliced["datetime"] < c.end), ["datetime", c.pollutant]]
+        if not sliced.dropna().empty:
+            expected[c] = tmp_path / "charts" / f"{reports.chart_hash(c, sliced.dropna())}.png"
+            expected[c].parent.mkdir(exist_ok=True)
+            expected[c].write_bytes(b"cached")
+    images = reports.render(frames, charts, tmp_path / "charts")
+    assert images == expected
+    # site_b measures no pm25, so it has no pm25 charts
+    assert sorted((c.station, c.pollutant, c.start.day) for c in images) == [
+        ("site_a", "no2", 6), ("site_a", "no2", 13), ("site_a", "pm25", 6), ("site_a", "pm25", 13),
+        ("site_b", "no2", 6), ("site_b", "no2", 13),
+    ]
+    assert all(path.read_bytes() == b"cached" for path in images.values())
+
+
+def test_decks_have_a_slide_per_chart(tmp_path):
+    pptx = pytest.importorskip("pptx")
+    from PIL import Image
+
+    charts = reports.plan(["a", "b"], ["no2"], "2025-01-06", "2025-01-20")
+    image = tmp_path / "chart.png"
+    Image.new("RGB", (10, 4)).save(image)
+    decks = reports.assemble({c: image for c in charts[:3]}, "2025-01-06", "2025-01-27", deck_dir=tmp_path)
+    assert [d.name for d in decks] == ["air_quality_2025-01-06.pptx", "air_quality_2025-01-13.pptx"]
+    assert [len(pptx.Presentation(d).slides) for d in decks] == [2, 1]
@@ -0,0 +1,77 @@
+# prototype/tests/test_rollup.py
+import duckdb
+import pandas as pd
+import pytest
+from prototype.ingestion.ingest import ingest
+from prototype.cleaning.clean import clean
+from prototype.rollup.rollup import ROLLUP_TABLES, rollup
+from prototype.tests.test_clean import _gappy_frame
+
+
+def _rollups(db):
+    con = duckdb.connect(str(db), read_only=True)
+    out = {t: con.execute(f"SELECT * FROM {t} ORDER BY ALL").df() for t in ROLLUP_TABLES}
+    con.close()
+    return out
+
+
+def test_rollup_aggregates_each_grain(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    stamps = pd.date_range("2025-01-31", periods=48, freq="h")
+    pd.DataFrame({"datetime": stamps, "no2": range(48)}).to_csv(raw / "site_a.csv", index=False)
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db))
+    clean(db_path=str(db), max_gap_hours=2)
+    report = rollup(str(db))
+    assert [(r["table"], r["rows_in"], r["rows_out"]) for r in report] == [("clean_site_a", 48, 48)]
+
+    con = duckdb.connect(str(db), read_only=True)
+    assert con.execute(
+        "SELECT station, pollutant, period, mean, min, max, count FROM rollup_monthly ORDER BY period"
+    ).fetchall() == [
+        ("site_a", "no2", pd.Timestamp("2025-01-01"), 11.5, 0.0, 23.0, 24),
+        ("site_a", "no2", pd.Timestamp("2025-02-01"), 35.5, 24.0, 47.0, 24),
+    ]
+    # 2025-01-31 is a Friday (ISO weekday 5)
+    assert con.execute(
+        "SELECT year, weekday, count(*), sum(count) FROM rollup_weekday_hour GROUP BY ALL ORDER BY ALL"
+    ).fetchall() == [(2025, 5, 24, 24), (2025, 6, 24, 24)]
+
+
+@pytest.mark.parametrize("layout,missed", [("tables", False), ("observations", False), ("tables", True)])
+def test_incremental_rollup_matches_full_rebuild(tmp_path, layout, missed):
+    frames = {"site_a": _gappy_frame(30, n=1200), "site_b": _gappy_frame(31, n=1200)}
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    db = tmp_path / "incremental.db"
+    for site, frame in frames.items():
+        frame.iloc[:700].to_csv(raw / f"{site}.csv", index=False)
+    ingest(raw_dir=str(raw), db_path=str(db), layout=layout, incremental=True)
+    clean(db_path=str(db), max_gap_hours=2, incremental=True)
+    rollup(str(db))
+
+    if missed:
+        # a clean run the rollup never saw: the next rollup resumes from where it restarted
+        for site, frame in frames.items():
+            frame.iloc[:950].to_csv(raw / f"{site}.csv", index=False)
+        ingest(raw_dir=str(raw), db_path=str(db), layout=layout, incremental=True)
+        clean(db_path=str(db), max_gap_hours=2, incremental=True)
+
+    for site, frame in frames.items():
+        frame.to_csv(raw / f"{site}.csv", index=False)
+    ingest(raw_dir=str(raw), db_path=str(db), layout=layout, incremental=True)
+    clean(db_path=str(db), max_gap_hours=2, incremental=True)
+    report = rollup(str(db))
+    # only the appended tail was aggregated again
+    assert sum(r["rows_in"] for r in report) < sum(len(f) for f in frames.values()) / 2
+    assert rollup(str(db)) == []
+
+    full = tmp_path / "full.db"
+    ingest(raw_dir=str(raw), db_path=str(full), layout=layout)
+    clean(db_path=str(full), max_gap_hours=2)
+    rollup(str(full))
+
+    actual, expected = _rollups(db), _rollups(full)
+    for table in ROLLUP_TABLES:
+        pd.testing.assert_frame_equal(actual[table], expected[table], check_exact=False)
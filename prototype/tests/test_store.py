@@ -0,0 +1,99 @@
+# prototype/tests/test_store.py
+import duckdb
+import pandas as pd
+import pytest
+from prototype.ingestion.ingest import ingest
+from prototype.cleaning.clean import clean
+from prototype.rollup.rollup import rollup
+from prototype.forecast.forecast import forecast
+from app import store
+
+
+@pytest.fixture(params=["tables", "observations"])
+def pipeline_db(tmp_path, request):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    stamps = pd.date_range("2025-01-01", periods=48, freq="h")
+    pd.DataFrame({"datetime": stamps, "no2": range(48), "pm25": 1.0}).to_csv(raw / "site_a.csv", index=False)
+    pd.DataFrame({"datetime": stamps, "no2": 100.0}).to_csv(raw / "site_b.csv", index=False)
+    db = tmp_path / "test.db"
+    ingest(raw_dir=str(raw), db_path=str(db), layout=request.param)
+    clean(db_path=str(db), max_gap_hours=2)
+    rollup(str(db))
+    forecast(str(db), horizon=3)
+    return db
+
+
+def test_sources_and_bounds(pipeline_db):
+    con = store.connect(pipeline_db)
+    found = store.sources(con)
+    assert sorted(found) == ["site_a", "site_b"]
+    assert store.pollutants(found, ["site_a", "site_b"]) == ["Nitrogen dioxide", "PM2.5"]
+    assert store.date_bounds(con, found, ["site_a"]) == (pd.Timestamp("2025-01-01"), pd.Timestamp("2025-01-02 23:00"))
+
+
+def test_connected_runs_on_its_own_connection(pipeline_db):
+    used = []
+    present = store.connected(lambda con: used.append(con) or store.tables_present(con))(pipeline_db)
+    assert present == {"rollups": True, "latest": True, "forecasts": True}
+    with pytest.raises(duckdb.ConnectionException):
+        used[0].execute("SELECT 1")
+
+
+def test_query_reads_only_the_selection(pipeline_db):
+    con = store.connect(pipeline_db)
+    found = store.sources(con)
+    start, end = pd.Timestamp("2025-01-02"), pd.Timestamp("2025-01-02 03:00")
+
+    df = store.query(con, found, ["site_a"], ["Nitrogen dioxide"], start, end)
+    assert list(df.columns) == ["Datetime", "Nitrogen dioxide"]
+    assert df["Datetime"].tolist() == list(pd.date_range(start, periods=3, freq="h"))
+    assert df["Nitrogen dioxide"].tolist() == [24.0, 25.0, 26.0]
+
+    # several stations are averaged per hour, or kept apart by_station
+    both = store.query(con, found, ["site_a", "site_b"], ["Nitrogen dioxide", "PM2.5"], start, end)
+    assert both["Nitrogen dioxide"].tolist() == [62.0, 62.5, 63.0]
+    assert both["PM2.5"].tolist() == [1.0, 1.0, 1.0]
+    apart = store.query(con, found, ["site_a", "site_b"], ["PM2.5"], start, end, by_station=True)
+    assert apart["station"].tolist() == ["site_a", "site_b"] * 3
+    assert apart["PM2.5"].isna().tolist() == [False, True] * 3
+
+
+def test_aggregates_come_from_rollups(pipeline_db):
+    con = store.connect(pipeline_db)
+    assert store.has_rollups(con)
+    daily = store.query_rollup(con, ["site_a", "site_b"], ["Nitrogen dioxide", "PM2.5"], "daily")
+    assert daily["Datetime"].tolist() == [pd.Timestamp("2025-01-01"), pd.Timestamp("2025-01-02")]
+    # site_a's hours 0..23 average 11.5, site_b is 100 throughout
+    assert daily["Nitrogen dioxide"].tolist() == [(11.5 + 100) / 2, (35.5 + 100) / 2]
+    assert daily["PM2.5"].tolist() == [1.0, 1.0]
+
+    heat = store.climatology(con, ["site_a"], "Nitrogen dioxide", "weekday_hour")
+    assert heat.loc[(heat["weekday"] == "Wednesday") & (heat["hour"] == 5), "Nitrogen dioxide"].item() == 5.0
+
+    start = pd.Timestamp("2025-01-01")
+    assert store.rollup_grain("hourly", start, start + pd.Timedelta(days=30)) == "hourly"
+    assert store.rollup_grain("hourly", start, start + pd.Timedelta(days=3650)) == "daily"
+
+
+def test_forecasts_are_read_as_stored(pipeline_db):
+    con = store.connect(pipeline_db)
+    assert store.has_forecasts(con)
+    df, models = store.forecasts(con, ["site_a", "site_b"], "Nitrogen dioxide")
+    assert df["Datetime"].tolist() == list(pd.date_range("2025-01-03", periods=3, freq="h"))
+    # site_a's ramp continues 48, 49, 50 (roughly: two days barely separate the trend from the weekly terms);
+    # site_b stays at 100
+    assert df["Nitrogen dioxide"].tolist() == pytest.approx([74.0, 74.5, 75.0], abs=0.5)
+    assert (df["lower"] <= df["Nitrogen dioxide"]).all() and (df["Nitrogen dioxide"] <= df["upper"]).all()
+    assert models["station"].tolist() == ["site_a", "site_b"] and models["n_obs"].tolist() == [48, 48]
+
+
+def test_latest_readings_per_station(pipeline_db):
+    con = store.connect(pipeline_db)
+    assert store.has_latest(con)
+    latest = store.latest_readings(con, ["site_a", "site_b"])
+    assert latest["station"].tolist() == ["site_a", "site_b"]
+    assert latest["Datetime"].tolist() == [pd.Timestamp("2025-01-02 23:00")] * 2
+    assert latest["Nitrogen dioxide"].tolist() == [47.0, 100.0]
+    assert latest.loc[0, "PM2.5"] == 1.0
+    assert store.latest_readings(con, ["site_b"])["station"].tolist() == ["site_b"]
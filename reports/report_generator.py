@@ -1,32 +1,305 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from pptx import Presentation
-from pptx.util import Inches
+"""
+Air-quality chart decks.
+
+Single mode draws the NO₂ series of one CSV (or exported Parquet dataset)
+into one slide, as it always has. Batch mode builds one deck per period
+(weekly by default) with a slide per station × pollutant:
+
+- each station's rows are read once for the whole date range, only the
+  requested pollutant columns, from the pipeline's DuckDB or an exported
+  Parquet dataset;
+- charts are drawn on object-oriented Figures with the Agg canvas (no
+  pyplot state) in a process pool, long series cut to their min/max
+  envelope per pixel column first (app.decimate.envelope), so drawing
+  time and PNG size no longer grow with the data;
+- a chart's file is named after the hash of its title and data, so a
+  chart whose slice did not change since the last run is reused, not drawn
+  again;
+- the decks are assembled from the chart files once all are rendered.
+
+matplotlib and python-pptx are imported where charts are drawn and decks
+written, so reading and slicing the data needs neither.
+"""
+import hashlib
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import click
+import pandas as pd
+import pyarrow.dataset as ds
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app import store  # noqa: E402
+from app.decimate import envelope  # noqa: E402
+from prototype.export.parquet import dataset, read_clean  # noqa: E402
+from prototype.periods import windows  # noqa: E402
 
 # Usage: python reports/report_generator.py data/filtered_air_quality.csv
+#    or: python reports/report_generator.py data/clean/parquet/clean_observations
+# Batch: python reports/report_generator.py --start 2025-01-06 --end 2025-02-03 [--station MY1 ...]
+#        [--pollutant no2 ...] [--period W-MON] [--parquet data/clean/parquet/clean_observations]
+# Add --full-resolution to plot every point instead of the per-pixel min/max envelope.
 
-CSV_FILE = sys.argv[1] if len(sys.argv) > 1 else "data/filtered_air_quality.csv"
+CSV_FILE = "data/filtered_air_quality.csv"
 IMG_FILE = "reports/chart.png"
 PPTX_FILE = "reports/air_quality_report.pptx"
 
-# Load data
-df = pd.read_csv(CSV_FILE, parse_dates=["datetime"])
-
-# Create a chart (NO2 over time)
-plt.figure(figsize=(10,4))
-plt.plot(df["datetime"], df["no2"], label="NO₂")
-plt.xlabel("Datetime")
-plt.ylabel("NO₂ (µg/m³)")
-plt.title("NO₂ Time Series")
-plt.tight_layout()
-plt.savefig(IMG_FILE)
-plt.close()
-
-# Create PPTX
-prs = Presentation()
-slide = prs.slides.add_slide(prs.slide_layouts[5])
-slide.shapes.add_picture(IMG_FILE, Inches(1), Inches(1), width=Inches(8), height=Inches(4))
-prs.save(PPTX_FILE)
-
-print(f"Report created: {PPTX_FILE}")
+CHART_DIR = Path("reports") / "charts"
+DECK_DIR = Path("reports") / "decks"
+PERIOD = "W-MON"  # weeks starting on Monday
+FIGSIZE = (10, 4)
+STYLE = "2"       # bump when the chart drawing changes, so cached charts are redrawn
+
+UNITS = "µg/m³"
+LABELS = {"no2": "NO₂", "pm10": "PM10", "pm25": "PM2.5"}
+
+
+@dataclass(frozen=True)
+class Chart:
+    """One slide: a station's pollutant over [start, end)."""
+    station: str
+    pollutant: str
+    start: pd.Timestamp
+    end: pd.Timestamp
+
+    @property
+    def title(self) -> str:
+        last = self.end - pd.Timedelta(days=1)
+        return f"{self.station}: {LABELS.get(self.pollutant, self.pollutant)}, {self.start:%d %b} – {last:%d %b %Y}"
+
+
+def draw(path, title: str, ylabel: str, times, values, full_resolution: bool = False):
+    """
+    Save a line chart of values over times to path, written aside and
+    renamed into place. Unless full_resolution, a series longer than the
+    figure is wide in pixels is drawn as its min/max envelope per pixel
+    column, which looks the same and keeps every peak.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZE)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if not full_resolution:
+        # the figure's width in pixels: at least one column per pixel the axes get after tight_layout
+        times, values = envelope(times, values, int(fig.get_figwidth() * fig.dpi))
+    ax.plot(times, values)
+    ax.set_xlabel("Datetime")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.tight_layout()
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp.png")
+    fig.savefig(tmp)
+    os.replace(tmp, path)
+    return str(path)
+
+
+def _draw(job):
+    return draw(*job)
+
+
+def chart_hash(chart: Chart, frame: pd.DataFrame, full_resolution: bool = False) -> str:
+    """SHA-256 of what a chart shows: its title and style, and its slice's timestamps and values."""
+    digest = hashlib.sha256(f"{STYLE}|{full_resolution}|{chart.title}".encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def plan(stations, pollutants, start, end, period: str = PERIOD) -> list:
+    """One Chart per station × pollutant × period of [start, end), split at the period's boundaries."""
+    return [
+        Chart(station, pollutant, lo, hi)
+        for lo, hi in windows(start, end, period)
+        for station in stations
+        for pollutant in pollutants
+    ]
+
+
+def _from_db(db_path, stations, pollutants, start, end) -> dict:
+    """{station: frame of datetime + pollutant columns} read from the pipeline database."""
+    con = store.connect(db_path)
+    try:
+        found = store.sources(con)
+        names = {store.POLLUTANT_COLUMNS[p]: p for p in pollutants}
+        frames = {}
+        for station in stations:
+            if station not in found:
+                continue
+            df = store.query(con, found, [station], list(names), start, end)
+            frames[station] = df.rename(columns={"Datetime": "datetime", **names})
+        return frames
+    finally:
+        con.close()
+
+
+def _from_parquet(path, stations, pollutants, start, end) -> dict:
+    """{station: frame of datetime + pollutant columns} read from an exported Parquet dataset."""
+    present = [p for p in pollutants if p in dataset(path).schema.names]
+    table = read_clean(path, columns=["station", "datetime"] + present, stations=stations, start=start, end=end)
+    df = table.to_pandas().reindex(columns=["station", "datetime"] + list(pollutants)).sort_values("datetime")
+    return {str(s): g.drop(columns="station") for s, g in df.groupby("station", observed=True)}
+
+
+def _parquet_stations(path) -> list:
+    """Station partition values of a Parquet dataset, from its directory names only."""
+    return sorted({
+        ds.get_partition_keys(f.partition_expression)["station"] for f in dataset(path).get_fragments()
+    })
+
+
+def batch(start, end, stations=None, pollutants=None, period: str = PERIOD, db_path=store.DEFAULT_DB,
+          parquet=None, chart_dir=CHART_DIR, deck_dir=DECK_DIR, workers: int = None,
+          full_resolution: bool = False) -> list:
+    """
+    Build one PPTX deck per period of [start, end) in deck_dir, with a
+    slide per station × pollutant that has data in it. Reads from parquet
+    (an exported dataset) when given, else from db_path; stations and
+    pollutants default to all of them. Charts are drawn by render(), as
+    envelopes unless full_resolution, and put in decks by assemble().
+    Returns the deck paths.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    pollutants = list(pollutants or store.POLLUTANT_COLUMNS)
+    if stations is None:
+        if parquet is not None:
+            stations = _parquet_stations(parquet)
+        else:
+            con = store.connect(db_path)
+            try:
+                stations = sorted(store.sources(con))
+            finally:
+                con.close()
+    frames = (_from_parquet(parquet, stations, pollutants, start, end) if parquet is not None
+              else _from_db(db_path, stations, pollutants, start, end))
+    images = render(frames, plan(stations, pollutants, start, end, period), chart_dir, workers, full_resolution)
+    return assemble(images, start, end, period, deck_dir)
+
+
+def render(frames: dict, charts: list, chart_dir=CHART_DIR, workers: int = None,
+           full_resolution: bool = False) -> dict:
+    """
+    {Chart: PNG path} for every chart whose station and pollutant have
+    data in its period, taken from frames ({station: frame}). PNGs already
+    in chart_dir under the slice's chart_hash are reused; the others are
+    drawn in `workers` processes.
+    """
+    chart_dir = Path(chart_dir)
+    chart_dir.mkdir(parents=True, exist_ok=True)
+    images, jobs = {}, []
+    for chart in charts:
+        df = frames.get(chart.station)
+        if df is None:
+            continue
+        rows = df.loc[(df["datetime"] >= chart.start) & (df["datetime"] < chart.end), ["datetime", chart.pollutant]]
+        rows = rows.dropna()
+        if rows.empty:
+            continue
+        path = chart_dir / f"{chart_hash(chart, rows, full_resolution)}.png"
+        images[chart] = path
+        if not path.exists():
+            ylabel = f"{LABELS.get(chart.pollutant, chart.pollutant)} ({UNITS})"
+            jobs.append((path, chart.title, ylabel, rows["datetime"].to_numpy(), rows[chart.pollutant].to_numpy(),
+                         full_resolution))
+    print(f"Drawing {len(jobs)} charts, reusing {len(images) - len(jobs)}")
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_draw, jobs))
+    return images
+
+
+def assemble(images: dict, start, end, period: str = PERIOD, deck_dir=DECK_DIR) -> list:
+    """One deck per period of [start, end) with a slide per chart of render()'s images; returns their paths."""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    deck_dir = Path(deck_dir)
+    deck_dir.mkdir(parents=True, exist_ok=True)
+    decks = []
+    for lo, hi in windows(start, end, period):
+        slides = [(chart, path) for chart, path in images.items() if chart.start == lo]
+        if not slides:
+            continue
+        prs = Presentation()
+        for chart, path in slides:
+            slide = prs.slides.add_slide(prs.slide_layouts[5])
+            slide.shapes.title.text = chart.title
+            slide.shapes.add_picture(str(path), Inches(1), Inches(2), width=Inches(8), height=Inches(3.2))
+        deck = deck_dir / f"air_quality_{lo:%Y-%m-%d}.pptx"
+        prs.save(deck)
+        decks.append(deck)
+    return decks
+
+
+def single(source=CSV_FILE, img_file=IMG_FILE, pptx_file=PPTX_FILE, full_resolution: bool = False):
+    """The NO₂ series of one CSV or exported Parquet dataset, as one chart on one slide."""
+    # Load data: a CSV, or an exported Parquet dataset (only the plotted columns are read)
+    if Path(source).is_dir():
+        df = read_clean(source, columns=["datetime", "no2"]).to_pandas().sort_values("datetime")
+    else:
+        df = pd.read_csv(source, parse_dates=["datetime"]).sort_values("datetime")
+
+    # Create a chart (NO2 over time)
+    draw(img_file, "NO₂ Time Series", f"NO₂ ({UNITS})", df["datetime"].to_numpy(), df["no2"].to_numpy(),
+         full_resolution)
+
+    # Create PPTX
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.add_picture(img_file, Inches(1), Inches(1), width=Inches(8), height=Inches(4))
+    prs.save(pptx_file)
+    print(f"Report created: {pptx_file}")
+
+
+@click.command()
+@click.argument("source", default=CSV_FILE)
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), help="Batch mode: first day of the decks")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="Batch mode: day after the last of the decks")
+@click.option("--station", "stations", multiple=True, help="Station to report (repeatable; default all)")
+@click.option(
+    "--pollutant",
+    "pollutants",
+    multiple=True,
+    type=click.Choice(list(store.POLLUTANT_COLUMNS)),
+    help="Pollutant to report (repeatable; default all)"
+)
+@click.option("--period", default=PERIOD, show_default=True, help="One deck per period (pandas offset alias)")
+@click.option(
+    "--db-path",
+    default=store.DEFAULT_DB,
+    show_default=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Pipeline database batch mode reads"
+)
+@click.option(
+    "--parquet",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Exported Parquet dataset to read instead of the database"
+)
+@click.option("--workers", type=click.IntRange(min=1), help="Processes drawing charts (default: CPUs)")
+@click.option(
+    "--full-resolution",
+    is_flag=True,
+    help="Plot every point instead of each pixel column's min/max envelope"
+)
+def main(source, start, end, stations, pollutants, period, db_path, parquet, workers, full_resolution):
+    """One chart of SOURCE, or with --start/--end a deck per period for every station and pollutant."""
+    if start is None:
+        single(source, full_resolution=full_resolution)
+        return
+    if end is None:
+        raise click.UsageError("batch mode needs --end")
+    decks = batch(start, end, stations or None, pollutants or None, period, db_path, parquet, workers=workers,
+                  full_resolution=full_resolution)
+    print(f"Reports created: {len(decks)} decks in {DECK_DIR}")
+
+
+if __name__ == "__main__":
+    main()
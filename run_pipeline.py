@@ -1,10 +1,22 @@
 # run_pipeline.py
 """
-Orchestrate ingest → clean with CLI and logging.
+Orchestrate ingest → clean → export / rollup / anomalies → forecast with CLI and logging.
+
+The stages run in this process as a dependency graph sharing one DuckDB
+connection (see prototype/pipeline/dag.py); stages whose inputs have not
+changed since their last successful run are skipped. Timings, row counts
+and memory use of every run land in pipeline_runs and
+pipeline_stage_metrics.
 """
-import subprocess
+import logging
 import sys
 import click
+import duckdb
+from pathlib import Path
+
+from prototype.pipeline.dag import run_dag
+from prototype.pipeline.instrument import PROFILERS
+from prototype.pipeline.stages import pipeline_stages
 
 @click.command()
 @click.option(
@@ -24,22 +36,80 @@ import click
     show_default=True,
     help="Max gap hours for cleaning"
 )
-def run_pipeline(raw_dir, db_path, gap_hours):
+@click.option(
+    "--incremental/--full",
+    default=True,
+    show_default=True,
+    help="Only ingest new or appended data (see ingest_manifest) and re-clean past each watermark"
+)
+@click.option(
+    "--layout",
+    type=click.Choice(["tables", "observations"]),
+    default="tables",
+    show_default=True,
+    help="One raw table per CSV, or a single observations table"
+)
+@click.option(
+    "--export-dir",
+    default="data/clean/parquet",
+    show_default=True,
+    help="Where the clean tables are exported as partitioned Parquet"
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Run every stage, even those whose inputs are unchanged"
+)
+@click.option(
+    "--workers",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Independent stages run concurrently"
+)
+@click.option(
+    "--profile",
+    multiple=True,
+    type=click.Choice(["ingest", "clean", "export", "rollup", "anomalies", "forecast"]),
+    help="Profile this stage (repeatable)"
+)
+@click.option(
+    "--profiler",
+    type=click.Choice(PROFILERS),
+    default="cprofile",
+    show_default=True,
+    help="cprofile writes <stage>.prof, pyinstrument <stage>.html"
+)
+@click.option(
+    "--profile-dir",
+    default="profiles",
+    show_default=True,
+    help="Where profile dumps are written"
+)
+def run_pipeline(raw_dir, db_path, gap_hours, incremental, layout, export_dir, force, workers,
+                 profile, profiler, profile_dir):
     """
-    Run ingest and clean steps in sequence.
+    Run ingest, clean and export steps in dependency order.
     Exits on first failure.
     """
-    cmds = [
-        f"python -m prototype.ingestion.ingest --raw-dir {raw_dir} --db-path {db_path}",
-        f"python -m prototype.cleaning.clean --db-path {db_path} --max-gap-hours {gap_hours}",
-    ]
-    for cmd in cmds:
-        print(f"▶ Running: {cmd}")
-        result = subprocess.run(cmd, shell=True)
-        if result.returncode != 0:
-            print(f"Pipeline aborted at: {cmd}", file=sys.stderr)
-            sys.exit(result.returncode)
-    print("✅ Pipeline complete.")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    stages = pipeline_stages(raw_dir, db_path, gap_hours, incremental, layout, export_dir)
+    con = duckdb.connect(db_path)
+    try:
+        options = dict(raw_dir=raw_dir, gap_hours=gap_hours, incremental=incremental, layout=layout,
+                       export_dir=export_dir, force=force)
+        status = run_dag(con, stages, force=force, max_workers=workers, options=options,
+                         profile=profile, profile_dir=profile_dir, profiler=profiler)
+    except Exception as exc:
+        print(f"Pipeline aborted: {exc}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        con.close()
+    print("✅ Pipeline complete: " + ", ".join(f"{name} {state}" for name, state in status.items()))
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    run_pipeline()
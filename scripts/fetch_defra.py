@@ -1,20 +1,47 @@
-import requests
+import sys
 from pathlib import Path
 
+import click
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from prototype.download.backfill import WINDOW, backfill  # noqa: E402
+from prototype.download.fetch import Download, fetch  # noqa: E402
+
+# Example DEFRA API endpoint for hourly aggregated data
+# (You’ll need to replace this with the real URL/parameters you want)
+LATEST_URL = (
+    "https://uk-air.defra.gov.uk/data_api?"
+    "module=HourlyData&"
+    "region=LONDON&"
+    "format=csv"
+)
+
+
 def fetch_defra_hourly_csv(save_path: Path):
-    # Example DEFRA API endpoint for hourly aggregated data
-    # (You’ll need to replace this with the real URL/parameters you want)
-    url = (
-        "https://uk-air.defra.gov.uk/data_api?"
-        "module=HourlyData&"
-        "region=LONDON&"
-        "format=csv"
-    )
-    resp = requests.get(url, timeout=30)
-    resp.raise_for_status()
-    save_path.write_bytes(resp.content)
-    print(f"Saved latest DEFRA data to {save_path}")
+    # streamed to disk and renamed into place once complete; skipped if unchanged
+    result = fetch(Download(LATEST_URL, Path(save_path)))
+    print(f"Saved latest DEFRA data to {save_path} ({result['status']})")
+
+
+@click.command()
+@click.option("--db-path", type=click.Path(dir_okay=False, path_type=Path),
+              default=Path("data") / "airquality.duckdb", show_default=True,
+              help="DuckDB file a backfill loads into")
+@click.option("--site", "sites", multiple=True, help="Site code to backfill (repeatable)")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), help="Backfill from this day")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="Backfill up to, not including, this day")
+@click.option("--window", default=WINDOW, show_default=True, help="Backfill request size (pandas offset alias)")
+def main(db_path, sites, start, end, window):
+    """Fetch the latest DEFRA CSV, or with --site/--start/--end backfill history into DuckDB."""
+    if start is None:
+        fetch_defra_hourly_csv(Path("data") / "raw" / "AirQualityDataHourly.csv")
+        return
+    if not sites or end is None:
+        raise click.UsageError("a backfill needs --site and --end")
+    loaded = backfill(db_path, sites, start, end, window=window)
+    print(f"Backfilled {sum(r['rows'] for r in loaded)} rows in {len(loaded)} windows into {db_path}")
+
 
 if __name__ == "__main__":
-    target = Path("data") / "raw" / "AirQualityDataHourly.csv"
-    fetch_defra_hourly_csv(target)
+    main()